@@ -245,10 +245,8 @@ def connect_repo(project_id):
 @api_github_bp.route('/project/<int:project_id>/sync-all-tasks', methods=['POST'])
 @login_required
 def sync_all_tasks(project_id):
-    """Sincronizza tutti i task del progetto con GitHub Issues"""
-    from app import db
-    from app.models import Task
-    from app.services.github_service import GitHubService
+    """Avvia in background la sincronizzazione di tutti i task del progetto con GitHub Issues"""
+    from app.services.github_task_sync_service import GitHubTaskSyncService
     
     project = Project.query.get_or_404(project_id)
     
@@ -270,58 +268,47 @@ def sync_all_tasks(project_id):
         }), 400
     
     try:
-        github_service = GitHubService()
-        
-        # Ottieni solo i task pubblici (NULL o False) e non "suggested" del progetto
-        # NULL viene trattato come pubblico per retrocompatibilità
-        tasks = Task.query.filter_by(
-            project_id=project_id
-        ).filter(
-            (Task.is_private == False) | (Task.is_private.is_(None))  # Pubblici o NULL
-        ).filter(
-            Task.status.notin_(['suggested'])  # Escludi solo i "suggested" (non ancora approvati)
-        ).all()
-        
-        synced_count = 0
-        failed_count = 0
-        skipped_count = 0
-        
-        for task in tasks:
-            # Salta i task già sincronizzati di recente (nelle ultime 24 ore)
-            from datetime import datetime, timedelta
-            if task.github_synced_at and (datetime.utcnow() - task.github_synced_at) < timedelta(hours=24):
-                skipped_count += 1
-                continue
-            
-            # Sincronizza il task
-            success = github_service.sync_task_to_github(task, project)
-            if success:
-                synced_count += 1
-            else:
-                failed_count += 1
+        task_sync = GitHubTaskSyncService()
+        if not task_sync.is_enabled():
+            return jsonify({
+                'success': False,
+                'message': 'Integrazione GitHub non abilitata'
+            }), 400
         
-        db.session.commit()
+        job = task_sync.start(project, initiated_by=current_user.id)
         
         return jsonify({
             'success': True,
-            'message': f'Sincronizzazione completata!',
-            'stats': {
-                'synced': synced_count,
-                'failed': failed_count,
-                'skipped': skipped_count,
-                'total': len(tasks)
-            }
-        })
+            'message': 'Sincronizzazione avviata in background',
+            'job': job,
+            'status_url': f'/api/github/project/{project_id}/sync-all-tasks/status'
+        }), 202
         
     except Exception as e:
-        db.session.rollback()
-        current_app.logger.error(f"Errore sincronizzazione task: {e}")
+        current_app.logger.error(f"Errore avvio sincronizzazione task: {e}")
         return jsonify({
             'success': False,
             'message': f'Errore durante la sincronizzazione: {str(e)}'
         }), 500
 
 
+@api_github_bp.route('/project/<int:project_id>/sync-all-tasks/status', methods=['GET'])
+@login_required
+def sync_all_tasks_status(project_id):
+    """Stato di avanzamento del job di sincronizzazione task -> GitHub Issues"""
+    from app.services.github_task_sync_service import GitHubTaskSyncService
+    
+    project = Project.query.get_or_404(project_id)
+    
+    if project.creator_id != current_user.id:
+        return jsonify({'success': False, 'message': 'Non autorizzato'}), 403
+    
+    return jsonify({
+        'success': True,
+        'job': GitHubTaskSyncService.get_status(project_id)
+    })
+
+
 @api_github_bp.route('/project/<int:project_id>/repo-stats', methods=['GET'])
 @login_required
 def get_repo_stats(project_id):
@@ -10,6 +10,7 @@ from .extensions import db, login_manager, mail
 from flask_migrate import Migrate
 from . import errors  # Import error handlers
 from .cache import init_cache, cache  # Flask-Caching
+from .profiler import init_profiler  # Profiler richieste (opt-in)
 from .routes_projects import projects_bp
 from .routes_auth import auth_bp
 from .routes_tasks import tasks_bp
@@ -171,6 +172,21 @@ def create_app(config_class=Config):
     # Inizializza Flask-Caching per performance
     init_cache(app)
     
+    # Profiler per richiesta (opt-in): query SQL, tempo DB/template, budget di query
+    init_profiler(app)
+    
+    # Contatori voti/investimenti e invalidazione della leaderboard investimenti
+    from .services.leaderboard_service import register_leaderboard_listeners
+    register_leaderboard_listeners()
+    from .services.user_stats_service import register_user_stats_listeners
+    register_user_stats_listeners()
+    from .services.project_listing_service import register_listing_listeners
+    register_listing_listeners()
+    from .services.notification_fanout import register_notification_listeners
+    register_notification_listeners()
+    from .services.notification_counter import register_notification_counter_listeners
+    register_notification_counter_listeners()
+    
     # Inizializza il servizio AI con la configurazione dell'app
     from .ai_services import init_ai_service
     with app.app_context():
@@ -268,6 +284,13 @@ def create_app(config_class=Config):
         except Exception as exc:
             app.logger.warning("Unable to ensure project_repository table exists: %s", exc, exc_info=True)
 
+        try:
+            from .models import WorkspaceSession, WorkspaceHistoryEntry
+            WorkspaceSession.__table__.create(bind=db.engine, checkfirst=True)
+            WorkspaceHistoryEntry.__table__.create(bind=db.engine, checkfirst=True)
+        except Exception as exc:
+            app.logger.warning("Unable to ensure workspace metadata tables exist: %s", exc, exc_info=True)
+
     return app
 
 # Force reload
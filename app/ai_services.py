@@ -7,6 +7,7 @@ from dotenv import load_dotenv
 from flask import current_app
 from datetime import datetime, timezone
 from .config import Config
+from .services.llm_cache import cached_completion, is_json
 
 # Carica le variabili dal file .env
 load_dotenv()
@@ -71,13 +72,13 @@ def analyze_with_ai(prompt: str, max_tokens: int = 1000, temperature: float = 0.
         return ""
 
     try:
-        chat_completion = client.chat.completions.create(
-            model=CURRENT_MODEL,
-            messages=[{"role": "user", "content": prompt}],
+        response_content = create_chat_completion(
+            'analyze_with_ai',
+            [{"role": "user", "content": prompt}],
             max_tokens=max_tokens,
             temperature=temperature
         )
-        return chat_completion.choices[0].message.content.strip()
+        return response_content.strip()
     except (APITimeoutError, APIConnectionError, RateLimitError, APIStatusError) as api_err:
         if current_app:
             current_app.logger.error(f"Errore API AI ({CURRENT_PROVIDER}): {api_err}", exc_info=True)
@@ -87,6 +88,73 @@ def analyze_with_ai(prompt: str, max_tokens: int = 1000, temperature: float = 0.
             current_app.logger.error(f"Errore imprevisto chiamata AI ({CURRENT_PROVIDER}): {e}", exc_info=True)
         return ""
 
+def stream_chat_completion(messages: list, max_tokens: int = 1000, temperature: float = 0.7):
+    """
+    Completion in streaming (stream=True): restituisce i token man mano che arrivano.
+
+    È un generatore: chiuderlo (es. client SSE disconnesso) chiude la risposta HTTP
+    verso il provider, che interrompe la generazione e i token fatturati.
+    Solleva le eccezioni dell'API al chiamante, che decide come segnalarle.
+    """
+    if not AI_SERVICE_AVAILABLE or client is None:
+        raise RuntimeError("AI Service not available")
+
+    stream = client.chat.completions.create(
+        model=CURRENT_MODEL,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=True
+    )
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+    finally:
+        stream.close()
+
+def create_chat_completion(call_site: str, messages: list, max_tokens: int, temperature: float,
+                           validate=None, **params) -> str:
+    """
+    Completion (senza streaming) servita dalla cache delle risposte LLM quando possibile.
+
+    call_site identifica il chiamante (TTL dedicato in llm_cache). validate decide se una
+    risposta può essere messa in cache (default: JSON valido in modalità json_object).
+    Restituisce il testo della risposta; le eccezioni dell'API arrivano al chiamante come prima.
+    """
+    def compute():
+        chat_completion = client.chat.completions.create(
+            model=CURRENT_MODEL,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **params
+        )
+        return chat_completion.choices[0].message.content
+
+    if validate is None and (params.get('response_format') or {}).get('type') == 'json_object':
+        validate = is_json
+    return cached_completion(
+        call_site, provider=CURRENT_PROVIDER, model=CURRENT_MODEL, messages=messages,
+        temperature=temperature, max_tokens=max_tokens, compute=compute,
+        validate=validate, **params
+    )
+
+def _strip_code_fences(response_content: str) -> str:
+    """Pulizia eventuale markdown code blocks attorno al JSON."""
+    if "```json" in response_content:
+        return response_content.split("```json")[1].split("```")[0].strip()
+    if "```" in response_content:
+        return response_content.split("```")[0].strip()
+    return response_content
+
+def _is_fenced_json(response_content: str) -> bool:
+    """Validatore cache per le risposte JSON senza json_object (eventuali ``` rimossi)."""
+    return is_json(_strip_code_fences(response_content))
+
 def generate_project_details_from_pitch(pitch: str, category: str, project_type: str = None) -> dict:
     if not AI_SERVICE_AVAILABLE or client is None:
         raise ConnectionError(f"{CURRENT_PROVIDER} AI Service non disponibile o non configurato.")
@@ -113,19 +181,15 @@ def generate_project_details_from_pitch(pitch: str, category: str, project_type:
 Categoria: "{category}"'''
 
     try:
-        chat_completion = client.chat.completions.create(
-            model=CURRENT_MODEL,
-            messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+        response_content = create_chat_completion(
+            'project_details',
+            [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
             max_tokens=2000,
-            temperature=0.7
+            temperature=0.7,
+            validate=_is_fenced_json
         )
-        response_content = chat_completion.choices[0].message.content
         
-        # Pulizia eventuale markdown code blocks
-        if "```json" in response_content:
-            response_content = response_content.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_content:
-            response_content = response_content.split("```")[0].strip()
+        response_content = _strip_code_fences(response_content)
 
         # Controllo se la risposta è vuota o non valida
         if not response_content or not response_content.strip():
@@ -211,14 +275,13 @@ Categoria: "{category}"
 Descrizione: "{description}"'''
 
     try:
-        chat_completion = client.chat.completions.create(
-            model=CURRENT_MODEL,  # ← CAMBIO: Usa il modello configurato (Grok o DeepSeek)
-            messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+        response_content = create_chat_completion(
+            'suggested_tasks',
+            [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
             max_tokens=1200,
             temperature=0.7,
             response_format={"type": "json_object"}
         )
-        response_content = chat_completion.choices[0].message.content
         parsed_response = json.loads(response_content)
         tasks = parsed_response.get('tasks', [])
         
@@ -298,14 +361,13 @@ Categoria: "{project_category}"
 Descrizione: "{project_description}"{focus_text}'''
 
     try:
-        chat_completion = client.chat.completions.create(
-            model=CURRENT_MODEL,  # ← CAMBIO: Usa Grok o DeepSeek
-            messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+        response_content = create_chat_completion(
+            'validation_experiment',
+            [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
             max_tokens=600,
             temperature=0.7,
             response_format={"type": "json_object"}
         )
-        response_content = chat_completion.choices[0].message.content
         return json.loads(response_content)
     except (APITimeoutError, APIConnectionError, RateLimitError, APIStatusError) as api_err:
         current_app.logger.error(f"Errore API DeepSeek (validation experiment): {api_err}", exc_info=True)
@@ -334,14 +396,14 @@ Contenuto Soluzione Proposta:
 """{solution_content}"""'''
     
     try:
-        chat_completion = client.chat.completions.create(
-            model=CURRENT_MODEL,  # ← CAMBIO: Usa Grok o DeepSeek
-            messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+        # Temperatura 0: stessa soluzione -> stessi punteggi (e risposta servita dalla cache)
+        response_content = create_chat_completion(
+            'solution_analysis',
+            [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
             max_tokens=400,
-            temperature=0.5,
+            temperature=0,
             response_format={"type": "json_object"}
         )
-        response_content = chat_completion.choices[0].message.content
         return json.loads(response_content)
     except (APITimeoutError, APIConnectionError, RateLimitError, APIStatusError) as api_err:
         current_app.logger.error(f"Errore API DeepSeek (analisi soluzione): {api_err}", exc_info=True)
@@ -429,9 +491,9 @@ Massimo 320 parole, tono incoraggiante e pratico."""
     prompt_config = context_prompts[context]
     
     try:
-        chat_completion = client.chat.completions.create(
-            model=CURRENT_MODEL,  # ← CAMBIO: Usa Grok o DeepSeek
-            messages=[
+        response_content = create_chat_completion(
+            'contextual_help',
+            [
                 {"role": "system", "content": prompt_config['system']},
                 {"role": "user", "content": prompt_config['user']}
             ],
@@ -439,8 +501,7 @@ Massimo 320 parole, tono incoraggiante e pratico."""
             temperature=0.7
         )
         
-        response_content = chat_completion.choices[0].message.content.strip()
-        return response_content
+        return response_content.strip()
         
     except (APITimeoutError, APIConnectionError, RateLimitError, APIStatusError) as api_err:
         current_app.logger.error(f"Errore API DeepSeek (aiuto contestuale): {api_err}", exc_info=True)
@@ -1,23 +1,29 @@
 # app/api_uploads.py
+import hashlib
 import mimetypes
 import os
 import uuid
 import json
 import shutil
 import tempfile
+import time
 from datetime import datetime, timezone
-from flask import Blueprint, request, jsonify, current_app, abort, send_file
+from flask import Blueprint, Response, request, jsonify, current_app, abort, send_file
 from flask_login import login_required, current_user
 from itsdangerous import BadSignature, SignatureExpired
 from .extensions import limiter, db
 from .file_validation import validate_file_upload, get_safe_filename, FileValidationError
 from .models import Project, Collaborator, Task, Solution
 from .services.zip_processor import ZipProcessor, ZipProcessorError
+from .services.blob_store import BlobStore
+from .services.resumable_upload_service import ResumableUploadService, ResumableUploadError
 from .workspace_utils import (
     ensure_project_workspace,
     session_dir as ws_session_dir,
     load_session_metadata,
     save_session_metadata,
+    metadata_path,
+    delete_session_metadata,
     default_metadata,
     list_session_metadata,
     load_history_entries,
@@ -28,6 +34,7 @@ from .workspace_utils import (
     sanitize_workspace_path
 )
 from .services.workspace_sync_service import WorkspaceSyncService
+from .services.workspace_sync_queue import WorkspaceSyncQueue
 from .services.notification_service import NotificationService
 
 # NUOVO: Import GitHub sync service (opzionale)
@@ -51,6 +58,10 @@ ALLOWED_IMAGE_MIME_TYPES = {
     'image/webp'
 }
 
+# Stream SSE di avanzamento del sync
+SSE_POLL_SECONDS = 0.5
+SSE_HEARTBEAT_SECONDS = 15
+
 def allowed_file(filename):
     """Verifica se il file ha un'estensione consentita (legacy function)."""
     return '.' in filename and \
@@ -76,7 +87,8 @@ def _get_project_with_access(project_id: int) -> Project:
     abort(403, description="Non hai i permessi per gestire i file di questo progetto.")
 
 
-def _update_file_metadata(metadata: dict, relative_path: str, file_size: int, status: str = 'pending'):
+def _update_file_metadata(metadata: dict, relative_path: str, file_size: int, status: str = 'pending',
+                          sha256: str = None):
     files = metadata.setdefault('files', [])
     existing = next((item for item in files if item['path'] == relative_path), None)
     if not existing:
@@ -91,6 +103,10 @@ def _update_file_metadata(metadata: dict, relative_path: str, file_size: int, st
         existing['size'] = file_size
         existing['status'] = status
         existing['updated_at'] = datetime.now(timezone.utc).isoformat()
+    if sha256:
+        existing['sha256'] = sha256
+    else:
+        existing.pop('sha256', None)
     metadata['file_count'] = len(files)
     metadata['total_size'] = sum(item.get('size', 0) for item in files)
     metadata['updated_at'] = datetime.now(timezone.utc).isoformat()
@@ -113,35 +129,39 @@ def upload_project_zip(project_id: int):
     print(f"[ZIP UPLOAD] Starting ZIP extraction for project {project.id}")
     current_app.logger.info("Starting ZIP extraction for project %s", project.id)
     
+    session_id = uuid.uuid4().hex
+    session_directory = ws_session_dir(project.id, session_id)
+    current_app.logger.debug("Session directory: %s", session_directory)
+
+    # Un solo passaggio sui byte: ogni file viene scritto direttamente nella sessione
+    # con il suo SHA-256, poi registrato nel blob store (hardlink, nessuna copia);
+    # se il contenuto era già presente il file viene sostituito dal blob esistente
     processor = ZipProcessor()
+    blob_store = BlobStore()
+    extracted = {}
+    digests = {}
     try:
-        current_app.logger.debug("Calling processor.extract_zip...")
-        extracted_files = processor.extract_zip(zip_file)
+        for file_info in processor.iter_extract(zip_file, destination=session_directory):
+            digest = file_info['sha256']
+            if blob_store.has(digest):
+                blob_store.link(digest, file_info['full_path'])
+            else:
+                blob_store.ingest(file_info['full_path'], digest)
+            digests[file_info['path']] = digest
+            extracted[file_info['path']] = file_info  # Path ripetuti: vale l'ultimo
+        extracted_files = list(extracted.values())
         print(f"[ZIP UPLOAD] ZIP extraction completed: {len(extracted_files)} files")
-        current_app.logger.info("ZIP extraction completed: %d files", len(extracted_files))
+        current_app.logger.info("ZIP extraction completed: %d files (%d blobs)",
+                                len(extracted_files), len(set(digests.values())))
     except ZipProcessorError as exc:
+        shutil.rmtree(session_directory, ignore_errors=True)
         current_app.logger.error("ZIP extraction failed: %s", exc)
         return jsonify({'success': False, 'error': str(exc)}), 400
     except Exception as exc:
+        shutil.rmtree(session_directory, ignore_errors=True)
         current_app.logger.error("Unexpected error during ZIP extraction: %s", exc, exc_info=True)
         return jsonify({'success': False, 'error': f'Errore inaspettato: {str(exc)}'}), 500
 
-    session_id = uuid.uuid4().hex
-    session_directory = ws_session_dir(project.id, session_id)
-    
-    current_app.logger.debug("Session directory: %s", session_directory)
-
-    # Copia l'intera struttura estratta nella cartella sessione
-    if processor.temp_dir:
-        current_app.logger.debug("Copying extracted files to session directory...")
-        try:
-            shutil.copytree(processor.temp_dir, session_directory, dirs_exist_ok=True)
-            current_app.logger.debug("Files copied successfully")
-            shutil.rmtree(processor.temp_dir, ignore_errors=True)
-        except Exception as copy_error:
-            current_app.logger.error("Error copying files: %s", copy_error, exc_info=True)
-            return jsonify({'success': False, 'error': f'Errore copia file: {str(copy_error)}'}), 500
-
     metadata = default_metadata(session_id, project.id, upload_type='zip')
     metadata['initiated_by'] = current_user.id
     total_size = 0
@@ -152,12 +172,13 @@ def upload_project_zip(project_id: int):
             continue
         file_size = file_info['size']
         total_size += file_size
-        _update_file_metadata(metadata, relative_path, file_size)
+        _update_file_metadata(metadata, relative_path, file_size, sha256=digests.get(relative_path))
 
     metadata['status'] = 'extracted'
     metadata['file_count'] = len(extracted_files)
     metadata['total_size'] = total_size
     save_session_metadata(session_directory, metadata)
+    db.session.commit()
     
     # Forza flush per assicurarsi che il file sia scritto su disco (Windows safe)
     metadata_file = os.path.join(session_directory, 'metadata.json')
@@ -270,6 +291,8 @@ def upload_project_zip(project_id: int):
     elif not project.github_repo_name:
         current_app.logger.debug("Project %s has no GitHub repository configured", project.id)
 
+    db.session.commit()
+
     response_data = {
         'success': True,
         'session_id': session_id,
@@ -330,11 +353,19 @@ def upload_project_file(project_id: int):
         finally:
             uploaded_file.seek(0)
 
-    mode = 'ab' if chunk_index is not None and chunk_index > 0 else 'wb'
-    with open(destination_path, mode) as dest:
+    # I chunk vengono accodati a un file privato fuori dalla sessione: il file di
+    # destinazione può essere un hardlink del blob store e non va mai scritto in place
+    part_path = _chunked_part_path(project.id, session_id, relative_path)
+    appending = chunk_index is not None and chunk_index > 0
+    if appending and not os.path.exists(part_path):
+        return jsonify({
+            'success': False,
+            'error': 'Chunk fuori sequenza: ricominciare l\'upload dal chunk 0.'
+        }), 409
+    os.makedirs(os.path.dirname(part_path), exist_ok=True)
+    with open(part_path, 'ab' if appending else 'wb') as dest:
         shutil.copyfileobj(uploaded_file.stream, dest)
 
-    file_size = os.path.getsize(destination_path)
     metadata = load_session_metadata(session_directory) or default_metadata(session_id, project.id, upload_type='manual')
     metadata.setdefault('initiated_by', current_user.id)
 
@@ -342,9 +373,19 @@ def upload_project_file(project_id: int):
     if total_chunks is None or (chunk_index is not None and total_chunks and chunk_index + 1 == total_chunks):
         file_status = 'complete'
 
-    _update_file_metadata(metadata, relative_path, file_size, status=file_status)
+    file_size = os.path.getsize(part_path)
+    digest = None
+    if file_status == 'complete':
+        # File completo: deduplica tramite blob store, poi il file parziale viene scartato
+        blob_store = BlobStore()
+        digest = blob_store.ingest(part_path)
+        blob_store.link(digest, destination_path)
+        os.remove(part_path)
+
+    _update_file_metadata(metadata, relative_path, file_size, status=file_status, sha256=digest)
     metadata['status'] = 'in_progress'
     save_session_metadata(session_directory, metadata)
+    db.session.commit()
 
     return jsonify({
         'success': True,
@@ -356,6 +397,120 @@ def upload_project_file(project_id: int):
     }), 200
 
 
+def _chunked_part_path(project_id: int, session_id: str, relative_path: str) -> str:
+    """File parziale di un upload a chunk (fuori dalla sessione, che viene sincronizzata)."""
+    key = hashlib.sha256(f"{session_id}:{relative_path}".encode('utf-8')).hexdigest()
+    return os.path.join(ensure_project_workspace(project_id), 'partial_uploads', 'chunked', f"{key}.part")
+
+
+def _resumable_upload_response(state: dict, status_code: int = 200):
+    status = ResumableUploadService.describe(state)
+    response = jsonify({'success': True, **status})
+    response.status_code = status_code
+    response.headers['Upload-Offset'] = str(status['offset'])
+    response.headers['Upload-Length'] = str(status['size'])
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@api_uploads_bp.route('/projects/<int:project_id>/uploads', methods=['POST'])
+@login_required
+@limiter.limit("30 per hour")
+def create_resumable_upload(project_id: int):
+    """
+    Avvia un upload riprendibile.
+
+    Body JSON: relative_path, size, session_id (opzionale), sha256 (opzionale, file completo).
+    I chunk vanno poi inviati con PUT /uploads/<upload_id> e header Upload-Offset.
+    """
+    project = _get_project_with_access(project_id)
+    payload = request.get_json(silent=True) or {}
+
+    try:
+        relative_path = sanitize_workspace_path(payload.get('relative_path') or payload.get('path'))
+    except ValueError as exc:
+        return jsonify({'success': False, 'error': str(exc)}), 400
+
+    try:
+        size = int(payload.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'size mancante o non valido.'}), 400
+
+    session_id = payload.get('session_id') or uuid.uuid4().hex
+    session_directory = ws_session_dir(project.id, session_id)
+
+    try:
+        state = ResumableUploadService(project.id).create(
+            relative_path,
+            size,
+            session_id,
+            sha256=payload.get('sha256'),
+            max_size=current_app.config.get('PROJECT_WORKSPACE_MAX_FILE_BYTES')
+        )
+    except ResumableUploadError as exc:
+        return jsonify({'success': False, 'error': str(exc)}), exc.status_code
+
+    metadata = load_session_metadata(session_directory) or default_metadata(session_id, project.id, upload_type='manual')
+    metadata.setdefault('initiated_by', current_user.id)
+    file_status = 'complete' if state['status'] == 'complete' else 'pending'
+    _update_file_metadata(metadata, relative_path, size, status=file_status, sha256=state.get('final_sha256'))
+    metadata['status'] = 'in_progress'
+    save_session_metadata(session_directory, metadata)
+    db.session.commit()
+
+    return _resumable_upload_response(state, 201)
+
+
+@api_uploads_bp.route('/projects/<int:project_id>/uploads/<string:upload_id>', methods=['PUT'])
+@login_required
+@limiter.limit("1200 per hour")
+def upload_resumable_chunk(project_id: int, upload_id: str):
+    """
+    Riceve un chunk all'offset indicato dall'header Upload-Offset.
+
+    I chunk possono arrivare in parallelo e in qualsiasi ordine; l'header
+    opzionale X-Chunk-Sha256 viene verificato prima di registrare il chunk.
+    """
+    project = _get_project_with_access(project_id)
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        return jsonify({'success': False, 'error': 'Header Upload-Offset mancante.'}), 400
+
+    try:
+        state, completed = ResumableUploadService(project.id).write_chunk(
+            upload_id,
+            offset,
+            request.stream,
+            length=request.content_length,
+            chunk_sha256=request.headers.get('X-Chunk-Sha256')
+        )
+    except ResumableUploadError as exc:
+        return jsonify({'success': False, 'error': str(exc)}), exc.status_code
+
+    if completed:
+        session_directory = ws_session_dir(project.id, state['session_id'])
+        metadata = load_session_metadata(session_directory) or default_metadata(state['session_id'], project.id, upload_type='manual')
+        metadata.setdefault('initiated_by', current_user.id)
+        _update_file_metadata(metadata, state['path'], state['size'], status='complete', sha256=state['final_sha256'])
+        metadata['status'] = 'in_progress'
+        save_session_metadata(session_directory, metadata)
+        db.session.commit()
+
+    return _resumable_upload_response(state)
+
+
+@api_uploads_bp.route('/projects/<int:project_id>/uploads/<string:upload_id>', methods=['GET', 'HEAD'])
+@login_required
+def get_resumable_upload(project_id: int, upload_id: str):
+    """Stato dell'upload: Upload-Offset contiguo e intervalli mancanti per la ripresa."""
+    project = _get_project_with_access(project_id)
+    try:
+        state = ResumableUploadService(project.id).get(upload_id)
+    except ResumableUploadError as exc:
+        return jsonify({'success': False, 'error': str(exc)}), exc.status_code
+    return _resumable_upload_response(state)
+
+
 @api_uploads_bp.route('/projects/<int:project_id>/finalize-upload', methods=['POST'])
 @login_required
 def finalize_upload_session(project_id: int):
@@ -379,69 +534,80 @@ def finalize_upload_session(project_id: int):
     NotificationService.notify_workspace_upload_ready(project, metadata, current_user.id)
     db.session.commit()
 
-    # Avvia sync (git sincrono o Celery asincrono come fallback)
+    # Il sync gira in background: l'avanzamento arriva da /sessions/<id>/events
     try:
-        # Prova git sync sincrono prima
-        try:
-            from .services.git_sync_service import GitSyncService
-            git_sync = GitSyncService()
-            
-            if git_sync.is_enabled():
-                current_app.logger.info("Using git sync (synchronous) for session %s", session_id)
-                metadata['status'] = 'syncing'
-                save_session_metadata(session_directory, metadata)
-                
-                sync_result = git_sync.sync_workspace_from_directory(
-                    project, session_directory, current_user.id
-                )
-                
-                if sync_result.get('status') == 'success':
-                    metadata['status'] = 'completed'
-                    metadata['sync_finished_at'] = datetime.now(timezone.utc).isoformat()
-                    metadata['sync_method'] = 'git'
-                    save_session_metadata(session_directory, metadata)
-                    
-                    return jsonify({
-                        'success': True, 
-                        'session_id': session_id, 
-                        'status': 'completed',
-                        'method': 'git',
-                        'message': f'Sincronizzazione completata: {sync_result.get("files_synced", 0)} file',
-                        'files_synced': sync_result.get('files_synced', 0),
-                        'commit_url': sync_result.get('commit_url')
-                    }), 200
-                else:
-                    raise Exception(f"Git sync failed: {sync_result.get('message')}")
-            else:
-                raise Exception("Git sync not available")
-        except Exception as git_exc:
-            # Fallback a Celery
-            current_app.logger.info("Git sync not available, using Celery: %s", git_exc)
-            from tasks.github_tasks import sync_workspace_session
-            task = sync_workspace_session.delay(project.id, session_id, current_user.id)
-            
-            metadata['status'] = 'syncing'
-            metadata['sync_task_id'] = task.id
-            save_session_metadata(session_directory, metadata)
-            
-            current_app.logger.info("Async sync scheduled for session %s (task %s)", session_id, task.id)
-            
-            return jsonify({
-                'success': True, 
-                'session_id': session_id, 
-                'status': 'syncing',
-                'method': 'celery',
-                'message': 'Sincronizzazione avviata in background (Celery)'
-            }), 200
-        
+        queued = WorkspaceSyncQueue().enqueue(project, session_id, current_user.id)
+        db.session.commit()
     except Exception as exc:
-        current_app.logger.error("Failed to start sync: %s", exc)
+        current_app.logger.error("Failed to queue sync: %s", exc)
+        db.session.rollback()
+        metadata = load_session_metadata(session_directory)
         metadata['status'] = 'error'
         metadata['error'] = str(exc)
         save_session_metadata(session_directory, metadata)
+        db.session.commit()
         return jsonify({'success': False, 'session_id': session_id, 'status': 'error', 'error': str(exc)}), 500
 
-    return jsonify({'success': True, 'session_id': session_id, 'status': final_metadata['status'], 'metadata': final_metadata}), 200
+    return jsonify({
+        'success': True,
+        'session_id': session_id,
+        'status': queued['status'],
+        'coalesced': queued['coalesced'],
+        'method': queued['backend'],
+        'message': 'Sincronizzazione già in corso' if queued['coalesced'] else 'Sincronizzazione avviata in background',
+        'events_url': f"/api/projects/{project.id}/sessions/{session_id}/events"
+    }), 202
+
+
+@api_uploads_bp.route('/projects/<int:project_id>/sessions/<string:session_id>/events', methods=['GET'])
+@login_required
+def stream_session_events(project_id: int, session_id: str):
+    """Stream SSE dell'avanzamento del sync di una sessione."""
+    project = _get_project_with_access(project_id)
+    session_directory = ws_session_dir(project.id, session_id)
+    path = metadata_path(session_directory)
+    if not os.path.exists(path):
+        return jsonify({'success': False, 'error': 'Sessione non trovata.'}), 404
+    max_seconds = current_app.config.get('WORKSPACE_SYNC_EVENTS_MAX_SECONDS', 900)
+
+    def generate():
+        started = time.monotonic()
+        last_mtime = None
+        last_sent = started
+        while time.monotonic() - started < max_seconds:
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                yield 'event: error\ndata: {"error": "Sessione non trovata."}\n\n'
+                return
+            if mtime != last_mtime:
+                last_mtime = mtime
+                try:
+                    with open(path, 'r', encoding='utf-8') as fp:
+                        metadata = json.load(fp)
+                except (OSError, ValueError):
+                    metadata = None
+                if metadata is not None:
+                    payload = {
+                        'session_id': session_id,
+                        'status': metadata.get('status'),
+                        'progress': metadata.get('progress'),
+                        'error': metadata.get('error'),
+                    }
+                    yield f"data: {json.dumps(payload)}\n\n"
+                    last_sent = time.monotonic()
+                    if metadata.get('status') in ('completed', 'error'):
+                        return
+            elif time.monotonic() - last_sent >= SSE_HEARTBEAT_SECONDS:
+                # Commento SSE: tiene aperta la connessione attraverso i proxy
+                yield ': keep-alive\n\n'
+                last_sent = time.monotonic()
+            time.sleep(SSE_POLL_SECONDS)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @api_uploads_bp.route('/projects/<int:project_id>/sessions/<string:session_id>', methods=['DELETE'])
@@ -462,6 +628,8 @@ def delete_upload_session(project_id: int, session_id: str):
         return jsonify({'success': False, 'error': 'La sessione è già sincronizzata e non può essere rimossa.'}), 400
 
     shutil.rmtree(session_directory, ignore_errors=True)
+    delete_session_metadata(session_id)
+    db.session.commit()
     current_app.logger.info("Sessione workspace eliminata (project=%s, session=%s)", project.id, session_id)
     return jsonify({'success': True, 'session_id': session_id}), 200
 
@@ -2,10 +2,22 @@
 """
 Flask-Caching configuration for KickthisUSs.
 Provides caching for frequently accessed data to improve performance.
+
+Invalidation is tag/generation based: every tag (e.g. ``project:42``) has a
+generation counter stored in the cache, and tagged keys embed the current
+generation. Bumping the counter makes all keys of the previous generation
+unreachable at O(1) cost, on both SimpleCache and RedisCache (no wildcard
+deletes needed). Old entries simply expire with their TTL.
 """
 
+import logging
+import time
+
+from flask import has_app_context
 from flask_caching import Cache
 
+logger = logging.getLogger(__name__)
+
 # Initialize cache instance
 cache = Cache()
 
@@ -37,11 +49,83 @@ def init_cache(app):
     # Initialize cache with app
     cache.init_app(app)
     
+    app.config.setdefault('CACHE_TAGGED_TIMEOUT', 3600)
+    
+    # Bump automatico delle generazioni quando i modelli di un progetto cambiano
+    register_model_invalidation()
+    
     app.logger.info(f"Cache initialized: Type={cache_config['CACHE_TYPE']}, Timeout={cache_config['CACHE_DEFAULT_TIMEOUT']}s")
     
     return cache
 
 
+def tagged_timeout() -> int:
+    """TTL for generation-tagged entries (safe to keep long: invalidation is explicit)."""
+    from flask import current_app
+    return current_app.config.get('CACHE_TAGGED_TIMEOUT', 3600)
+
+
+# ============================================
+# Tag Generations
+# ============================================
+
+def project_tag(project_id: int) -> str:
+    """Tag covering every cached value derived from a project's state."""
+    return f"project:{int(project_id)}"
+
+
+def project_documents_tag(project_id: int) -> str:
+    """Tag covering cached Hub documents of a project."""
+    return f"project_docs:{int(project_id)}"
+
+
+def _tag_generation_key(tag: str) -> str:
+    return f"tag_gen:{tag}"
+
+
+def _new_generation() -> int:
+    # Seed from the clock so a counter lost to eviction/restart never
+    # reuses a generation that may still have live entries.
+    return int(time.time() * 1000)
+
+
+def get_tag_generations(*tags: str) -> list:
+    """Return the current generation of each tag (one round trip)."""
+    keys = [_tag_generation_key(tag) for tag in tags]
+    values = list(cache.get_many(*keys)) if keys else []
+    for index, value in enumerate(values):
+        if value is None:
+            seed = _new_generation()
+            # add() does not overwrite a generation set concurrently
+            cache.add(keys[index], seed, timeout=0)
+            values[index] = cache.get(keys[index]) or seed
+    return values
+
+
+def tagged_key(base_key: str, *tags: str) -> str:
+    """Build a cache key bound to the current generation of the given tags."""
+    if not tags:
+        return base_key
+    generations = get_tag_generations(*tags)
+    suffix = ";".join(f"{tag}@{generation}" for tag, generation in zip(tags, generations))
+    return f"{base_key}|{suffix}"
+
+
+def invalidate_tags(*tags: str):
+    """Invalidate every key bound to the given tags by bumping their generation."""
+    # inc() lives on the backend (the Flask-Caching proxy does not expose it)
+    backend = cache.cache
+    for tag in tags:
+        key = _tag_generation_key(tag)
+        try:
+            # Atomic INCR on Redis; a missing (or evicted) counter is re-seeded
+            # from the clock instead of restarting from 1
+            if backend.get(key) is None or backend.inc(key) is None:
+                backend.set(key, _new_generation(), timeout=0)
+        except Exception as e:
+            logger.warning(f"Cache tag invalidation failed for {tag}: {e}")
+
+
 # ============================================
 # Cache Key Generators
 # ============================================
@@ -70,9 +154,11 @@ def make_document_cache_key(project_id: int, filename: str) -> str:
 # Cache Decorators for Common Patterns
 # ============================================
 
-def cached_project_data(timeout: int = 300):
+def cached_project_data(timeout: int = None):
     """
     Decorator for caching project-related data.
+    Entries are tagged with the project generation, so any change to the
+    project (see register_model_invalidation) invalidates them immediately.
     
     Usage:
         @cached_project_data(timeout=600)
@@ -89,7 +175,7 @@ def cached_project_data(timeout: int = 300):
             if project_id is None:
                 return func(*args, **kwargs)
             
-            cache_key = f"project_data:{func.__name__}:{project_id}"
+            cache_key = tagged_key(f"project_data:{func.__name__}:{project_id}", project_tag(project_id))
             
             # Try to get from cache
             cached_result = cache.get(cache_key)
@@ -98,7 +184,7 @@ def cached_project_data(timeout: int = 300):
             
             # Execute function and cache result
             result = func(*args, **kwargs)
-            cache.set(cache_key, result, timeout=timeout)
+            cache.set(cache_key, result, timeout=timeout if timeout is not None else tagged_timeout())
             return result
         
         return decorated_function
@@ -110,17 +196,12 @@ def cached_project_data(timeout: int = 300):
 # ============================================
 
 def invalidate_project_cache(project_id: int):
-    """Invalidate all cached data for a project."""
-    patterns = [
-        make_project_cache_key(project_id),
-        make_project_structure_key(project_id),
-        f"project_data:*:{project_id}",
-    ]
-    for pattern in patterns:
-        try:
-            cache.delete(pattern)
-        except Exception:
-            pass  # Ignore errors during cache invalidation
+    """Invalidate all cached data for a project (O(1) generation bump)."""
+    invalidate_tags(project_tag(project_id), project_documents_tag(project_id))
+    try:
+        cache.delete(make_project_cache_key(project_id))
+    except Exception:
+        pass  # Ignore errors during cache invalidation
 
 
 def invalidate_user_cache(user_id: int):
@@ -134,12 +215,125 @@ def invalidate_user_cache(user_id: int):
 def invalidate_document_cache(project_id: int, filename: str = None):
     """Invalidate document cache for a project."""
     if filename:
-        cache.delete(make_document_cache_key(project_id, filename))
+        cache.delete(tagged_key(make_document_cache_key(project_id, filename),
+                                project_tag(project_id), project_documents_tag(project_id)))
     else:
         # Invalidate all documents for this project
-        # Note: This requires pattern matching which may not work with SimpleCache
-        try:
-            cache.delete(f"doc:{project_id}:*")
-        except Exception:
-            pass
+        invalidate_tags(project_documents_tag(project_id))
+
+
+# ============================================
+# Model Change Hooks
+# ============================================
+
+# Pending state is kept in session.info under each hook's key
+_transaction_hooks = {}
+_transaction_listeners_registered = False
+
+# Tables whose rows carry a project_id but do not affect cached project views
+_INVALIDATION_EXCLUDED_TABLES = {'notification'}
+_TAGS_INFO_KEY = 'cache_dirty_tags'
+
+
+def register_transaction_hook(info_key, apply, models=None, collect=None, factory=dict):
+    """
+    Run ``apply(pending)`` after the session commits, with the state collected
+    during the transaction under ``session.info[info_key]``; the state is
+    dropped on rollback.
+
+    ``collect(session, obj, pending)`` is called at flush time for every new,
+    dirty or deleted instance of ``models`` (any object when None) and fills
+    ``pending`` (created with ``factory``). Callers can also write ``session.info[info_key]`` directly
+    (e.g. for bulk statements that bypass the flush).
+
+    All hooks share one set of session listeners, so each flush scans the
+    changed objects once. Registering the same key again replaces the hook.
+    """
+    _transaction_hooks[info_key] = (models, collect, apply, factory)
+    _register_transaction_listeners()
+
+
+def register_tag_invalidation(name, models, tags_for):
+    """
+    Bump the tags returned by ``tags_for(session, obj)`` once a transaction
+    that changed an instance of ``models`` commits.
+    """
+    def collect(session, obj, pending):
+        pending.update(tag for tag in tags_for(session, obj) if tag)
+
+    register_transaction_hook(f"{_TAGS_INFO_KEY}:{name}", _invalidate_pending_tags,
+                              models=models, collect=collect, factory=set)
+
+
+def _invalidate_pending_tags(tags):
+    invalidate_tags(*tags)
 
+
+def _collect_transaction_changes(session, flush_context):
+    if not _transaction_hooks:
+        return
+    hooks = list(_transaction_hooks.items())
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            for info_key, (models, collect, _apply, factory) in hooks:
+                if collect is not None and (models is None or isinstance(obj, models)):
+                    pending = session.info.get(info_key)
+                    if pending is None:
+                        pending = session.info[info_key] = factory()
+                    collect(session, obj, pending)
+
+
+def _apply_transaction_hooks(session):
+    pending = [(session.info.pop(info_key, None), apply)
+               for info_key, (_models, _collect, apply, _factory) in _transaction_hooks.items()]
+    if not has_app_context():
+        return
+    for state, apply in pending:
+        if state:
+            try:
+                apply(state)
+            except Exception as e:
+                logger.warning(f"After-commit cache hook failed: {e}")
+
+
+def _discard_transaction_hooks(session):
+    for info_key in _transaction_hooks:
+        session.info.pop(info_key, None)
+
+
+def _register_transaction_listeners():
+    global _transaction_listeners_registered
+    if _transaction_listeners_registered:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    # after_flush: IDs and foreign keys are assigned, while new/dirty/deleted
+    # and attribute history still describe the flushed changes
+    event.listen(Session, 'after_flush', _collect_transaction_changes)
+    event.listen(Session, 'after_commit', _apply_transaction_hooks)
+    event.listen(Session, 'after_rollback', _discard_transaction_hooks)
+    _transaction_listeners_registered = True
+
+
+def _changed_project_tags(session, obj):
+    from .models import Project
+
+    if isinstance(obj, Project):
+        project_id = obj.id
+    elif getattr(obj, '__tablename__', None) in _INVALIDATION_EXCLUDED_TABLES:
+        return ()
+    else:
+        project_id = getattr(obj, 'project_id', None)
+    if not isinstance(project_id, int):
+        return ()
+    return project_tag(project_id), project_documents_tag(project_id)
+
+
+def register_model_invalidation():
+    """
+    Bump project generations after commits that touch project state.
+    Every flushed row with a ``project_id`` (and Project itself) marks its
+    project dirty; the generation is bumped only once the transaction commits.
+    """
+    register_tag_invalidation('projects', None, _changed_project_tags)
@@ -0,0 +1,308 @@
+"""
+Shared HTTP client for the GitHub REST API.
+
+All the clients that talk to GitHub with plain ``requests`` go through a
+single pooled ``requests.Session`` so TCP/TLS connections are reused across
+calls. On top of the session the client adds:
+
+- a conditional-request cache for GET: the ETag / Last-Modified of each
+  response is stored and sent back as If-None-Match / If-Modified-Since.
+  GitHub answers 304 without counting the request against the rate limit,
+  so repeated reads (list_repo_files, get_file_content, ...) are nearly free;
+- retry with backoff on secondary rate limits (403/429 with Retry-After),
+  on an exhausted primary quota with a close reset, and on transient 5xx /
+  connection errors;
+- per-endpoint latency metrics (see ``get_metrics()``).
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+GITHUB_HTTP_POOL_SIZE = int(os.getenv('GITHUB_HTTP_POOL_SIZE') or 20)
+GITHUB_HTTP_CACHE_ENTRIES = int(os.getenv('GITHUB_HTTP_CACHE_ENTRIES') or 512)
+GITHUB_HTTP_CACHE_MAX_BODY = int(os.getenv('GITHUB_HTTP_CACHE_MAX_BODY') or 2 * 1024 * 1024)
+GITHUB_HTTP_TIMEOUT = int(os.getenv('GITHUB_HTTP_TIMEOUT') or 30)
+GITHUB_HTTP_MAX_RETRIES = int(os.getenv('GITHUB_HTTP_MAX_RETRIES') or 3)
+# Longest wait accepted before a retry (beyond it the response is returned to the caller)
+GITHUB_HTTP_MAX_BACKOFF = int(os.getenv('GITHUB_HTTP_MAX_BACKOFF') or 60)
+
+_RETRY_STATUS = {500, 502, 503, 504}
+# Transient errors are retried only where repeating the request is harmless
+_IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+_ENDPOINT_PATTERNS = [
+    (re.compile(r'^/repos/[^/]+/[^/]+'), '/repos/:owner/:repo'),
+    (re.compile(r'/contents/.*$'), '/contents/:path'),
+    (re.compile(r'/git/refs?/.*$'), '/git/ref/:ref'),
+    (re.compile(r'/orgs/[^/]+'), '/orgs/:org'),
+    (re.compile(r'/users/[^/]+'), '/users/:user'),
+    (re.compile(r'/\d+(?=/|$)'), '/:id'),
+]
+
+
+def endpoint_name(method: str, url: str) -> str:
+    """Normalized endpoint name used for metrics, e.g. 'GET /repos/:owner/:repo/contents/:path'."""
+    path = re.sub(r'^https?://[^/]+', '', url).split('?', 1)[0]
+    for pattern, replacement in _ENDPOINT_PATTERNS:
+        path = pattern.sub(replacement, path)
+    return f"{method.upper()} {path or '/'}"
+
+
+class GitHubHTTPClient:
+    """Shared, thread-safe HTTP client for GitHub REST calls."""
+
+    def __init__(
+        self,
+        pool_size: int = GITHUB_HTTP_POOL_SIZE,
+        cache_entries: int = GITHUB_HTTP_CACHE_ENTRIES,
+        timeout: int = GITHUB_HTTP_TIMEOUT,
+        max_retries: int = GITHUB_HTTP_MAX_RETRIES,
+        session: Optional[requests.Session] = None,
+        sleep=time.sleep
+    ):
+        self.session = session or requests.Session()
+        if session is None:
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+        self.cache_entries = cache_entries
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._sleep = sleep
+        self._cache: 'OrderedDict[Tuple, Dict[str, Any]]' = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, float]] = {}
+        self._metrics_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Perform a request (same signature as requests.request).
+
+        Non-streaming GETs go through the conditional cache: on a 304 the
+        stored response is returned with status 200 and ``from_cache = True``.
+        """
+        method = method.upper()
+        kwargs.setdefault('timeout', self.timeout)
+        headers = CaseInsensitiveDict(kwargs.pop('headers', None) or {})
+
+        cache_key = None
+        cached = None
+        if method == 'GET' and not kwargs.get('stream') and self.cache_entries > 0:
+            cache_key = self._cache_key(url, kwargs.get('params'), headers)
+            cached = self._cache_get(cache_key)
+            if cached:
+                if cached.get('etag'):
+                    headers['If-None-Match'] = cached['etag']
+                if cached.get('last_modified'):
+                    headers['If-Modified-Since'] = cached['last_modified']
+
+        endpoint = endpoint_name(method, url)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self._send_with_retry(method, url, headers, kwargs)
+        finally:
+            self._record(endpoint, time.perf_counter() - start, response)
+
+        if cache_key is None:
+            return response
+        if response.status_code == 304 and cached:
+            return self._from_cache(cached, response)
+        if response.status_code == 200:
+            self._cache_store(cache_key, response)
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request('DELETE', url, **kwargs)
+
+    def get_metrics(self) -> Dict[str, Dict[str, float]]:
+        """Per-endpoint latency and counters (count, errors, not_modified, avg_ms, max_ms)."""
+        with self._metrics_lock:
+            snapshot = {name: dict(values) for name, values in self._metrics.items()}
+        for values in snapshot.values():
+            values['avg_ms'] = round(values['total_ms'] / values['count'], 2) if values['count'] else 0.0
+        return snapshot
+
+    def reset_metrics(self):
+        with self._metrics_lock:
+            self._metrics.clear()
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    # ------------------------------------------------------------------
+    # Retry
+    # ------------------------------------------------------------------
+
+    def _send_with_retry(self, method: str, url: str, headers, kwargs) -> requests.Response:
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, headers=headers, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= self.max_retries or method not in _IDEMPOTENT_METHODS:
+                    raise
+                delay = min(2 ** attempt, GITHUB_HTTP_MAX_BACKOFF)
+                logger.warning(f"GitHub request error ({e}), retry {attempt + 1}/{self.max_retries} in {delay}s")
+                self._sleep(delay)
+                attempt += 1
+                continue
+
+            delay = self._retry_delay(method, response, attempt)
+            if delay is None or attempt >= self.max_retries:
+                return response
+            logger.warning(
+                f"GitHub responded {response.status_code} for {endpoint_name(method, url)}, "
+                f"retry {attempt + 1}/{self.max_retries} in {delay:.0f}s"
+            )
+            response.close()
+            self._sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _retry_delay(method: str, response: requests.Response, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying, or None if the response must not be retried."""
+        status = response.status_code
+        if status in _RETRY_STATUS and method in _IDEMPOTENT_METHODS:
+            return float(min(2 ** attempt, GITHUB_HTTP_MAX_BACKOFF))
+        if status not in (403, 429):
+            return None
+
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None:
+            # Secondary rate limit: GitHub tells us how long to wait
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                delay = 60.0
+            return delay if delay <= GITHUB_HTTP_MAX_BACKOFF else None
+
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            # Primary quota exhausted: wait only if the reset is close
+            try:
+                delay = float(response.headers.get('X-RateLimit-Reset', 0)) - time.time() + 1
+            except ValueError:
+                return None
+            return max(delay, 1.0) if delay <= GITHUB_HTTP_MAX_BACKOFF else None
+
+        if status == 429 or 'secondary rate limit' in response.text.lower():
+            return float(min(60 * (2 ** attempt), GITHUB_HTTP_MAX_BACKOFF))
+        return None
+
+    # ------------------------------------------------------------------
+    # Conditional cache
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _cache_key(url: str, params, headers) -> Tuple:
+        # Different tokens may see different content, so the auth header is part of the key
+        auth = headers.get('Authorization') or ''
+        auth_hash = hashlib.sha256(auth.encode('utf-8')).hexdigest() if auth else ''
+        if isinstance(params, dict):
+            params = tuple(sorted((str(k), str(v)) for k, v in params.items()))
+        return (url, params or (), auth_hash, headers.get('Accept') or '')
+
+    def _cache_get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+            return entry
+
+    def _cache_store(self, key: Tuple, response: requests.Response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        content = response.content
+        if len(content) > GITHUB_HTTP_CACHE_MAX_BODY:
+            return
+        entry = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'headers': dict(response.headers),
+            'content': content,
+            'encoding': response.encoding,
+            'url': response.url,
+        }
+        with self._cache_lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _from_cache(entry: Dict[str, Any], not_modified: requests.Response) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        # The 304 carries the up-to-date rate limit headers
+        for name, value in not_modified.headers.items():
+            if name.lower().startswith('x-ratelimit-'):
+                response.headers[name] = value
+        response._content = entry['content']
+        response.encoding = entry['encoding']
+        response.url = entry['url']
+        response.request = not_modified.request
+        response.from_cache = True
+        return response
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def _record(self, endpoint: str, elapsed: float, response: Optional[requests.Response]):
+        elapsed_ms = elapsed * 1000
+        with self._metrics_lock:
+            values = self._metrics.setdefault(endpoint, {
+                'count': 0, 'errors': 0, 'not_modified': 0, 'total_ms': 0.0, 'max_ms': 0.0
+            })
+            values['count'] += 1
+            values['total_ms'] += elapsed_ms
+            values['max_ms'] = max(values['max_ms'], elapsed_ms)
+            if response is None or response.status_code >= 400:
+                values['errors'] += 1
+            elif response.status_code == 304:
+                values['not_modified'] += 1
+
+
+_client: Optional[GitHubHTTPClient] = None
+_client_lock = threading.Lock()
+
+
+def get_github_http() -> GitHubHTTPClient:
+    """Process-wide shared GitHub HTTP client (singleton)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GitHubHTTPClient()
+    return _client
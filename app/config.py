@@ -24,6 +24,23 @@ class Config:
         os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'instance')),
         'project_uploads'
     )
+    # Rapporto massimo dimensione estratta / compressa (protezione zip bomb)
+    PROJECT_WORKSPACE_MAX_COMPRESSION_RATIO = int(os.environ.get('PROJECT_WORKSPACE_MAX_COMPRESSION_RATIO') or 200)
+    # Se attivo, un upload ZIP rappresenta l'intero progetto: i file assenti vengono rimossi da GitHub e dal mirror
+    PROJECT_WORKSPACE_ZIP_PRUNES_DELETED = os.environ.get('PROJECT_WORKSPACE_ZIP_PRUNES_DELETED', 'false').lower() in ['true', 'on', '1']
+    # Coda dei sync dopo finalize-upload: 'thread' (worker nel processo web) o 'celery'
+    WORKSPACE_SYNC_QUEUE = os.environ.get('WORKSPACE_SYNC_QUEUE') or 'thread'
+    # Durata massima di uno stream SSE di avanzamento (il client si riconnette)
+    WORKSPACE_SYNC_EVENTS_MAX_SECONDS = int(os.environ.get('WORKSPACE_SYNC_EVENTS_MAX_SECONDS') or 900)
+    
+    # Fan-out notifiche: 'inline' (nella transazione del chiamante) o 'thread' (worker dopo il commit)
+    NOTIFICATION_FANOUT_BACKEND = os.environ.get('NOTIFICATION_FANOUT_BACKEND') or 'inline'
+    # Finestra in cui gli eventi ripetuti dello stesso tipo vengono uniti in un digest (0 = disattivo)
+    NOTIFICATION_DIGEST_WINDOW_SECONDS = int(os.environ.get('NOTIFICATION_DIGEST_WINDOW_SECONDS') or 900)
+    # Contatore notifiche non lette in cache (TTL di sicurezza) e durata dello stream SSE del badge.
+    # Con più worker serve una cache condivisa (CACHE_TYPE=RedisCache): con SimpleCache lo stream conta dal DB
+    NOTIFICATION_UNREAD_CACHE_TIMEOUT = int(os.environ.get('NOTIFICATION_UNREAD_CACHE_TIMEOUT') or 600)
+    NOTIFICATION_STREAM_MAX_SECONDS = int(os.environ.get('NOTIFICATION_STREAM_MAX_SECONDS') or 300)
     
     # Email Configuration (Gmail SMTP)
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
@@ -52,6 +69,20 @@ class Config:
     CACHE_TYPE = os.environ.get('CACHE_TYPE', 'SimpleCache')  # Use 'RedisCache' in production
     CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', 300))  # 5 minutes
     CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL') or os.environ.get('REDIS_URL')
+    # TTL per le chiavi con tag di generazione (invalidate esplicitamente, quindi possono vivere a lungo)
+    CACHE_TAGGED_TIMEOUT = int(os.environ.get('CACHE_TAGGED_TIMEOUT', 3600))  # 1 hour
+    
+    # ============================================
+    # PERFORMANCE PROFILER (opt-in)
+    # ============================================
+    PERF_PROFILER_ENABLED = os.environ.get('PERF_PROFILER_ENABLED', 'false').lower() in ['true', 'on', '1']
+    PERF_PROFILER_TOKEN = os.environ.get('PERF_PROFILER_TOKEN')  # Richiesto da /health/perf (header X-Perf-Token)
+    PERF_N_PLUS_ONE_THRESHOLD = int(os.environ.get('PERF_N_PLUS_ONE_THRESHOLD') or 10)
+    # Budget di query per endpoint, es. "projects.projects_list=8,general.activity_feed=6"
+    PERF_QUERY_BUDGETS = os.environ.get('PERF_QUERY_BUDGETS') or {}
+    PERF_DEFAULT_QUERY_BUDGET = int(os.environ['PERF_DEFAULT_QUERY_BUDGET']) if os.environ.get('PERF_DEFAULT_QUERY_BUDGET') else None
+    # Se attivo, superare il budget solleva un'eccezione (usato nei test) invece di un warning
+    PERF_BUDGET_ENFORCE = os.environ.get('PERF_BUDGET_ENFORCE', 'false').lower() in ['true', 'on', '1']
     
     # ============================================
     # GITHUB INTEGRATION
@@ -60,6 +91,12 @@ class Config:
     GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
     GITHUB_ORG = os.environ.get('GITHUB_ORG')
     GITHUB_DEFAULT_PRIVATE = os.environ.get('GITHUB_DEFAULT_PRIVATE', 'true').lower() in ['true', 'on', '1']
+    # Mirror git persistenti per progetto (usati da GitSyncService al posto di un clone per sync)
+    GIT_MIRROR_MAX_DISK_MB = int(os.environ.get('GIT_MIRROR_MAX_DISK_MB') or 2048)
+    GIT_MIRROR_LOCK_TIMEOUT = int(os.environ.get('GIT_MIRROR_LOCK_TIMEOUT') or 600)
+    # Sync massivo task -> GitHub Issues: worker paralleli e quota lasciata libera per il resto dell'app
+    GITHUB_TASK_SYNC_WORKERS = int(os.environ.get('GITHUB_TASK_SYNC_WORKERS') or 4)
+    GITHUB_RATE_LIMIT_RESERVE = int(os.environ.get('GITHUB_RATE_LIMIT_RESERVE') or 200)
 
     # ============================================
     # AI CONFIGURATION
@@ -71,3 +108,21 @@ class Config:
     # Model names
     DEEPSEEK_MODEL = os.environ.get('DEEPSEEK_MODEL', 'deepseek-chat')
     GROK_MODEL = os.environ.get('GROK_MODEL', 'grok-4-fast')  # ← CAMBIO: grok-4-fast es el default
+    
+    # Cache delle risposte LLM: 'sqlite' (file su disco condiviso dai worker), 'cache' (Flask-Caching/Redis) o 'none'
+    LLM_CACHE_BACKEND = os.environ.get('LLM_CACHE_BACKEND') or 'sqlite'
+    LLM_CACHE_PATH = os.environ.get('LLM_CACHE_PATH')  # Default: instance/llm_cache.sqlite3
+    LLM_CACHE_MAX_MB = int(os.environ.get('LLM_CACHE_MAX_MB') or 64)  # Oltre: espulse le risposte usate meno di recente
+    LLM_CACHE_DEFAULT_TTL = int(os.environ.get('LLM_CACHE_DEFAULT_TTL') or 86400)
+    # TTL per punto di chiamata, es. "hub.document=3600,contextual_help=604800" (0 = non in cache)
+    LLM_CACHE_TTLS = os.environ.get('LLM_CACHE_TTLS') or {}
+
+    # Generazione massiva documenti Hub: worker per job e chiamate AI contemporanee per processo
+    HUB_GENERATION_WORKERS = int(os.environ.get('HUB_GENERATION_WORKERS') or 8)
+    AI_MAX_CONCURRENT_REQUESTS = int(os.environ.get('AI_MAX_CONCURRENT_REQUESTS') or 6)
+    AI_RATE_LIMIT_MAX_RETRIES = int(os.environ.get('AI_RATE_LIMIT_MAX_RETRIES') or 4)  # Retry con backoff su 429/5xx
+
+    # Re-indicizzazione RAG al salvataggio: 'thread' (worker in background) o 'inline'
+    RAG_INDEX_QUEUE = os.environ.get('RAG_INDEX_QUEUE') or 'thread'
+    # Salvataggi ravvicinati dello stesso documento vengono indicizzati una volta sola
+    RAG_INDEX_DEBOUNCE_SECONDS = float(os.environ.get('RAG_INDEX_DEBOUNCE_SECONDS') or 2.0)
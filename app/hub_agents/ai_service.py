@@ -1,4 +1,5 @@
-from app.ai_services import client, CURRENT_MODEL, AI_SERVICE_AVAILABLE
+# Modulo (non i singoli nomi): init_ai_service(app) riassegna client e modello
+from app import ai_services
 from flask import current_app
 import json
 from .document_prompts import get_document_prompt, get_default_prompt
@@ -28,29 +29,13 @@ def get_ai_chat_response(messages, context_doc=None):
             current_app.logger.warning(f"Enhanced AI failed, using fallback: {e}")
     
     # Fallback to original implementation
-    if not AI_SERVICE_AVAILABLE or not client:
+    if not ai_services.AI_SERVICE_AVAILABLE or not ai_services.client:
         return "AI Service non disponibile. Verifica la configurazione."
 
-    system_prompt = (
-        "Sei un AI Startup Mentor esperto. Il tuo obiettivo è guidare il fondatore "
-        "nella creazione di una startup di successo. Sii conciso, pratico e diretto. "
-        "Usa un tono professionale ma incoraggiante."
-    )
-    
-    if context_doc:
-        system_prompt += f"\n\nCONTESTO DOCUMENTO CORRENTE:\n{context_doc}\n\nRispondi tenendo conto di questo contesto."
-
-    # Costruisci la history completa
-    full_messages = [{"role": "system", "content": system_prompt}] + messages
+    full_messages = _chat_messages(messages, context_doc)
 
     try:
-        response = client.chat.completions.create(
-            model=CURRENT_MODEL,
-            messages=full_messages,
-            max_tokens=1000,
-            temperature=0.7
-        )
-        return response.choices[0].message.content
+        return ai_services.create_chat_completion('hub.chat', full_messages, max_tokens=1000, temperature=0.7)
     except Exception as e:
         current_app.logger.error(f"AI Chat Error: {e}")
         return "Mi dispiace, si è verificato un errore nel generare la risposta."
@@ -61,14 +46,111 @@ def generate_document_content(doc_type, project_context):
     doc_type: es. "mvp_definition.md"
     project_context: dict con info sul progetto (nome, pitch, descrizione, categoria, ecc.)
     """
-    if not AI_SERVICE_AVAILABLE or not client:
+    unavailable = document_service_error()
+    if unavailable:
+        return unavailable
+
+    try:
+        content = request_document_content(doc_type, project_context)
+        
+        if not content or content.strip() == "":
+            current_app.logger.warning("AI API returned empty content")
+            return "Errore: Contenuto vuoto generato dal servizio AI."
+        
+        current_app.logger.info(f"Successfully generated content for {doc_type} (length: {len(content)})")
+        return content
+        
+    except Exception as e:
+        current_app.logger.error(f"AI Generation Error: {e}", exc_info=True)
+        return f"Errore nella generazione del contenuto: {str(e)}"
+
+def request_document_content(doc_type, project_context):
+    """
+    Chiamata AI per un documento senza intercettare gli errori dell'API:
+    usata dal job di generazione massiva, che gestisce retry e backoff.
+    """
+    prompt = build_document_prompt(doc_type, project_context)
+    current_app.logger.info(f"Calling AI API with model={ai_services.CURRENT_MODEL}, doc_type={doc_type}")
+    return ai_services.create_chat_completion(
+        'hub.document',
+        [{"role": "user", "content": prompt}],
+        max_tokens=2000,
+        temperature=0.7
+    )
+
+def build_project_context(project):
+    """Costruisci project_context con tutte le informazioni disponibili"""
+    # Usa rewritten_pitch se disponibile, altrimenti pitch
+    pitch_text = project.rewritten_pitch or project.pitch or ""
+    
+    return {
+        "name": project.name or "",
+        "description": project.description or "",
+        "pitch": pitch_text,
+        "rewritten_pitch": project.rewritten_pitch or "",
+        "category": project.category or "",
+        "project_type": project.project_type or "commercial",
+        "ai_mvp_guide": project.ai_mvp_guide or "",
+        "ai_feasibility_analysis": project.ai_feasibility_analysis or ""
+    }
+
+def stream_ai_chat_response(messages, context_doc=None):
+    """
+    Come get_ai_chat_response, ma restituisce un iteratore di token (stream=True).
+    Chiudere l'iteratore interrompe la generazione lato provider.
+    """
+    if ENHANCED_AI_AVAILABLE:
+        try:
+            ai_service = get_ai_service()
+            if ai_service.available:
+                return ai_service.chat_with_context(messages, context=context_doc, stream=True)
+        except Exception as e:
+            current_app.logger.warning(f"Enhanced AI failed, using fallback: {e}")
+
+    if not ai_services.AI_SERVICE_AVAILABLE or not ai_services.client:
+        return iter(["AI Service non disponibile. Verifica la configurazione."])
+
+    return ai_services.stream_chat_completion(_chat_messages(messages, context_doc), max_tokens=1000)
+
+def stream_document_content(doc_type, project_context):
+    """
+    Come generate_document_content, ma restituisce un iteratore di token (stream=True).
+    Il prompt viene costruito subito, la generazione procede man mano che si consuma l'iteratore.
+    """
+    unavailable = document_service_error()
+    if unavailable:
+        return iter([unavailable])
+
+    prompt = build_document_prompt(doc_type, project_context)
+    current_app.logger.info(f"Streaming AI API with model={ai_services.CURRENT_MODEL}, doc_type={doc_type}")
+    return ai_services.stream_chat_completion([{"role": "user", "content": prompt}], max_tokens=2000)
+
+def _chat_messages(messages, context_doc=None):
+    """History completa per la chat: system prompt del mentor (+ documento corrente) e messaggi."""
+    system_prompt = (
+        "Sei un AI Startup Mentor esperto. Il tuo obiettivo è guidare il fondatore "
+        "nella creazione di una startup di successo. Sii conciso, pratico e diretto. "
+        "Usa un tono professionale ma incoraggiante."
+    )
+    
+    if context_doc:
+        system_prompt += f"\n\nCONTESTO DOCUMENTO CORRENTE:\n{context_doc}\n\nRispondi tenendo conto di questo contesto."
+
+    return [{"role": "system", "content": system_prompt}] + messages
+
+def document_service_error():
+    """Messaggio d'errore se il servizio AI non può generare documenti, altrimenti None."""
+    if not ai_services.AI_SERVICE_AVAILABLE or not ai_services.client:
         current_app.logger.warning("AI Service not available or client is None")
         return "AI Service non disponibile. Verifica la configurazione delle API keys."
 
-    if not CURRENT_MODEL:
+    if not ai_services.CURRENT_MODEL:
         current_app.logger.error("CURRENT_MODEL is None - AI service not properly initialized")
         return "Errore: Modello AI non configurato. Verifica la configurazione."
+    return None
 
+def build_document_prompt(doc_type, project_context):
+    """Prompt di generazione per doc_type: prompt specifico se esiste, altrimenti quello generico."""
     # Ottieni il prompt specifico per questo tipo di documento
     specific_prompt = get_document_prompt(doc_type)
     
@@ -114,27 +196,4 @@ def generate_document_content(doc_type, project_context):
         )
         current_app.logger.info(f"Using default prompt for {doc_type}")
 
-    try:
-        current_app.logger.info(f"Calling AI API with model={CURRENT_MODEL}, doc_type={doc_type}")
-        response = client.chat.completions.create(
-            model=CURRENT_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=2000,
-            temperature=0.7
-        )
-        
-        if not response or not response.choices or len(response.choices) == 0:
-            current_app.logger.error("AI API returned empty response")
-            return "Errore: Risposta vuota dal servizio AI."
-        
-        content = response.choices[0].message.content
-        if not content or content.strip() == "":
-            current_app.logger.warning("AI API returned empty content")
-            return "Errore: Contenuto vuoto generato dal servizio AI."
-        
-        current_app.logger.info(f"Successfully generated content for {doc_type} (length: {len(content)})")
-        return content
-        
-    except Exception as e:
-        current_app.logger.error(f"AI Generation Error: {e}", exc_info=True)
-        return f"Errore nella generazione del contenuto: {str(e)}"
+    return prompt
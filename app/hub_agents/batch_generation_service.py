@@ -0,0 +1,285 @@
+"""
+Generazione massiva dei documenti AI Hub ("genera tutto" / "genera categoria").
+
+Il job gira in un thread separato (BackgroundJobRunner, come il sync dei task
+GitHub) e distribuisce i documenti su un pool di worker limitato
+(HUB_GENERATION_WORKERS), così il tempo totale è quello delle chiamate più
+lente invece della somma di ~80 chiamate sequenziali. Le chiamate al provider AI passano da un unico ProviderThrottle per processo: un semaforo
+condiviso tra tutti i job (AI_MAX_CONCURRENT_REQUESTS) e, su rate limit (429),
+una pausa comune con backoff esponenziale (o Retry-After), ripetuta al massimo
+AI_RATE_LIMIT_MAX_RETRIES volte.
+
+Ogni documento viene salvato (commit) e re-indicizzato nel RAG appena pronto.
+Lo stato del job è in {workspace}/{project_id}/hub_generation.json; di default
+vengono generati solo i documenti ancora vuoti, quindi un job interrotto
+riparte dai documenti mancanti.
+"""
+
+import logging
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import current_app
+from openai import APIConnectionError, APIStatusError, RateLimitError
+
+from app.cache import invalidate_project_cache
+from app.extensions import db
+from app.models import Project
+from app.services.background_jobs import BackgroundJobRunner
+from app.workspace_utils import load_hub_generation_state, save_hub_generation_state
+from .ai_service import build_project_context, request_document_content
+from .models import HubDocument, HubProject
+from .structure_generator import HUB_STRUCTURE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_CONCURRENT_REQUESTS = 6
+DEFAULT_MAX_RETRIES = 4
+# Primo intervallo di backoff (raddoppia a ogni tentativo) e attesa massima
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+
+# Job attivi in questo processo, per progetto
+_jobs = BackgroundJobRunner('hub-generation', load_hub_generation_state, save_hub_generation_state)
+
+_throttle = None
+_throttle_guard = threading.Lock()
+# Gli upsert sul vector store vengono serializzati (client non garantito thread-safe)
+_rag_lock = threading.Lock()
+
+
+class ProviderThrottle:
+    """
+    Limite di concorrenza e backoff condivisi verso il provider AI.
+
+    Un 429 mette in pausa tutte le chiamate del processo (non solo quella che
+    l'ha ricevuto), così i worker non continuano a colpire un provider già
+    saturo; gli errori transitori (connessione, 5xx) ritentano solo la
+    chiamata interessata.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+
+    def call(self, func: Callable[[], Any]) -> Tuple[Any, int]:
+        """
+        Esegue func rispettando concorrenza e pause.
+
+        Returns:
+            (risultato, numero di retry effettuati)
+        """
+        retries = 0
+        while True:
+            self._wait_for_pause()
+            delay = 0.0
+            with self._semaphore:
+                try:
+                    return func(), retries
+                except RateLimitError as e:
+                    if retries >= self.max_retries:
+                        raise
+                    pause = self._retry_after(e) or self._backoff(retries)
+                    logger.info(f"AI provider rate limited, pausing calls for {pause:.1f}s")
+                    self._pause(pause)
+                except (APIConnectionError, APIStatusError) as e:
+                    status = getattr(e, 'status_code', None)
+                    if retries >= self.max_retries or (status is not None and status < 500):
+                        raise
+                    delay = self._backoff(retries)
+                    logger.info(f"Transient AI provider error ({e}), retrying in {delay:.1f}s")
+            # L'attesa avviene fuori dal semaforo, così non occupa uno slot di concorrenza
+            if delay:
+                self._sleep(delay)
+            retries += 1
+
+    def _wait_for_pause(self):
+        while True:
+            with self._lock:
+                remaining = self._paused_until - self._clock()
+            if remaining <= 0:
+                return
+            self._sleep(remaining)
+
+    def _pause(self, delay: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + delay)
+
+    @staticmethod
+    def _backoff(retries: int) -> float:
+        delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** retries))
+        return delay * random.uniform(0.8, 1.2)
+
+    @staticmethod
+    def _retry_after(error: RateLimitError) -> Optional[float]:
+        response = getattr(error, 'response', None)
+        value = response.headers.get('retry-after') if response is not None else None
+        try:
+            return min(BACKOFF_MAX_SECONDS, float(value)) if value else None
+        except ValueError:
+            return None
+
+
+def get_provider_throttle(app=None) -> ProviderThrottle:
+    """Throttle condiviso da tutti i job del processo (dimensionato alla prima chiamata)."""
+    global _throttle
+    app = app or current_app._get_current_object()
+    with _throttle_guard:
+        if _throttle is None:
+            _throttle = ProviderThrottle(
+                max_concurrent=max(1, int(app.config.get('AI_MAX_CONCURRENT_REQUESTS', DEFAULT_MAX_CONCURRENT_REQUESTS))),
+                max_retries=int(app.config.get('AI_RATE_LIMIT_MAX_RETRIES', DEFAULT_MAX_RETRIES))
+            )
+        return _throttle
+
+
+class HubBatchGenerationService:
+    """Avvia, esegue e riporta lo stato dei job di generazione massiva dei documenti Hub."""
+
+    @staticmethod
+    def target_documents(hub_project: HubProject, category: Optional[str] = None,
+                         overwrite: bool = False) -> List[Tuple[str, str]]:
+        """Coppie (categoria, filename) da generare: di default solo i documenti ancora vuoti."""
+        categories = {category: HUB_STRUCTURE[category]} if category else HUB_STRUCTURE
+        filled = set()
+        if not overwrite:
+            rows = db.session.query(HubDocument.category, HubDocument.filename).filter(
+                HubDocument.hub_project_id == hub_project.id,
+                HubDocument.content.isnot(None),
+                HubDocument.content != ''
+            ).all()
+            filled = {(row.category, row.filename) for row in rows}
+        return [
+            (folder, filename)
+            for folder, filenames in categories.items()
+            for filename in filenames
+            if (folder, filename) not in filled
+        ]
+
+    @staticmethod
+    def get_status(project_id: int) -> Dict[str, Any]:
+        # Uno stato 'interrupted' rilanciato genera i documenti mancanti
+        return _jobs.get_status(project_id)
+
+    def start(self, hub_project: HubProject, category: Optional[str] = None,
+              overwrite: bool = False, initiated_by: Optional[int] = None) -> Dict[str, Any]:
+        """Avvia il job in background (o restituisce quello già in corso per il progetto)."""
+        project_id = hub_project.project_id
+
+        def prepare():
+            documents = self.target_documents(hub_project, category, overwrite)
+            state = {
+                'job_id': uuid.uuid4().hex,
+                'status': 'running',
+                'initiated_by': initiated_by,
+                'category': category,
+                'overwrite': overwrite,
+                'started_at': datetime.now(timezone.utc).isoformat(),
+                'finished_at': None,
+                'total': len(documents),
+                'generated': 0,
+                'failed': 0,
+                'failed_documents': [],
+                'rate_limit_retries': 0,
+            }
+            return state, lambda app: self.run_job(project_id, hub_project.id, documents, state, app=app)
+
+        return _jobs.start(project_id, prepare)
+
+    def run_job(self, project_id: int, hub_project_id: int, documents: List[Tuple[str, str]],
+                state: Dict[str, Any], app=None) -> Dict[str, Any]:
+        """Genera i documenti indicati con un pool di worker limitato."""
+        app = app or current_app._get_current_object()
+        throttle = get_provider_throttle(app)
+        # Contesto del progetto letto una volta sola, condiviso in sola lettura dai worker
+        project_context = build_project_context(db.session.get(Project, project_id))
+
+        def _generate_one(document: Tuple[str, str]):
+            category, filename = document
+            retries = 0
+            try:
+                content, retries = throttle.call(lambda: request_document_content(filename, project_context))
+                if content and content.strip():
+                    _store_document(hub_project_id, category, filename, content)
+                    invalidate_project_cache(project_id)
+                    _index_document(project_id, filename, content)
+                    return True, retries
+                logger.warning(f"Empty AI content for {filename} (project {project_id})")
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"Hub generation failed for {filename} (project {project_id}): {e}")
+            return False, retries
+
+        def _record(state: Dict[str, Any], document: Tuple[str, str], result):
+            success, retries = result
+            if success:
+                state['generated'] += 1
+            else:
+                state['failed'] += 1
+                state['failed_documents'].append(document[1])
+            state['rate_limit_retries'] += retries
+
+        _jobs.run_items(project_id, state, documents, _generate_one, _record,
+                        max_workers=app.config.get('HUB_GENERATION_WORKERS', DEFAULT_WORKERS), app=app)
+        logger.info(
+            f"Hub generation completed for project {project_id}: "
+            f"{state['generated']} generated, {state['failed']} failed"
+        )
+        return state
+
+
+def _store_document(hub_project_id: int, category: str, filename: str, content: str):
+    """Salva subito il documento generato (commit per documento = progresso persistito)."""
+    now = datetime.utcnow()
+    doc = HubDocument.query.filter_by(
+        hub_project_id=hub_project_id,
+        category=category,
+        filename=filename
+    ).first()
+    if doc is None:
+        doc = HubDocument(
+            hub_project_id=hub_project_id,
+            category=category,
+            filename=filename,
+            version=1,
+            created_at=now
+        )
+        db.session.add(doc)
+    else:
+        doc.version = (doc.version or 0) + 1
+    doc.content = content
+    doc.ai_generated = True
+    doc.updated_at = now
+    db.session.commit()
+
+
+def _index_document(project_id: int, filename: str, content: str):
+    from .routes import get_active_rag_service
+
+    try:
+        with _rag_lock:
+            active_rag = get_active_rag_service()
+            active_rag.initialize()
+            active_rag.upsert_document(project_id, filename, content)
+    except Exception as e:
+        logger.warning(f"RAG indexing failed for {filename} (non-critical): {e}")
+
+
+def is_job_running(project_id: int) -> bool:
+    return _jobs.is_running(project_id)
@@ -0,0 +1,227 @@
+# app/hub_agents/embedding_cache.py
+"""
+Persistent embedding cache shared by the RAG services.
+
+Embeddings are keyed by (model name, SHA-256 of the chunk text): each model
+gets its own directory holding
+- ``vectors.f32``: a memory-mapped float32 matrix of ``max_entries`` rows;
+- ``index.sqlite3``: the key -> row mapping with a last-used timestamp.
+
+The files live in the instance folder, so they survive restarts and are
+shared by every gunicorn worker. When the matrix is full the least recently
+used rows are reused. Writers take an exclusive ``flock`` on a lock file and
+readers a shared one, so a row is never read while another process rewrites
+it (on platforms without ``fcntl`` only threads are serialized).
+
+``encode_with_cache`` looks up every text, encodes only the missing ones in a
+single batched ``encode`` call and stores them: re-indexing a document after
+a small edit only embeds the chunks that actually changed.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - installed with sentence-transformers
+    np = None
+
+try:
+    import fcntl  # Inter-process lock (not available on Windows)
+except ImportError:  # pragma: no cover - platform dependent
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 50000
+# SQLite limits the number of parameters per statement
+_SQL_BATCH = 500
+
+
+def default_cache_dir() -> str:
+    """instance/embedding_cache, next to the Chroma persistence directory."""
+    base_dir = os.path.abspath(os.path.dirname(__file__))
+    return os.environ.get('RAG_EMBEDDING_CACHE_DIR') or os.path.join(base_dir, '..', '..', 'instance', 'embedding_cache')
+
+
+def content_key(text: str) -> str:
+    """Cache key of a chunk (the model is part of the cache directory)."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def open_embedding_cache(model_name: str, embedding_model) -> Optional['EmbeddingCache']:
+    """
+    Cache for ``embedding_model``, or None when disabled
+    (RAG_EMBEDDING_CACHE_MAX_ENTRIES=0), numpy is missing or the files cannot be opened.
+    """
+    max_entries = int(os.environ.get('RAG_EMBEDDING_CACHE_MAX_ENTRIES') or DEFAULT_MAX_ENTRIES)
+    if np is None or max_entries <= 0:
+        return None
+    try:
+        dimension = embedding_model.get_sentence_embedding_dimension()
+        return EmbeddingCache(default_cache_dir(), model_name, dimension, max_entries)
+    except Exception as e:
+        logger.warning(f"Embedding cache disabled: {e}")
+        return None
+
+
+def encode_with_cache(embedding_model, texts: Sequence[str],
+                      cache: Optional['EmbeddingCache'] = None) -> List[List[float]]:
+    """Embeddings for ``texts`` in order, encoding only the texts not already cached."""
+    if not texts:
+        return []
+    if cache is None:
+        return embedding_model.encode(list(texts)).tolist()
+
+    keys = [content_key(text) for text in texts]
+    vectors = cache.get_many(set(keys))
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors and key not in missing:
+            missing[key] = text
+    if missing:
+        encoded = embedding_model.encode(list(missing.values()))
+        fresh = dict(zip(missing.keys(), encoded))
+        try:
+            cache.put_many(fresh)
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+        vectors.update(fresh)
+
+    return [np.asarray(vectors[key], dtype=np.float32).tolist() for key in keys]
+
+
+class EmbeddingCache:
+    """Size-bounded LRU store of embedding vectors for one model."""
+
+    def __init__(self, directory: str, model_name: str, dimension: int,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.model_name = model_name
+        self.dimension = int(dimension)
+        self.max_entries = int(max_entries)
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.directory = os.path.join(directory, f"{safe_name}-{self.dimension}")
+        os.makedirs(self.directory, exist_ok=True)
+        self._index_path = os.path.join(self.directory, 'index.sqlite3')
+        self._vectors_path = os.path.join(self.directory, 'vectors.f32')
+        self._lock_path = os.path.join(self.directory, 'lock')
+        self._thread_lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+        with self._locked(exclusive=True):
+            with self._connection() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS embeddings (
+                        key TEXT PRIMARY KEY,
+                        slot INTEGER NOT NULL UNIQUE,
+                        last_used REAL NOT NULL
+                    )
+                """)
+                conn.execute('CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)')
+                expected_size = self.max_entries * self.dimension * 4
+                if not os.path.exists(self._vectors_path) or os.path.getsize(self._vectors_path) != expected_size:
+                    # First run or capacity changed: start from an empty matrix
+                    conn.execute('DELETE FROM embeddings')
+                    np.memmap(self._vectors_path, dtype=np.float32, mode='w+',
+                              shape=(self.max_entries, self.dimension)).flush()
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode='r+',
+                                  shape=(self.max_entries, self.dimension))
+
+    @contextmanager
+    def _connection(self):
+        conn = sqlite3.connect(self._index_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """Serialize writers against readers (threads and processes)."""
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_many(self, keys) -> Dict[str, 'np.ndarray']:
+        """Cached vectors for the given keys (missing keys are simply absent)."""
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        with self._locked(exclusive=False), self._connection() as conn:
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(
+                    f'SELECT key, slot FROM embeddings WHERE key IN ({placeholders})', batch
+                ).fetchall()
+                for key, slot in rows:
+                    found[key] = np.array(self._vectors[slot])
+                conn.executemany('UPDATE embeddings SET last_used = ? WHERE key = ?',
+                                 [(now, key) for key, _ in rows])
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, vectors: Dict[str, Sequence[float]]):
+        """Store vectors, reusing the least recently used rows when the matrix is full."""
+        now = time.time()
+        with self._locked(exclusive=True), self._connection() as conn:
+            present = set()
+            keys = list(vectors)
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                present.update(row[0] for row in conn.execute(
+                    f'SELECT key FROM embeddings WHERE key IN ({placeholders})', batch
+                ))
+            new_keys = [key for key in keys if key not in present][-self.max_entries:]
+            if not new_keys:
+                return
+
+            # Occupied rows are always 0..count-1: evict only once the matrix is full
+            count = conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+            slots = list(range(count, min(self.max_entries, count + len(new_keys))))
+            shortfall = len(new_keys) - len(slots)
+            if shortfall > 0:
+                evicted = conn.execute(
+                    'SELECT key, slot FROM embeddings ORDER BY last_used LIMIT ?', (shortfall,)
+                ).fetchall()
+                conn.executemany('DELETE FROM embeddings WHERE key = ?', [(key,) for key, _ in evicted])
+                slots.extend(slot for _, slot in evicted)
+
+            for key, slot in zip(new_keys, slots):
+                self._vectors[slot] = np.asarray(vectors[key], dtype=np.float32)
+            self._vectors.flush()
+            conn.executemany(
+                'INSERT INTO embeddings (key, slot, last_used) VALUES (?, ?, ?)',
+                [(key, slot, now) for key, slot in zip(new_keys, slots)]
+            )
+
+    def stats(self) -> Dict[str, int]:
+        with self._connection() as conn:
+            entries = conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        return {
+            'model': self.model_name,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -11,6 +11,9 @@ from typing import List, Dict, Optional, Any, Tuple
 from dataclasses import dataclass
 from functools import lru_cache
 
+from .embedding_cache import encode_with_cache, open_embedding_cache
+from .rag_indexer import chunk_ids, sync_chunks
+
 logger = logging.getLogger(__name__)
 
 # Try to import optional dependencies
@@ -82,8 +85,8 @@ class EnhancedRAGService:
         self._initialized = True
         self._is_ready = False
         
-        # Cache for embeddings
-        self._embedding_cache: Dict[str, List[float]] = {}
+        # Persistent embedding cache (opened with the model)
+        self.embedding_cache = None
     
     def initialize(self) -> bool:
         """
@@ -113,6 +116,7 @@ class EnhancedRAGService:
             # Consider 'all-mpnet-base-v2' for better quality (but slower)
             model_name = os.environ.get('RAG_EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
             self.embedding_model = SentenceTransformer(model_name)
+            self.embedding_cache = open_embedding_cache(model_name, self.embedding_model)
             
             # Initialize text splitter
             if LANGCHAIN_AVAILABLE:
@@ -178,9 +182,8 @@ class EnhancedRAGService:
             )
             
             for i, doc in enumerate(docs):
-                chunk_id = f"{filename}_{i}_{self._hash_content(doc.page_content[:100])}"
                 chunks.append(DocumentChunk(
-                    id=chunk_id,
+                    id="",  # Assigned below from the content hash
                     content=doc.page_content,
                     metadata={
                         "filename": filename,
@@ -200,9 +203,8 @@ class EnhancedRAGService:
                     current_chunk += "\n\n" + para if current_chunk else para
                 else:
                     if current_chunk:
-                        chunk_id = f"{filename}_{chunk_index}_{self._hash_content(current_chunk[:100])}"
                         chunks.append(DocumentChunk(
-                            id=chunk_id,
+                            id="",  # Assigned below from the content hash
                             content=current_chunk,
                             metadata={"filename": filename, "chunk_index": chunk_index}
                         ))
@@ -211,39 +213,29 @@ class EnhancedRAGService:
             
             # Don't forget the last chunk
             if current_chunk:
-                chunk_id = f"{filename}_{chunk_index}_{self._hash_content(current_chunk[:100])}"
                 chunks.append(DocumentChunk(
-                    id=chunk_id,
+                    id="",  # Assigned below from the content hash
                     content=current_chunk,
                     metadata={"filename": filename, "chunk_index": chunk_index}
                 ))
         
+        # Content-derived IDs: an edit only changes the IDs of the chunks it touches
+        for chunk, chunk_id in zip(chunks, chunk_ids(filename, [c.content for c in chunks])):
+            chunk.id = chunk_id
+        
         return chunks
     
     def _generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding with caching."""
-        cache_key = self._hash_content(text)
-        
-        if cache_key in self._embedding_cache:
-            return self._embedding_cache[cache_key]
-        
-        if not self._is_ready or not self.embedding_model:
-            return []
-        
-        embedding = self.embedding_model.encode(text).tolist()
-        
-        # Cache the embedding (limit cache size)
-        if len(self._embedding_cache) < 10000:
-            self._embedding_cache[cache_key] = embedding
-        
-        return embedding
+        """Generate a single embedding (served from the embedding cache when possible)."""
+        embeddings = self._generate_embeddings_batch([text])
+        return embeddings[0] if embeddings else []
     
     def _generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings in batch for efficiency."""
+        """Generate embeddings in batch, encoding only chunks missing from the cache."""
         if not self._is_ready or not self.embedding_model:
             return []
         
-        return self.embedding_model.encode(texts).tolist()
+        return encode_with_cache(self.embedding_model, texts, self.embedding_cache)
     
     def _hash_content(self, content: str) -> str:
         """Generate a short hash for content."""
@@ -276,29 +268,16 @@ class EnhancedRAGService:
             return False
         
         try:
-            # Delete existing chunks for this file
-            try:
-                collection.delete(where={"filename": filename})
-            except Exception:
-                pass
-            
             # Chunk the document
             chunks = self._chunk_document(content, filename)
             if not chunks:
                 logger.warning(f"No chunks generated for {filename}")
+                try:
+                    collection.delete(where={"filename": filename})
+                except Exception:
+                    pass
                 return False
             
-            # Generate embeddings in batch
-            chunk_texts = [c.content for c in chunks]
-            embeddings = self._generate_embeddings_batch(chunk_texts)
-            
-            if not embeddings:
-                logger.error("Failed to generate embeddings")
-                return False
-            
-            # Prepare data for Chroma
-            ids = [c.id for c in chunks]
-            documents = chunk_texts
             metadatas = []
             for c in chunks:
                 meta = c.metadata.copy()
@@ -306,15 +285,17 @@ class EnhancedRAGService:
                     meta.update(metadata)
                 metadatas.append(meta)
             
-            # Add to collection
-            collection.add(
-                ids=ids,
-                documents=documents,
-                embeddings=embeddings,
-                metadatas=metadatas
+            # Diff against the stored chunks: only new chunks are embedded
+            changes = sync_chunks(
+                collection,
+                filename,
+                ids=[c.id for c in chunks],
+                texts=[c.content for c in chunks],
+                metadatas=metadatas,
+                embed=self._generate_embeddings_batch
             )
             
-            logger.info(f"Indexed {len(chunks)} chunks for {filename} in project {project_id}")
+            logger.info(f"Indexed {filename} in project {project_id}: {changes}")
             return True
             
         except Exception as e:
@@ -447,7 +428,8 @@ class EnhancedRAGService:
             return {
                 "project_id": project_id,
                 "total_chunks": count,
-                "collection_name": f"project_{project_id}_docs"
+                "collection_name": f"project_{project_id}_docs",
+                "embedding_cache": self.embedding_cache.stats() if self.embedding_cache else None
             }
         except Exception as e:
             return {"error": str(e)}
@@ -0,0 +1,163 @@
+# app/hub_agents/rag_indexer.py
+"""
+Incremental RAG indexing of Hub documents.
+
+Chunk IDs are derived from the chunk content (``{filename}#{hash}``), so an
+edit only changes the IDs of the chunks it touches. ``sync_chunks`` diffs the
+chunks stored for a document with the new ones: only added chunks are
+embedded and inserted, only removed chunks are deleted, and chunks that just
+moved get a metadata update (no embedding).
+
+Saving a document no longer indexes inside the request: ``RAGIndexQueue``
+debounces saves per (project, filename) and a background worker indexes the
+latest content once the document has been quiet for RAG_INDEX_DEBOUNCE_SECONDS.
+
+Backends (RAG_INDEX_QUEUE):
+- 'thread' (default): one worker thread per process;
+- 'inline': index inside the request (tests and development).
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEBOUNCE_SECONDS = 2.0
+
+# Pending saves: (project_id, filename) -> (latest content, due time)
+_pending: Dict[Tuple[int, str], Tuple[str, float]] = {}
+_condition = threading.Condition()
+_worker: Optional[threading.Thread] = None
+
+
+def chunk_ids(filename: str, texts: Sequence[str]) -> List[str]:
+    """Content-derived chunk IDs; repeated identical chunks get an occurrence suffix."""
+    seen: Dict[str, int] = {}
+    ids = []
+    for text in texts:
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(f"{filename}#{digest}" + (f"-{occurrence}" if occurrence else ""))
+    return ids
+
+
+def sync_chunks(
+    collection,
+    filename: str,
+    ids: Sequence[str],
+    texts: Sequence[str],
+    metadatas: Sequence[Dict],
+    embed: Callable[[List[str]], List[List[float]]]
+) -> Dict[str, int]:
+    """
+    Bring the chunks stored for ``filename`` in line with the given ones.
+
+    Returns:
+        Counts of added, removed, updated (metadata only) and unchanged chunks
+    """
+    existing = collection.get(where={"filename": filename}, include=["metadatas"])
+    stored = dict(zip(existing.get('ids') or [], existing.get('metadatas') or []))
+    wanted = set(ids)
+
+    removed = [chunk_id for chunk_id in stored if chunk_id not in wanted]
+    if removed:
+        collection.delete(ids=removed)
+
+    added = [i for i, chunk_id in enumerate(ids) if chunk_id not in stored]
+    if added:
+        embeddings = embed([texts[i] for i in added])
+        if len(embeddings) != len(added):
+            raise RuntimeError("Failed to generate embeddings")
+        collection.add(
+            ids=[ids[i] for i in added],
+            documents=[texts[i] for i in added],
+            embeddings=embeddings,
+            metadatas=[metadatas[i] for i in added]
+        )
+
+    moved = [i for i, chunk_id in enumerate(ids) if chunk_id in stored and stored[chunk_id] != metadatas[i]]
+    if moved:
+        collection.update(ids=[ids[i] for i in moved], metadatas=[metadatas[i] for i in moved])
+
+    return {
+        'added': len(added),
+        'removed': len(removed),
+        'updated': len(moved),
+        'unchanged': len(ids) - len(added) - len(moved),
+    }
+
+
+def index_document_now(project_id: int, filename: str, content: str) -> bool:
+    """Index a document with the best available RAG service (inside an app context)."""
+    from .routes import get_active_rag_service
+
+    active_rag = get_active_rag_service()
+    active_rag.initialize()
+    return active_rag.upsert_document(project_id, filename, content)
+
+
+class RAGIndexQueue:
+    """Debounced, off-request re-indexing of saved documents."""
+
+    def enqueue(self, project_id: int, filename: str, content: str) -> str:
+        """
+        Schedule the indexing of ``content``, replacing any pending save of the same document.
+
+        Returns:
+            'queued', 'coalesced' (a pending save was replaced) or 'indexed' (inline backend)
+        """
+        app = current_app._get_current_object()
+        if app.config.get('RAG_INDEX_QUEUE', 'thread') == 'inline':
+            index_document_now(project_id, filename, content)
+            return 'indexed'
+
+        debounce = float(app.config.get('RAG_INDEX_DEBOUNCE_SECONDS', DEFAULT_DEBOUNCE_SECONDS))
+        key = (project_id, filename)
+        with _condition:
+            coalesced = key in _pending
+            _pending[key] = (content, time.monotonic() + debounce)
+            self._ensure_worker(app)
+            _condition.notify()
+        return 'coalesced' if coalesced else 'queued'
+
+    def _ensure_worker(self, app):
+        """Start the worker if it is not running (call with _condition held)."""
+        global _worker
+        if _worker is not None and _worker.is_alive():
+            return
+        _worker = threading.Thread(target=self._work, args=(app,), name="rag-indexer", daemon=True)
+        _worker.start()
+
+    def _work(self, app):
+        """Index documents once their debounce window has elapsed; exit when idle."""
+        global _worker
+        while True:
+            with _condition:
+                while True:
+                    if not _pending:
+                        _worker = None
+                        return
+                    key, (content, due) = min(_pending.items(), key=lambda item: item[1][1])
+                    remaining = due - time.monotonic()
+                    if remaining <= 0:
+                        del _pending[key]
+                        break
+                    _condition.wait(remaining)
+
+            project_id, filename = key
+            with app.app_context():
+                try:
+                    index_document_now(project_id, filename, content)
+                except Exception as e:
+                    logger.warning(f"RAG indexing failed for {filename} (project {project_id}): {e}")
+
+
+def pending_count() -> int:
+    with _condition:
+        return len(_pending)
@@ -2,6 +2,9 @@ import os
 import logging
 from flask import current_app
 
+from .embedding_cache import encode_with_cache, open_embedding_cache
+from .rag_indexer import chunk_ids, sync_chunks
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -34,6 +37,8 @@ class RAGService:
             # Initialize Embedding Model (downloaded on first run)
             # 'all-MiniLM-L6-v2' is fast and good for general purpose
             self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            # Persistent cache: unchanged paragraphs are not re-embedded on upsert
+            self.embedding_cache = open_embedding_cache('all-MiniLM-L6-v2', self.embedding_model)
             
             self.initialized = True
             logger.info(f"RAG Service initialized. DB Path: {persist_dir}")
@@ -59,11 +64,12 @@ class RAGService:
     def _generate_embeddings(self, texts):
         if not self.initialized:
             return []
-        return self.embedding_model.encode(texts).tolist()
+        return encode_with_cache(self.embedding_model, texts, self.embedding_cache)
 
     def upsert_document(self, project_id, doc_filename, content):
         """
         Splits document into chunks and indexes them.
+        Only chunks added by the edit are embedded; removed ones are deleted.
         """
         if not self.initialized or not content.strip():
             return False
@@ -73,47 +79,19 @@ class RAGService:
             return False
 
         # Simple chunking strategy: Split by double newlines (paragraphs)
-        # then group if too small.
         paragraphs = [p.strip() for p in content.split('\n\n') if p.strip()]
         
         if not paragraphs:
             return False
 
-        # Prepare data for Chroma
-        ids = []
-        documents = []
-        metadatas = []
-        embeddings = []
-
-        # First, delete existing entries for this file to avoid duplicates
-        # Chroma doesn't support "delete by metadata" easily in all versions, 
-        # but we can try to manage IDs deterministically or just query-delete.
-        # For simplicity in this MVP, we might just append, but that causes bloat.
-        # Better: Use filename in ID.
-        
-        # Let's delete old chunks for this file first
-        try:
-            collection.delete(where={"filename": doc_filename})
-        except Exception:
-            pass # Collection might be empty
-
-        for i, para in enumerate(paragraphs):
-            chunk_id = f"{doc_filename}_{i}"
-            ids.append(chunk_id)
-            documents.append(para)
-            metadatas.append({"filename": doc_filename, "chunk_index": i})
-        
-        # Generate embeddings in batch
-        embeddings = self._generate_embeddings(documents)
+        # IDs derive from the paragraph content, so inserting a paragraph
+        # does not shift the IDs of the others
+        ids = chunk_ids(doc_filename, paragraphs)
+        metadatas = [{"filename": doc_filename, "chunk_index": i} for i in range(len(paragraphs))]
 
         try:
-            collection.add(
-                ids=ids,
-                documents=documents,
-                embeddings=embeddings,
-                metadatas=metadatas
-            )
-            logger.info(f"Indexed {len(documents)} chunks for {doc_filename}")
+            changes = sync_chunks(collection, doc_filename, ids, paragraphs, metadatas, self._generate_embeddings)
+            logger.info(f"Indexed {doc_filename}: {changes}")
             return True
         except Exception as e:
             logger.error(f"Error indexing document {doc_filename}: {e}")
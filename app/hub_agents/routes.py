@@ -1,16 +1,25 @@
-from flask import render_template, jsonify, request, current_app, make_response
+from flask import render_template, jsonify, request, current_app, make_response, Response
 from flask_login import current_user, login_required
 from . import hub_agents_bp
 from .models import HubProject, HubDocument
 from .structure_generator import generate_hub_structure, HUB_STRUCTURE
-from .ai_service import get_ai_chat_response, generate_document_content
+from .ai_service import (
+    get_ai_chat_response, generate_document_content, stream_ai_chat_response, stream_document_content,
+    build_project_context, document_service_error
+)
+from .batch_generation_service import HubBatchGenerationService
 from .rag_service import rag_service
+from .rag_indexer import RAGIndexQueue
 from app.models import Project
 from app.extensions import db
 from app.decorators import project_member_required
-from app.cache import cache, make_project_structure_key, invalidate_project_cache, make_document_cache_key
+from app.cache import (
+    cache, make_project_structure_key, invalidate_project_cache, make_document_cache_key,
+    tagged_key, tagged_timeout, project_tag, project_documents_tag
+)
 import os
 import io
+import json
 import markdown
 from xhtml2pdf import pisa
 from datetime import datetime
@@ -121,17 +130,29 @@ def chat_message():
     """
     Endpoint per la chat AI contestuale.
     """
-    data = request.json
+    history, full_context = _prepare_chat(request.json)
+    
+    response = get_ai_chat_response(history, full_context)
+    
+    return jsonify({"response": response})
+
+@hub_agents_bp.route('/chat/message/stream', methods=['POST'])
+@login_required
+@project_member_required
+def chat_message_stream():
+    """
+    Chat AI contestuale in streaming (SSE): i token arrivano man mano che vengono generati.
+    """
+    history, full_context = _prepare_chat(request.json)
+    return _sse_token_stream(stream_ai_chat_response(history, full_context), 'chat')
+
+def _prepare_chat(data):
+    """History (con il messaggio corrente) e contesto completo (documento + RAG) per la chat."""
     user_msg = data.get('message')
-    context_doc = data.get('context_doc')
+    context_doc = data.get('context_doc') or ""
     history = data.get('history', []) # List of {role, content}
     
-    # RAG: Retrieve relevant context
-    # Assumiamo che project_id sia nella sessione o passato nel body. 
-    # Per ora lo prendiamo dal referer o lo aggiungiamo al JS.
-    # Ma wait, il JS non manda project_id. Dobbiamo aggiungerlo.
-    # Per ora proviamo a estrarlo se possibile, o modifichiamo il JS.
-    # Modificherò il JS per inviare project_id.
+    # RAG: Retrieve relevant context (il JS invia project_id nel body)
     project_id = data.get('project_id') 
     
     rag_context = ""
@@ -147,10 +168,44 @@ def chat_message():
 
     # Aggiungi il messaggio corrente alla history
     history.append({"role": "user", "content": user_msg})
-    
-    response = get_ai_chat_response(history, full_context)
-    
-    return jsonify({"response": response})
+    return history, full_context
+
+def _sse_token_stream(tokens, label):
+    """
+    Inoltra al client i token di un iteratore AI come eventi SSE:
+    ``data: {"token": ...}`` per ogni token, poi ``event: done`` (o ``event: error``).
+
+    Se il client si disconnette il server WSGI chiude la risposta: la chiusura
+    arriva al generatore dei token, che chiude lo stream verso il provider e
+    ferma la generazione (e i token fatturati).
+    """
+    # Il generatore gira dopo la fine del contesto di richiesta: logger catturato qui
+    logger = current_app.logger
+
+    def generate():
+        produced = 0
+        try:
+            for token in tokens:
+                produced += len(token)
+                yield f"data: {json.dumps({'token': token})}\n\n"
+            if produced:
+                yield 'event: done\ndata: {}\n\n'
+            else:
+                logger.warning(f"AI stream ({label}) returned empty content")
+                yield 'event: error\ndata: {"error": "Contenuto vuoto generato dal servizio AI."}\n\n'
+        except Exception as e:
+            logger.error(f"AI stream ({label}) error: {e}", exc_info=True)
+            yield f"event: error\ndata: {json.dumps({'error': 'Errore nella generazione del contenuto.'})}\n\n"
+        finally:
+            close = getattr(tokens, 'close', None)
+            if close:
+                close()
+            logger.info(f"AI stream ({label}) closed after {produced} chars")
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @hub_agents_bp.route('/api/structure/<int:project_id>')
 @login_required
@@ -164,7 +219,7 @@ def get_project_structure(project_id):
     Uses caching for improved performance.
     """
     # Try to get from cache first
-    cache_key = make_project_structure_key(project_id)
+    cache_key = tagged_key(make_project_structure_key(project_id), project_tag(project_id))
     cached_structure = cache.get(cache_key)
     if cached_structure is not None:
         return jsonify(cached_structure)
@@ -212,8 +267,8 @@ def get_project_structure(project_id):
     # 3. Ordina le categorie alfabeticamente per stabilità
     sorted_structure = {k: structure[k] for k in sorted(structure)}
     
-    # Cache the result for 5 minutes
-    cache.set(cache_key, sorted_structure, timeout=300)
+    # Cache the result (invalidated by the project generation bump)
+    cache.set(cache_key, sorted_structure, timeout=tagged_timeout())
     
     return jsonify(sorted_structure)
 
@@ -294,22 +349,9 @@ def generate_content():
             current_app.logger.error(f"generate_content: Project {project_id} not found")
             return jsonify({"error": "Project not found", "content": ""}), 404
             
-        # Costruisci project_context con tutte le informazioni disponibili
-        # Usa rewritten_pitch se disponibile, altrimenti pitch
-        pitch_text = project.rewritten_pitch or project.pitch or ""
-        
-        project_context = {
-            "name": project.name or "",
-            "description": project.description or "",
-            "pitch": pitch_text,
-            "rewritten_pitch": project.rewritten_pitch or "",
-            "category": project.category or "",
-            "project_type": project.project_type or "commercial",
-            "ai_mvp_guide": project.ai_mvp_guide or "",
-            "ai_feasibility_analysis": project.ai_feasibility_analysis or ""
-        }
+        project_context = build_project_context(project)
         
-        current_app.logger.info(f"generate_content: Project context - name={project_context['name']}, category={project_context['category']}, has_pitch={bool(pitch_text)}, has_ai_guide={bool(project_context['ai_mvp_guide'])}")
+        current_app.logger.info(f"generate_content: Project context - name={project_context['name']}, category={project_context['category']}, has_pitch={bool(project_context['pitch'])}, has_ai_guide={bool(project_context['ai_mvp_guide'])}")
         
         current_app.logger.info(f"generate_content: Generating content for doc_type={doc_type}, project_id={project_id}")
         content = generate_document_content(doc_type, project_context)
@@ -344,6 +386,67 @@ def generate_content():
         current_app.logger.error(f"Error in generate_content: {e}", exc_info=True)
         return jsonify({"error": str(e), "content": "Errore nella generazione del contenuto."}), 500
 
+@hub_agents_bp.route('/generate/content/stream', methods=['POST'])
+@login_required
+@project_member_required
+def generate_content_stream():
+    """
+    Genera il contenuto di un documento in streaming (SSE).
+    """
+    data = request.json
+    if not data:
+        return jsonify({"error": "Invalid request data", "content": ""}), 400
+    
+    project_id = data.get('project_id')
+    doc_type = data.get('doc_type')
+    if not project_id:
+        return jsonify({"error": "Project ID is required", "content": ""}), 400
+    if not doc_type:
+        return jsonify({"error": "Document type is required", "content": ""}), 400
+    
+    project = Project.query.get(project_id)
+    if not project:
+        return jsonify({"error": "Project not found", "content": ""}), 404
+    
+    current_app.logger.info(f"generate_content_stream: Streaming content for doc_type={doc_type}, project_id={project_id}")
+    return _sse_token_stream(stream_document_content(doc_type, build_project_context(project)), doc_type)
+
+@hub_agents_bp.route('/api/generate/all/<int:project_id>', methods=['POST'])
+@login_required
+@project_member_required
+def generate_all_documents(project_id):
+    """
+    Avvia la generazione AI di tutti i documenti (o di una sola categoria) in background.
+    Body JSON opzionale: {"category": "...", "overwrite": false}.
+    Lo stato si legge da /api/generate/all/<project_id>/status.
+    """
+    data = request.get_json(silent=True) or {}
+    category = data.get('category') or None
+    overwrite = bool(data.get('overwrite', False))
+
+    if category and category not in HUB_STRUCTURE:
+        return jsonify({'status': 'error', 'message': f'Unknown category: {category}'}), 400
+
+    hub_project = HubProject.query.filter_by(project_id=project_id).first()
+    if not hub_project:
+        return jsonify({'status': 'error', 'message': 'Hub not activated for this project'}), 404
+
+    unavailable = document_service_error()
+    if unavailable:
+        return jsonify({'status': 'error', 'message': unavailable}), 503
+
+    state = HubBatchGenerationService().start(
+        hub_project, category=category, overwrite=overwrite, initiated_by=current_user.id
+    )
+    return jsonify(state), 202
+
+@hub_agents_bp.route('/api/generate/all/<int:project_id>/status')
+@login_required
+@project_member_required
+def generate_all_documents_status(project_id):
+    """Stato dell'ultimo job di generazione massiva del progetto."""
+    return jsonify(HubBatchGenerationService.get_status(project_id))
+
 @hub_agents_bp.route('/save/document', methods=['POST'])
 @login_required
 @project_member_required
@@ -398,12 +501,10 @@ def save_document():
         # Invalidate cache when document is saved
         invalidate_project_cache(project_id)
         
-        # RAG: Index the document using enhanced service
+        # RAG: re-indicizzazione incrementale in background (debounce per documento)
         try:
-            active_rag = get_active_rag_service()
-            active_rag.initialize()
-            active_rag.upsert_document(project_id, filename, content)
-            current_app.logger.info(f"save_document: RAG indexed successfully")
+            rag_status = RAGIndexQueue().enqueue(project_id, filename, content or "")
+            current_app.logger.info(f"save_document: RAG indexing {rag_status}")
         except Exception as rag_error:
             current_app.logger.warning(f"save_document: RAG indexing failed (non-critical): {rag_error}")
         
@@ -434,7 +535,10 @@ def load_document():
             return jsonify({"error": "Missing parameters", "content": ""}), 400
         
         # Try cache first
-        cache_key = make_document_cache_key(int(project_id), filename)
+        cache_key = tagged_key(
+            make_document_cache_key(int(project_id), filename),
+            project_tag(project_id), project_documents_tag(project_id)
+        )
         cached_content = cache.get(cache_key)
         if cached_content is not None:
             current_app.logger.info(f"load_document: Cache hit for {filename}")
@@ -450,7 +554,7 @@ def load_document():
         if doc and doc.content:
             current_app.logger.info(f"load_document: Found in DB - filename={filename}, content_length={len(doc.content)}")
             # Cache the content
-            cache.set(cache_key, doc.content, timeout=300)
+            cache.set(cache_key, doc.content, timeout=tagged_timeout())
             return jsonify({"content": doc.content, "source": "db"})
             
         # 2. Se non in DB, cerca su disco (template iniziale)
@@ -475,7 +579,7 @@ def load_document():
         
         if found:
             # Cache the content from disk
-            cache.set(cache_key, file_content, timeout=300)
+            cache.set(cache_key, file_content, timeout=tagged_timeout())
             return jsonify({"content": file_content, "source": "disk"})
         
         current_app.logger.info(f"load_document: File not found - filename={filename}, returning empty content")
@@ -14,6 +14,12 @@ class Notification(db.Model):
     message = db.Column(db.String(500), nullable=False)
     is_read = db.Column(db.Boolean, default=False)
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    event_count = db.Column(db.Integer, default=1, nullable=False)  # Eventi uniti in questa notifica (digest)
+
+    # Ricerca delle notifiche digest ancora aperte per progetto/tipo
+    __table_args__ = (
+        db.Index('ix_notification_digest', 'project_id', 'type', 'is_read', 'timestamp'),
+    )
 
     user = db.relationship('User', backref='notifications')
     project = db.relationship('Project', backref='notifications')
@@ -462,6 +468,7 @@ class Project(db.Model):
     
     status = db.Column(db.String(50), nullable=False, default='open', index=True)
     endorsement_count = db.Column(db.Integer, default=0, nullable=False)
+    vote_count = db.Column(db.Integer, default=0, nullable=False)  # Voti community (mantenuto da leaderboard_service)
     private = db.Column(db.Boolean, default=False, nullable=False)  # --- NUOVO CAMPO per progetti privati ---
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
     
@@ -470,6 +477,7 @@ class Project(db.Model):
         db.Index('ix_project_private_created_at', 'private', 'created_at'),
         db.Index('ix_project_category_private', 'category', 'private'),
         db.Index('ix_project_type_private', 'project_type', 'private'),
+        db.Index('ix_project_private_votes', 'private', 'vote_count', 'created_at'),
     )
     
     creator = db.relationship('User', back_populates='projects')
@@ -767,6 +775,47 @@ class ProjectRepository(db.Model):
     def __repr__(self):
         return f"<ProjectRepository project={self.project_id} provider={self.provider} status={self.status}>"
 
+
+class WorkspaceSession(db.Model):
+    """Indice delle sessioni di upload del workspace (metadata.json in DB)"""
+    __tablename__ = 'workspace_session'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False, index=True)
+    session_id = db.Column(db.String(64), nullable=False, unique=True)
+    upload_type = db.Column(db.String(30), nullable=False, default='manual')
+    status = db.Column(db.String(30), nullable=False, default='pending')
+    data = db.Column(db.JSON, nullable=False)  # Copia completa dei metadata della sessione
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        db.Index('ix_workspace_session_project_created', 'project_id', 'created_at'),
+        db.Index('ix_workspace_session_project_status', 'project_id', 'status'),
+    )
+    
+    def __repr__(self):
+        return f"<WorkspaceSession {self.session_id} project={self.project_id} status={self.status}>"
+
+
+class WorkspaceHistoryEntry(db.Model):
+    """Storico delle sincronizzazioni del workspace (sostituisce history.json)"""
+    __tablename__ = 'workspace_history_entry'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
+    session_id = db.Column(db.String(64), nullable=True)
+    status = db.Column(db.String(30), nullable=True)
+    data = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        db.Index('ix_workspace_history_project_created', 'project_id', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f"<WorkspaceHistoryEntry project={self.project_id} session={self.session_id} status={self.status}>"
+
 class Task(db.Model):
     __tablename__ = 'task'
     id = db.Column(db.Integer, primary_key=True)
@@ -1085,33 +1134,87 @@ class WikiPage(db.Model):
             parent_id=None
         ).order_by(WikiPage.is_folder.desc(), WikiPage.display_order, WikiPage.title).all()
     
+    @staticmethod
+    def _tree_rows(project_id):
+        """
+        Carica con una sola query le colonne leggere di tutte le pagine del progetto
+        (niente content), già ordinate per la visualizzazione ad albero.
+        """
+        return db.session.query(
+            WikiPage.id,
+            WikiPage.parent_id,
+            WikiPage.title,
+            WikiPage.slug,
+            WikiPage.is_folder,
+            WikiPage.display_order,
+            WikiPage.created_at,
+            WikiPage.updated_at,
+            User.username.label('creator_username')
+        ).outerjoin(User, User.id == WikiPage.created_by).filter(
+            WikiPage.project_id == project_id
+        ).order_by(WikiPage.is_folder.desc(), WikiPage.display_order, WikiPage.title).all()
+    
+    @staticmethod
+    def _build_path_map(rows):
+        """Calcola in memoria i percorsi "Cartella1 / Cartella2 / Pagina" a partire dalla mappa degli antenati"""
+        by_id = {row.id: row for row in rows}
+        paths = {}
+        for page_id in by_id:
+            chain = []
+            seen = set()
+            current = page_id
+            # Risale gli antenati fino a un percorso già noto (o alla root)
+            while current is not None and current not in paths and current not in seen and current in by_id:
+                seen.add(current)
+                chain.append(by_id[current])
+                current = by_id[current].parent_id
+            prefix = paths.get(current, '') if current is not None else ''
+            for row in reversed(chain):
+                prefix = f"{prefix} / {row.title}" if prefix else row.title
+                paths[row.id] = prefix
+        return paths
+    
+    @staticmethod
+    def get_path_strings(project_id):
+        """Restituisce {page_id: percorso completo} per tutte le pagine del progetto con una sola query"""
+        return WikiPage._build_path_map(WikiPage._tree_rows(project_id))
+    
     @staticmethod
     def get_tree_structure(project_id):
-        """Restituisce la struttura ad albero completa del wiki del progetto"""
-        def build_tree(parent_id=None):
-            items = WikiPage.query.filter_by(
-                project_id=project_id,
-                parent_id=parent_id
-            ).order_by(WikiPage.is_folder.desc(), WikiPage.display_order, WikiPage.title).all()
-            
-            result = []
-            for item in items:
-                node = {
-                    'id': item.id,
-                    'title': item.title,
-                    'slug': item.slug,
-                    'is_folder': item.is_folder,
-                    'content': item.content if not item.is_folder else '',  # Stringa vuota per cartelle
-                    'created_at': item.created_at,
-                    'updated_at': item.updated_at,
-                    'creator': item.creator.username,
-                    'path': item.get_full_path_string(),
-                    'children': build_tree(item.id) if item.is_folder else []
-                }
-                result.append(node)
-            return result
+        """
+        Restituisce la struttura ad albero completa del wiki del progetto.
+        L'albero è costruito in memoria da un'unica query ordinata; il contenuto
+        delle pagine non viene caricato (si legge solo quando la pagina viene aperta).
+        """
+        rows = WikiPage._tree_rows(project_id)
+        paths = WikiPage._build_path_map(rows)
+        
+        nodes = {}
+        for row in rows:
+            nodes[row.id] = {
+                'id': row.id,
+                'title': row.title,
+                'slug': row.slug,
+                'is_folder': row.is_folder,
+                'parent_id': row.parent_id,
+                'display_order': row.display_order,
+                'created_at': row.created_at,
+                'updated_at': row.updated_at,
+                'creator': row.creator_username,
+                'path': paths.get(row.id, row.title),
+                'children': []
+            }
         
-        return build_tree()
+        tree = []
+        # Le righe sono già ordinate: l'ordine dei figli segue quello della query
+        for row in rows:
+            if row.parent_id is None:
+                tree.append(nodes[row.id])
+                continue
+            parent = nodes.get(row.parent_id)
+            if parent is not None and parent['is_folder']:
+                parent['children'].append(nodes[row.id])
+        return tree
 
 class WikiRevision(db.Model):
     """Modello per la cronologia delle modifiche delle pagine Wiki"""
@@ -1163,6 +1266,10 @@ class InvestmentProject(db.Model):
     available_equity_percentage = db.Column(db.Float, default=10.0)  # % di equity disponibile per gli investitori
     equity_price_per_percent = db.Column(db.Float, default=100.0)  # Prezzo per 1% di equity (in €)
     is_active = db.Column(db.Boolean, default=True)  # Se il progetto è ancora attivo per investimenti
+    # Contatori degli investimenti (mantenuti da leaderboard_service nella stessa transazione)
+    total_invested = db.Column(db.Float, default=0.0, nullable=False)
+    equity_sold = db.Column(db.Float, default=0.0, nullable=False)
+    investors_count = db.Column(db.Integer, default=0, nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     
     project = db.relationship('Project', backref='investment_listings')
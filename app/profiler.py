@@ -0,0 +1,256 @@
+# app/profiler.py
+"""
+Request-level performance profiler for KickthisUSs (opt-in).
+
+When ``PERF_PROFILER_ENABLED`` is set, every request records:
+
+- number of SQL statements and total time spent in the database
+  (SQLAlchemy ``before/after_cursor_execute``);
+- N+1 patterns: the same statement shape executed more than
+  ``PERF_N_PLUS_ONE_THRESHOLD`` times in a single request;
+- time spent rendering templates (Flask template signals);
+- total request time.
+
+Each response carries a ``Server-Timing`` header, and per-endpoint aggregates
+are kept in process memory and exposed by ``/health/perf``. Per-endpoint
+query budgets (``PERF_QUERY_BUDGETS``) are logged when exceeded, and raise
+``QueryBudgetExceeded`` when ``PERF_BUDGET_ENFORCE`` is on (as in the test
+suite), so a regression in query count fails the test that hit the endpoint.
+"""
+
+import re
+import threading
+import time
+
+from flask import before_render_template, current_app, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Shape con più di N esecuzioni nella stessa richiesta = sospetto N+1
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+# Esempi di shape N+1 conservati per endpoint
+MAX_N_PLUS_ONE_SAMPLES = 5
+
+_IN_LIST_RE = re.compile(r"\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))+\s*\)")
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_engine_listeners_registered = False
+_stats_lock = threading.Lock()
+_endpoint_stats = {}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when an endpoint runs more SQL statements than its budget allows."""
+
+
+class RequestProfile:
+    """Measurements collected while serving a single request."""
+
+    __slots__ = ('started_at', 'query_count', 'db_time', 'template_time',
+                 'statement_counts', '_template_starts')
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.statement_counts = {}
+        self._template_starts = []
+
+    def record_query(self, statement, duration):
+        self.query_count += 1
+        self.db_time += duration
+        shape = statement_shape(statement)
+        self.statement_counts[shape] = self.statement_counts.get(shape, 0) + 1
+
+    def n_plus_one(self, threshold):
+        """Statement shapes executed more than ``threshold`` times, most frequent first."""
+        repeated = [(shape, count) for shape, count in self.statement_counts.items() if count > threshold]
+        return sorted(repeated, key=lambda item: item[1], reverse=True)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+
+def statement_shape(statement):
+    """
+    Normalize a SQL statement so that executions differing only in bound
+    values (or IN-list length) share the same shape.
+    """
+    shape = _IN_LIST_RE.sub('(?)', statement)
+    shape = _LITERAL_RE.sub('?', shape)
+    return _WHITESPACE_RE.sub(' ', shape).strip()
+
+
+def current_profile():
+    """Return the RequestProfile of the current request, if profiling is active."""
+    if not has_request_context():
+        return None
+    return g.get('_perf_profile')
+
+
+# ============================================
+# SQLAlchemy / template hooks
+# ============================================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile() is not None:
+        conn.info.setdefault('_perf_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile()
+    starts = conn.info.get('_perf_query_start')
+    if profile is None or not starts:
+        return
+    profile.record_query(statement, time.perf_counter() - starts.pop())
+
+
+def _before_render_template(sender, template, context, **extra):
+    profile = current_profile()
+    if profile is not None:
+        profile._template_starts.append(time.perf_counter())
+
+
+def _template_rendered(sender, template, context, **extra):
+    profile = current_profile()
+    if profile is not None and profile._template_starts:
+        profile.template_time += time.perf_counter() - profile._template_starts.pop()
+
+
+# ============================================
+# Request lifecycle
+# ============================================
+
+def _start_request_profile():
+    g._perf_profile = RequestProfile()
+
+
+def _finish_request_profile(response):
+    profile = g.pop('_perf_profile', None)
+    if profile is None:
+        return response
+
+    endpoint = request.endpoint or 'unknown'
+    total_time = profile.elapsed()
+    threshold = current_app.config.get('PERF_N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+    repeated = profile.n_plus_one(threshold)
+
+    response.headers['Server-Timing'] = ', '.join([
+        f'db;dur={profile.db_time * 1000:.1f};desc="{profile.query_count} queries"',
+        f'tpl;dur={profile.template_time * 1000:.1f}',
+        f'total;dur={total_time * 1000:.1f}',
+    ])
+    _record_endpoint(endpoint, profile, total_time, repeated)
+
+    if repeated:
+        shape, count = repeated[0]
+        current_app.logger.warning(
+            f"Possible N+1 on {endpoint}: statement executed {count} times: {shape[:200]}"
+        )
+
+    budget = query_budget_for(endpoint)
+    if budget is not None and profile.query_count > budget:
+        message = f"Endpoint {endpoint} ran {profile.query_count} SQL statements (budget {budget})"
+        if current_app.config.get('PERF_BUDGET_ENFORCE'):
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning(message)
+    return response
+
+
+def query_budget_for(endpoint):
+    """Return the query budget configured for ``endpoint`` (None = unlimited)."""
+    budgets = current_app.config.get('PERF_QUERY_BUDGETS') or {}
+    if isinstance(budgets, str):
+        budgets = parse_query_budgets(budgets)
+    budget = budgets.get(endpoint, current_app.config.get('PERF_DEFAULT_QUERY_BUDGET'))
+    return int(budget) if budget is not None else None
+
+
+def parse_query_budgets(value):
+    """Parse ``"endpoint=max,endpoint=max"`` (as read from the environment) into a dict."""
+    budgets = {}
+    for item in (value or '').split(','):
+        endpoint, _, limit = item.partition('=')
+        if endpoint.strip() and limit.strip().isdigit():
+            budgets[endpoint.strip()] = int(limit)
+    return budgets
+
+
+# ============================================
+# Aggregated stats
+# ============================================
+
+def _record_endpoint(endpoint, profile, total_time, repeated):
+    with _stats_lock:
+        stats = _endpoint_stats.setdefault(endpoint, {
+            'requests': 0,
+            'queries_total': 0,
+            'queries_max': 0,
+            'db_time_ms': 0.0,
+            'template_time_ms': 0.0,
+            'total_time_ms': 0.0,
+            'total_time_max_ms': 0.0,
+            'n_plus_one_requests': 0,
+            'n_plus_one_samples': [],
+        })
+        stats['requests'] += 1
+        stats['queries_total'] += profile.query_count
+        stats['queries_max'] = max(stats['queries_max'], profile.query_count)
+        stats['db_time_ms'] += profile.db_time * 1000
+        stats['template_time_ms'] += profile.template_time * 1000
+        stats['total_time_ms'] += total_time * 1000
+        stats['total_time_max_ms'] = max(stats['total_time_max_ms'], total_time * 1000)
+        if repeated:
+            stats['n_plus_one_requests'] += 1
+            samples = stats['n_plus_one_samples']
+            for shape, count in repeated:
+                if shape not in [sample['statement'] for sample in samples]:
+                    samples.append({'statement': shape[:500], 'count': count})
+            del samples[MAX_N_PLUS_ONE_SAMPLES:]
+
+
+def get_endpoint_stats():
+    """Snapshot of the per-endpoint aggregates (averages included), slowest first."""
+    with _stats_lock:
+        snapshot = {endpoint: dict(stats, n_plus_one_samples=list(stats['n_plus_one_samples']))
+                    for endpoint, stats in _endpoint_stats.items()}
+    for stats in snapshot.values():
+        requests_count = stats['requests'] or 1
+        stats['queries_avg'] = round(stats['queries_total'] / requests_count, 2)
+        stats['db_time_avg_ms'] = round(stats['db_time_ms'] / requests_count, 2)
+        stats['total_time_avg_ms'] = round(stats['total_time_ms'] / requests_count, 2)
+        for key in ('db_time_ms', 'template_time_ms', 'total_time_ms', 'total_time_max_ms'):
+            stats[key] = round(stats[key], 2)
+    return dict(sorted(snapshot.items(), key=lambda item: item[1]['total_time_ms'], reverse=True))
+
+
+def reset_endpoint_stats():
+    with _stats_lock:
+        _endpoint_stats.clear()
+
+
+def init_profiler(app):
+    """
+    Register the profiler on ``app`` when ``PERF_PROFILER_ENABLED`` is set.
+
+    The engine-level listeners are global but only record while a request
+    of a profiled app is active, so they cost nothing elsewhere.
+    """
+    if not app.config.get('PERF_PROFILER_ENABLED'):
+        return
+
+    global _engine_listeners_registered
+    if not _engine_listeners_registered:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _engine_listeners_registered = True
+
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+    app.before_request(_start_request_profile)
+    app.after_request(_finish_request_profile)
+
+    app.logger.info("Performance profiler enabled (Server-Timing header, /health/perf)")
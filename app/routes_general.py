@@ -1,21 +1,19 @@
 # app/routes_general.py
 
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request
 from flask_login import login_required
-from sqlalchemy.orm import joinedload
-from .models import Activity
+from .services.project_listing_service import ProjectListingService
 
 general_bp = Blueprint('general', __name__, template_folder='templates')
 
 @general_bp.route('/feed')
 @login_required
 def activity_feed():
-    """Mostra un feed delle attività recenti sulla piattaforma."""
-    activities = Activity.query.options(
-        joinedload(Activity.user),
-        joinedload(Activity.project)
-    ).order_by(Activity.timestamp.desc()).limit(50).all()
-    return render_template('feed.html', activities=activities)
+    """Mostra un feed delle attività recenti sulla piattaforma (paginato a cursore)."""
+    cursor = request.args.get('before')
+    activities, next_cursor = ProjectListingService.get_activities_page(cursor=cursor)
+    return render_template('feed.html', activities=activities, next_cursor=next_cursor,
+                           is_first_page=not cursor)
 
 # --- NUOVA ROUTE PER L'ECONOMIA DELLA PIATTAFORMA ---
 @general_bp.route('/platform-economy')
@@ -1,8 +1,11 @@
 # app/routes_health.py
 
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, jsonify, current_app, request, abort
 from .extensions import db
 from .models import User
+from .profiler import get_endpoint_stats
+from .services.llm_cache import get_llm_cache_stats
+import hmac
 import os
 import time
 
@@ -68,3 +71,23 @@ def liveness_check():
     Liveness check - applicazione è viva
     """
     return jsonify({'alive': True}), 200
+
+@health_bp.route('/health/perf')
+def perf_stats():
+    """
+    Statistiche del profiler per endpoint (query SQL, tempo DB/template, N+1)
+    e hit/miss della cache delle risposte LLM.
+    Protetto da token: header X-Perf-Token uguale a PERF_PROFILER_TOKEN.
+    """
+    if not current_app.config.get('PERF_PROFILER_ENABLED'):
+        abort(404)
+    expected = current_app.config.get('PERF_PROFILER_TOKEN') or ''
+    provided = request.headers.get('X-Perf-Token', '')
+    if not expected or not hmac.compare_digest(provided.encode('utf-8'), expected.encode('utf-8')):
+        abort(403)
+    return jsonify({
+        'timestamp': int(time.time()),
+        'pid': os.getpid(),  # Le statistiche sono per processo/worker
+        'endpoints': get_endpoint_stats(),
+        'llm_cache': get_llm_cache_stats()
+    }), 200
@@ -5,8 +5,9 @@ from flask_login import login_required, current_user
 from .models import (Project, ProjectVote, InvestmentProject, Investment, 
                     EquityConfiguration, User, Collaborator)
 from .extensions import db
+from .services.leaderboard_service import InvestmentLeaderboardService
 from datetime import datetime, timezone
-from sqlalchemy import func, desc, and_
+from sqlalchemy import desc, and_
 import calendar
 
 investments_bp = Blueprint('investments', __name__, template_folder='templates')
@@ -15,74 +16,8 @@ investments_bp = Blueprint('investments', __name__, template_folder='templates')
 @investments_bp.route('/investments')
 def investments_page():
     """Pagina principale degli investimenti con i TOP 10 progetti più votati"""
-    from sqlalchemy import func, desc
-    
-    # Query per ottenere i progetti con più voti totali (tutti i mesi)
-    top_projects_query = db.session.query(
-        Project.id,
-        Project.name,
-        Project.description,
-        Project.creator_id,
-        Project.created_at,
-        func.count(ProjectVote.id).label('total_votes')
-    ).outerjoin(ProjectVote, Project.id == ProjectVote.project_id)\
-     .filter(Project.private == False)\
-     .group_by(Project.id)\
-     .order_by(desc(func.count(ProjectVote.id)), desc(Project.created_at))\
-     .limit(10).all()
-    
-    # Converti i risultati in una lista più utilizzabile
-    top_projects = []
-    for result in top_projects_query:
-        project = db.session.get(Project, result.id)
-        if project:
-            # Controlla se esiste già un InvestmentProject per questo progetto
-            existing_investment = InvestmentProject.query.filter_by(project_id=project.id).first()
-            
-            # Se non esiste, crealo automaticamente
-            if not existing_investment and result.total_votes > 0:
-                # Ottieni configurazione equity o usa default
-                equity_config = EquityConfiguration.query.filter_by(project_id=project.id).first()
-                available_equity = equity_config.investors_percentage if equity_config else 10.0
-                
-                new_investment_project = InvestmentProject(
-                    project_id=project.id,
-                    publication_month=datetime.now().month,
-                    publication_year=datetime.now().year,
-                    total_votes=result.total_votes,
-                    available_equity_percentage=available_equity,
-                    equity_price_per_percent=100.0,  # Default price
-                    is_active=True
-                )
-                db.session.add(new_investment_project)
-                db.session.commit()
-                existing_investment = new_investment_project
-            
-            if existing_investment:
-                # Calcola statistiche investimento
-                total_invested = db.session.query(func.sum(Investment.amount_paid)).filter(
-                    Investment.investment_project_id == existing_investment.id
-                ).scalar() or 0.0
-                
-                equity_sold = db.session.query(func.sum(Investment.equity_percentage)).filter(
-                    Investment.investment_project_id == existing_investment.id
-                ).scalar() or 0.0
-                
-                equity_remaining = max(0, existing_investment.available_equity_percentage - equity_sold)
-                
-                investors_count = Investment.query.filter(
-                    Investment.investment_project_id == existing_investment.id
-                ).count()
-                
-                top_projects.append({
-                    'project': project,
-                    'total_votes': result.total_votes,
-                    'investment_project': existing_investment,
-                    'total_invested': total_invested,
-                    'equity_sold': equity_sold,
-                    'equity_remaining': equity_remaining,
-                    'investors_count': investors_count
-                })
+    # Classifica precalcolata dai contatori e mantenuta in cache (vedi leaderboard_service)
+    top_projects = InvestmentLeaderboardService.get_top_projects(limit=10)
     
     return render_template('investments/investments_page.html', 
                          top_projects=top_projects)
@@ -119,14 +54,12 @@ def vote_project(project_id):
     )
     
     db.session.add(new_vote)
+    # Il progetto votato entra nella pagina investimenti con il suo listing
+    InvestmentLeaderboardService.ensure_investment_project(project)
     db.session.commit()
     
-    # Conta i voti totali per il progetto (tutti i voti)
-    total_votes = ProjectVote.query.filter(
-        ProjectVote.project_id == project_id
-    ).count()
-    
-    return jsonify({'success': True, 'message': 'Voto registrato!', 'total_votes': total_votes})
+    # Voti totali dal contatore (aggiornato insieme al voto)
+    return jsonify({'success': True, 'message': 'Voto registrato!', 'total_votes': project.vote_count})
 
 
 @investments_bp.route('/invest/<int:investment_project_id>')
@@ -135,10 +68,8 @@ def invest_page(investment_project_id):
     """Pagina per investire in un progetto specifico"""
     investment_project = InvestmentProject.query.get_or_404(investment_project_id)
     
-    # Calcola l'equity già venduta
-    equity_sold = db.session.query(func.sum(Investment.equity_percentage)).filter(
-        Investment.investment_project_id == investment_project_id
-    ).scalar() or 0.0
+    # Equity già venduta (contatore mantenuto con gli investimenti)
+    equity_sold = investment_project.equity_sold or 0.0
     
     equity_remaining = max(0, investment_project.available_equity_percentage - equity_sold)
     
@@ -183,9 +114,7 @@ def make_investment(investment_project_id):
             return redirect(url_for('investments.invest_page', investment_project_id=investment_project_id))
         
         # Verifica equity disponibile
-        equity_sold = db.session.query(func.sum(Investment.equity_percentage)).filter(
-            Investment.investment_project_id == investment_project_id
-        ).scalar() or 0.0
+        equity_sold = investment_project.equity_sold or 0.0
         
         equity_remaining = max(0, investment_project.available_equity_percentage - equity_sold)
         
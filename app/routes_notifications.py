@@ -1,18 +1,39 @@
 # app/routes_notifications.py
 
-from flask import Blueprint, render_template, jsonify, request, redirect, url_for, flash
+import json
+import time
+
+from flask import Blueprint, render_template, jsonify, request, redirect, url_for, flash, current_app, Response
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 from .models import Notification
 from .extensions import db
 from .services.notification_service import NotificationService
+from .services.notification_counter import NotificationCounterService
+from .services.project_listing_service import decode_cursor, keyset_page
 
 notifications_bp = Blueprint('notifications_bp', __name__, template_folder='templates')
 
+NOTIFICATIONS_PER_PAGE = 30
+# Lo stream legge il contatore in cache (Redis); il DB viene interrogato solo se la chiave manca
+# o se la cache è per processo (SimpleCache), dove i worker avrebbero contatori diversi:
+# in quel caso ogni iterazione è un COUNT e si torna all'intervallo del vecchio polling
+STREAM_POLL_SECONDS = 2
+STREAM_FALLBACK_POLL_SECONDS = 30
+STREAM_HEARTBEAT_SECONDS = 15
+
 @notifications_bp.route('/notifications')
 @login_required
 def notifications_list():
-    notifications = Notification.query.filter_by(user_id=current_user.id).order_by(Notification.timestamp.desc()).all()
-    return render_template('notifications.html', notifications=notifications)
+    # Paginazione keyset su (timestamp, id): niente .all() sull'intero storico
+    cursor = request.args.get('before')
+    query = Notification.query.options(joinedload(Notification.project))\
+        .filter(Notification.user_id == current_user.id)
+    notifications, next_cursor = keyset_page(
+        query, Notification.timestamp, Notification.id, decode_cursor(cursor), NOTIFICATIONS_PER_PAGE
+    )
+    return render_template('notifications.html', notifications=notifications,
+                           next_cursor=next_cursor, is_first_page=not cursor)
 
 @notifications_bp.route('/notifications/mark-all-read', methods=['POST'])
 @login_required
@@ -36,6 +57,47 @@ def unread_count():
     count = NotificationService.get_unread_count(current_user.id)
     return jsonify({'count': count})
 
+@notifications_bp.route('/api/notifications/stream')
+@login_required
+def unread_count_stream():
+    """Stream SSE del contatore notifiche non lette (sostituisce il polling del badge)"""
+    user_id = current_user.id
+    max_seconds = current_app.config.get('NOTIFICATION_STREAM_MAX_SECONDS', 300)
+    app = current_app._get_current_object()
+    shared_counter = NotificationCounterService.is_shared()
+    poll_seconds = STREAM_POLL_SECONDS if shared_counter else STREAM_FALLBACK_POLL_SECONDS
+
+    def generate():
+        started = time.monotonic()
+        last_count = None
+        last_sent = started
+        # Il client (EventSource) si riconnette da solo alla chiusura dello stream
+        yield f"retry: {poll_seconds * 1000}\n\n"
+        while time.monotonic() - started < max_seconds:
+            with app.app_context():
+                # Con una cache per processo il contatore degli altri worker non è visibile
+                count = NotificationCounterService.peek_unread_count(user_id) if shared_counter else None
+                if count is None:
+                    if shared_counter:
+                        count = NotificationCounterService.get_unread_count(user_id)
+                    else:
+                        count = NotificationCounterService.count_unread(user_id)
+                    db.session.remove()
+            if count != last_count:
+                last_count = count
+                yield f"data: {json.dumps({'count': count})}\n\n"
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= STREAM_HEARTBEAT_SECONDS:
+                # Commento SSE: tiene aperta la connessione attraverso i proxy
+                yield ': keep-alive\n\n'
+                last_sent = time.monotonic()
+            time.sleep(poll_seconds)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @notifications_bp.route('/api/notifications/mark-read/<int:notification_id>', methods=['POST'])
 @login_required
 def mark_notification_read(notification_id):
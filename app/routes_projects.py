@@ -1,14 +1,14 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, abort, Response, jsonify, send_file
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, abort, Response, jsonify, stream_with_context
 from flask_login import login_required, current_user
 from flask_wtf.csrf import validate_csrf, ValidationError
 from sqlalchemy.orm import joinedload
-from sqlalchemy import func, desc
+from sqlalchemy import desc
 from datetime import datetime, timezone
 from werkzeug.routing import BuildError
 
 from .extensions import db
 from .models import (
-    Project, Task, Endorsement, Collaborator, ProjectVote, Milestone,
+    Project, Task, Collaborator,
     TransparencyReport,
     ALLOWED_PROJECT_CATEGORIES, ALLOWED_TASK_STATUS,
     ALLOWED_TASK_PHASES, ALLOWED_TASK_DIFFICULTIES, PROJECT_TYPES, ALLOWED_TASK_TYPES
@@ -21,18 +21,32 @@ from .services.managed_repo_service import ManagedRepoService
 from .services.share_service import ShareService
 from .services.equity_service import EquityService
 from .services.reporting_service import ReportingService
-from .workspace_utils import load_history_entries, list_session_metadata, synced_repo_dir
+from .services.project_detail_service import ProjectDetailService
+from .services.project_listing_service import ProjectListingService
+from .workspace_utils import (
+    load_history_entries,
+    list_exportable_repo_files, workspace_content_hash, iter_zip_stream
+)
 from .cache import cache
+from .common_utils.github_http import get_github_http
 from app.ai_services import analyze_with_ai, generate_project_details_from_pitch, AI_SERVICE_AVAILABLE
 
-import requests
-import shutil
-import tempfile
-import os
-import zipfile
+import unicodedata
+from urllib.parse import quote
 
 projects_bp = Blueprint('projects', __name__, template_folder='templates')
 
+
+def _attachment_filename_options(filename: str) -> dict:
+    """Parametri di Content-Disposition: filename ASCII più filename* RFC 5987 per i nomi non ASCII."""
+    try:
+        filename.encode('ascii')
+        return {'filename': filename}
+    except UnicodeEncodeError:
+        ascii_name = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': ascii_name, 'filename*': f"UTF-8''{quote(filename, safe='')}"}
+
+
 @projects_bp.route('/')
 def home() -> Response | str:
     # Filter private projects and use eager loading for better performance
@@ -40,15 +54,8 @@ def home() -> Response | str:
         joinedload(Project.creator)
     ).filter_by(private=False).order_by(Project.created_at.desc()).limit(8).all()
     
-    # If user is authenticated, retrieve votes more efficiently
-    # Only load project_id to avoid loading entire vote objects
-    user_votes = {}
-    if current_user.is_authenticated:
-        voted_project_ids = db.session.query(ProjectVote.project_id).filter(
-            ProjectVote.user_id == current_user.id
-        ).all()
-        
-        user_votes = {project_id: True for (project_id,) in voted_project_ids}
+    # Voti dell'utente solo per i progetti mostrati
+    user_votes = ProjectListingService.get_user_votes(current_user, [p.id for p in recent_projects])
     
     # Calculate metrics with caching (expensive to calculate)
     cached_metrics = cache.get('home_metrics')
@@ -83,62 +90,23 @@ def home() -> Response | str:
 
 @projects_bp.route('/projects')
 def projects_list() -> Response | str:
-    page: int = request.args.get('page', 1, type=int)
-    per_page: int = 12
     category: str | None = request.args.get('category')
     project_type: str | None = request.args.get('project_type')  # Nuovo filtro
+    cursor: str | None = request.args.get('cursor')
     
-    # Build query with eager loading for better performance
-    base_query = Project.query.options(joinedload(Project.creator))
-    
-    # Creiamo una subquery usando un'espressione SQL diretta
-    # Questa espressione restituisce i progetti pubblici e privati a cui l'utente ha accesso
-    if current_user.is_authenticated:
-        # Per gli utenti autenticati, mostra i progetti pubblici e quelli privati a cui hanno accesso
-        # Costruiamo una condizione per i progetti che l'utente può vedere
-        visible_projects_condition = db.or_(
-            Project.private == False,  # Progetti pubblici
-            db.and_(
-                Project.private == True,
-                db.or_(
-                    Project.creator_id == current_user.id,
-                    Project.id.in_(
-                        db.session.query(Collaborator.project_id).filter(Collaborator.user_id == current_user.id)
-                    )
-                )
-            )
-        )
-        query = base_query.filter(visible_projects_condition)
-    else:
-        # Per gli utenti non autenticati, mostra solo i progetti pubblici
-        query = base_query.filter(Project.private == False)
-    
-    # Applica il filtro per categoria se presente
-    if category:
-        query = query.filter(Project.category == category)
-    
-    # --- NUOVO: Applica il filtro per tipo di progetto se presente ---
-    if project_type:
-        query = query.filter(Project.project_type == project_type)
-        
-    # Ordina i risultati
-    query = query.order_by(Project.created_at.desc())
-    
-    # Pagina i risultati
-    projects_pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Paginazione keyset su (created_at, id): ogni pagina è una seek sull'indice,
+    # la prima pagina anonima per filtro è condivisa in cache
+    projects, next_cursor = ProjectListingService.get_projects_page(
+        current_user, category=category, project_type=project_type, cursor=cursor
+    )
     
-    # If user is authenticated, retrieve votes more efficiently (only project IDs)
-    user_votes = {}
-    if current_user.is_authenticated:
-        voted_project_ids = db.session.query(ProjectVote.project_id).filter(
-            ProjectVote.user_id == current_user.id
-        ).all()
-        
-        user_votes = {project_id: True for (project_id,) in voted_project_ids}
+    # Voti dell'utente solo per i progetti della pagina
+    user_votes = ProjectListingService.get_user_votes(current_user, [p.id for p in projects])
     
     return render_template('projects.html',
-                           projects=projects_pagination.items,
-                           pagination=projects_pagination,
+                           projects=projects,
+                           next_cursor=next_cursor,
+                           is_first_page=not cursor,
                            categories=ALLOWED_PROJECT_CATEGORIES,
                            current_category=category,
                            current_project_type=project_type,  # Nuovo parametro
@@ -192,10 +160,10 @@ def create_project_form() -> Response | str:
                 # Se la descrizione è vuota, usa quella generata dall'AI
                 if not cleaned_description or cleaned_description.strip() == '':
                     cleaned_description = details.get('description', '')
-        except Exception as e:
-            current_app.logger.warning(f"Errore generazione dettagli AI: {e}")
-            project_name = 'Nuovo Progetto'
-            rewritten_pitch = cleaned_pitch  # Fallback al pitch originale
+            except Exception as e:
+                current_app.logger.warning(f"Errore generazione dettagli AI: {e}")
+                project_name = 'Nuovo Progetto'
+                rewritten_pitch = cleaned_pitch  # Fallback al pitch originale
         
         # Pulizia del nome generato dall'AI
         try:
@@ -408,13 +376,11 @@ def project_ai_guide(project_id: int) -> Response | str:
 @projects_bp.route('/project/<int:project_id>')
 def project_detail(project_id: int) -> Response | str:
     project: Project = Project.query.options(joinedload(Project.creator)).get_or_404(project_id)
-    collaborator_record = None
-    if current_user.is_authenticated:
-        collaborator_record = Collaborator.query.filter_by(
-            project_id=project.id, user_id=current_user.id
-        ).first()
-    is_creator = current_user.is_authenticated and current_user.id == project.creator_id
-    is_collaborator = collaborator_record is not None if current_user.is_authenticated else False
+    
+    # Unica query per i dati specifici di chi visita la pagina
+    viewer = ProjectDetailService.get_viewer_state(project, current_user)
+    is_creator = viewer['is_creator']
+    is_collaborator = viewer['is_collaborator']
     
     # Verifica accesso ai progetti privati
     if project.private:
@@ -426,14 +392,6 @@ def project_detail(project_id: int) -> Response | str:
             flash("Non sei autorizzato ad accedere a questo progetto privato.", "error")
             return redirect(url_for('projects.projects_list'))
     
-    # Calculate distributed equity using database aggregation (more efficient)
-    creator_equity = project.creator_equity
-    distributed_equity = db.session.query(
-        func.coalesce(func.sum(Collaborator.equity_share), 0)
-    ).filter(Collaborator.project_id == project.id).scalar()
-    platform_fee = getattr(project, 'platform_fee', 1.0)
-    remaining_equity = 100 - creator_equity - distributed_equity - platform_fee
-    
     # Auto-initialize shares system for commercial projects if missing
     if project.is_commercial and not project.uses_shares_system():
         try:
@@ -445,124 +403,55 @@ def project_detail(project_id: int) -> Response | str:
             current_app.logger.error(f'Failed to auto-initialize shares system for project {project.id}: {str(e)}')
             db.session.rollback()
     
-    # Get transparency data for public section
-    transparency_data = None
-    try:
-        reporting_service = ReportingService()
-        transparency_data = reporting_service.get_transparency_data(project, anonymize_holders=False)
-    except Exception as e:
-        current_app.logger.error(f"Error loading transparency data: {e}", exc_info=True)
-        # Fallback: create minimal transparency data
-        try:
-            uses_shares = project.uses_shares_system() if hasattr(project, 'uses_shares_system') else False
-        except:
-            uses_shares = False
-        transparency_data = {
-            'uses_shares_system': uses_shares,
-            'shares': {'total': 0, 'distributed': 0, 'available': 0, 'holders_count': 0, 'holders': []},
-            'revenue': {'total': 0, 'currency': 'EUR', 'records_count': 0, 'history': []},
-            'distributions': {'total': 0, 'count': 0, 'history': []},
-            'growth': {'new_holders_this_month': 0}
-        }
+    # Snapshot condiviso da tutti i visitatori (cache invalidata dalle modifiche al progetto)
+    snapshot = ProjectDetailService.get_snapshot(project)
+    
+    creator_equity = project.creator_equity
+    distributed_equity = snapshot['distributed_equity']
+    platform_fee = getattr(project, 'platform_fee', 1.0)
+    remaining_equity = 100 - creator_equity - distributed_equity - platform_fee
+    transparency_data = snapshot['transparency_data']
 
     form = BaseForm()
 
-    user_has_endorsed = False
-    user_has_voted_this_month = False
-    if current_user.is_authenticated:
-        user_has_endorsed = Endorsement.query.filter_by(user_id=current_user.id, project_id=project.id).first() is not None
-        
-        # Controlla se l'utente ha già votato questo progetto questo mese
-        current_date = datetime.now()
-        current_month = int(f"{current_date.year}{current_date.month:02d}")
-        current_year = current_date.year
-        
-        user_has_voted_this_month = ProjectVote.query.filter(
-            ProjectVote.user_id == current_user.id,
-            ProjectVote.project_id == project.id,
-            ProjectVote.vote_month == current_month,
-            ProjectVote.vote_year == current_year
-        ).first() is not None
+    user_has_endorsed = viewer['has_endorsed']
+    user_has_voted_this_month = viewer['has_voted_this_month']
 
     tasks_by_phase = {phase_key: [] for phase_key in ALLOWED_TASK_PHASES.keys()}
     
-    # More efficient: filter tasks in database query instead of in Python
-    # For private tasks, filter based on user permissions in the query
-    if current_user.is_authenticated and (is_creator or is_collaborator):
-        # Collaborators and creators can see all tasks
-        active_tasks_query = project.tasks.filter(Task.status.in_(['open', 'in_progress', 'submitted', 'suggested']))
-        completed_tasks_query = project.tasks.filter(Task.status.in_(['approved', 'closed']))
-    else:
-        # Non-collaborators can only see public tasks
-        active_tasks_query = project.tasks.filter(
-            Task.status.in_(['open', 'in_progress', 'submitted', 'suggested']),
-            db.or_(Task.is_private == False, Task.is_private == None)
-        )
-        completed_tasks_query = project.tasks.filter(
-            Task.status.in_(['approved', 'closed']),
-            db.or_(Task.is_private == False, Task.is_private == None)
-        )
-    
-    active_tasks = active_tasks_query.all()
-    completed_tasks = completed_tasks_query.all()
+    # Collaborators and creators can see all tasks, everyone else only public ones
+    active_tasks, completed_tasks = ProjectDetailService.visible_tasks(
+        snapshot, can_see_private=is_creator or is_collaborator
+    )
     
     for task in active_tasks:
-        if task.phase in tasks_by_phase:
-            tasks_by_phase[task.phase].append(task)
+        if task['phase'] in tasks_by_phase:
+            tasks_by_phase[task['phase']].append(task)
     
     # Determine tasks to show based on status filter
     status_filter = request.args.get('status')
     if status_filter == 'completed':
         tasks = completed_tasks
     elif status_filter == 'in_progress':
-        tasks = [t for t in active_tasks if t.status == 'in_progress']
+        tasks = [t for t in active_tasks if t['status'] == 'in_progress']
     elif status_filter == 'open':
-        tasks = [t for t in active_tasks if t.status == 'open']
+        tasks = [t for t in active_tasks if t['status'] == 'open']
     else:
         tasks = active_tasks
 
     has_active_tasks = bool(active_tasks)
 
-    collaborators = Collaborator.query.options(joinedload(Collaborator.user)).filter_by(project_id=project.id).order_by(Collaborator.equity_share.desc()).all()
+    collaborators = snapshot['collaborators']
 
     # Ottieni le milestone del progetto
-    milestones = Milestone.query.filter_by(project_id=project.id).order_by(
-        Milestone.display_order,
-        Milestone.created_at
-    ).all()
+    milestones = ProjectDetailService.milestones_for_today(snapshot)
     
     # Verifica se l'utente può modificare le milestone
-    can_edit_milestones = False
-    if current_user.is_authenticated:
-        can_edit_milestones = is_creator or is_collaborator
+    can_edit_milestones = is_creator or is_collaborator
 
-    workspace_repo_info = None
-    if project.repository:
-        workspace_repo_info = {
-            'provider': project.repository.provider,
-            'repo_name': project.repository.repo_name,
-            'branch': project.repository.branch,
-            'status': project.repository.status,
-            'last_sync_at': project.repository.last_sync_at
-        }
-    
-    workspace_history = load_history_entries(project.id, limit=5)
-    for history_item in workspace_history:
-        files = history_item.get('files') or []
-        if not history_item.get('file_count'):
-            history_item['file_count'] = len(files)
-    workspace_sessions = []
-    for session_meta in list_session_metadata(project.id, limit=5):
-        workspace_sessions.append({
-            'session_id': session_meta.get('session_id'),
-            'status': session_meta.get('status', 'pending'),
-            'type': session_meta.get('type', 'manual'),
-            'file_count': session_meta.get('file_count') or len(session_meta.get('files') or []),
-            'total_size': session_meta.get('total_size'),
-            'created_at': session_meta.get('created_at'),
-            'updated_at': session_meta.get('updated_at'),
-            'finalized_at': session_meta.get('finalized_at')
-        })
+    workspace_repo_info = snapshot['workspace_repo']
+    workspace_history = snapshot['workspace_history']
+    workspace_sessions = snapshot['workspace_sessions']
     
     can_manage_workspace = is_creator or is_collaborator
     
@@ -621,6 +510,8 @@ def project_detail(project_id: int) -> Response | str:
                            workspace_limits=workspace_limits,
                            tasks=tasks,
                            current_status=status_filter,
+                           is_creator=is_creator,
+                           is_collaborator=is_collaborator,
                            form=form)
 
 
@@ -1212,43 +1103,44 @@ def download_project_zip(project_id):
         
         try:
             # Stream the response to avoid loading big files in memory
-            req = requests.get(api_url, headers=headers, stream=True)
+            req = get_github_http().get(api_url, headers=headers, stream=True)
             
             if req.status_code == 200:
-                return Response(
+                response = Response(
                     req.iter_content(chunk_size=1024*1024),
                     content_type=req.headers.get('Content-Type', 'application/zip'),
                     headers={
                         'Content-Disposition': f'attachment; filename={project.name.replace(" ", "_")}_source.zip'
                     }
                 )
+                # Restituisce la connessione al pool condiviso anche se il client interrompe il download
+                response.call_on_close(req.close)
+                return response
             else:
+                req.close()
                 current_app.logger.warning(f"GitHub Download Failed: {req.status_code} - Fallback to local workspace if available.")
         except Exception as e:
             current_app.logger.error(f"GitHub Download Exception: {str(e)}")
 
-    # 2. Prova Workspace Locale
-    local_repo_path = synced_repo_dir(project.id)
-    if os.path.exists(local_repo_path) and os.listdir(local_repo_path):
-        try:
-            # Usa tempfile per creare lo zip
-            temp_dir = tempfile.mkdtemp()
-            zip_filename = f"{project.name.replace(' ', '_')}_workspace.zip"
-            zip_base = os.path.join(temp_dir, project.name.replace(' ', '_'))
-            
-            shutil.make_archive(zip_base, 'zip', local_repo_path)
-            zip_path = zip_base + '.zip'
-            
-            return send_file(
-                zip_path,
-                mimetype='application/zip',
-                as_attachment=True,
-                download_name=zip_filename
-            )
-        except Exception as e:
-            current_app.logger.error(f"Local ZIP Error: {str(e)}")
-            flash('Errore durante la creazione dello ZIP locale.', 'error')
-            return redirect(url_for('projects.project_detail', project_id=project_id))
+    # 2. Prova Workspace Locale (ZIP generato in streaming, senza file temporanei)
+    workspace_files = list_exportable_repo_files(project.id)
+    if workspace_files:
+        etag = workspace_content_hash(workspace_files)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        
+        zip_filename = f"{project.name.replace(' ', '_')}_workspace.zip"
+        response = Response(
+            stream_with_context(iter_zip_stream(workspace_files)),
+            mimetype='application/zip'
+        )
+        response.headers.set('Content-Disposition', 'attachment', **_attachment_filename_options(zip_filename))
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
 
     flash('Nessun codice sorgente disponibile per il download (né GitHub né Workspace).', 'error')
     return redirect(url_for('projects.project_detail', project_id=project_id))
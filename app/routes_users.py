@@ -4,6 +4,8 @@ from flask_login import login_required, current_user
 from .models import User, Collaborator, Project, Solution, Task, Vote, ALLOWED_TASK_TYPES
 from .forms import UpdateProfileForm
 from .extensions import db
+from .services.user_stats_service import UserStatsService
+from sqlalchemy import func
 from sqlalchemy.orm import joinedload
 from werkzeug.utils import secure_filename
 from PIL import Image
@@ -22,89 +24,45 @@ def user_profile(username):
     # Progetti creati dall'utente
     projects_created = Project.query.filter_by(creator_id=user.id).order_by(Project.created_at.desc()).all()
 
+    # Collaboratori per progetto creato (una sola query aggregata)
+    collaborator_counts = dict(
+        db.session.query(Collaborator.project_id, func.count(Collaborator.id))
+        .filter(Collaborator.project_id.in_([p.id for p in projects_created]))
+        .group_by(Collaborator.project_id)
+        .all()
+    ) if projects_created else {}
+
     # Collaborazioni e progetti a cui ha contribuito
-    collaborations = Collaborator.query.options(joinedload(Collaborator.project)).filter_by(user_id=user.id).all()
+    collaborations = Collaborator.query.options(
+        joinedload(Collaborator.project).joinedload(Project.creator)
+    ).filter_by(user_id=user.id).all()
     projects_contributed = [collab.project for collab in collaborations if collab.project]
 
-    # Task completati: quelli dove l'utente ha una soluzione approvata
-    approved_solutions = Solution.query.filter_by(submitted_by_user_id=user.id, is_approved=True).all()
-    completed_task_ids = {sol.task_id for sol in approved_solutions}
-    completed_tasks = Task.query.filter(Task.id.in_(completed_task_ids)).all() if completed_task_ids else []
-
-    # Nuove metriche aggiuntive
-    total_solutions = Solution.query.filter_by(submitted_by_user_id=user.id).count()
-    total_tasks_created = Task.query.filter_by(creator_id=user.id).count()
-
-    # Conta task per categoria
-    task_type_counts = {k: 0 for k in ALLOWED_TASK_TYPES.keys()}
-    for t in completed_tasks:
-        if t.task_type in task_type_counts:
-            task_type_counts[t.task_type] += 1
-
-    # Equity totale guadagnata
-    total_equity = sum(collab.equity_share for collab in collaborations)
+    # Statistiche aggregate (task per categoria, skill points, voti, equity) in cache per utente
+    stats = UserStatsService.get_stats(user.id)
     
     # 🎯 EQUITY DETAILED BREAKDOWN using ProjectEquity system
     from .services.equity_service import EquityService
     equity_service = EquityService()
     equity_summary = equity_service.calculate_user_total_equity(user)
 
-    # Soluzioni approvate
-    num_approved_solutions = len(approved_solutions)
-
-    # Progetti a cui ha contribuito
-    num_projects_contributed = len(projects_contributed)
-
-    # Task completati
-    num_tasks_completed = len(completed_tasks)
-
-    # Sistema di reputazione e skill points (esempio: +10 per ogni task completato, +20 per ogni soluzione approvata, +10 per ogni voto positivo)
-    skill_points = {k: 0 for k in ALLOWED_TASK_TYPES.keys()}
-    for t in completed_tasks:
-        if t.task_type in skill_points:
-            skill_points[t.task_type] += 10
-    reputation_points = num_tasks_completed * 10 + num_approved_solutions * 20
-
-    # Voti positivi ricevuti sulle soluzioni approvate
-    positive_votes = Vote.query.filter(Vote.solution_id.in_([sol.id for sol in approved_solutions])).count() if approved_solutions else 0
-    reputation_points += positive_votes * 10
-
-    # Voti positivi ricevuti per ogni categoria
-    positive_votes_by_category = {k: 0 for k in ALLOWED_TASK_TYPES.keys()}
-    for t in completed_tasks:
-        if t.task_type in positive_votes_by_category:
-            sol = Solution.query.filter_by(task_id=t.id, submitted_by_user_id=user.id, is_approved=True).first()
-            if sol:
-                votes = Vote.query.filter_by(solution_id=sol.id).count()
-                positive_votes_by_category[t.task_type] += votes
-
-    # Skill points dettagliati per categoria (curriculum)
-    curriculum_skills = []
-    for cat, label in ALLOWED_TASK_TYPES.items():
-        skill = {
-            'category': label,
-            'tasks_completed': task_type_counts.get(cat, 0),
-            'skill_points': skill_points.get(cat, 0),
-            'positive_votes': positive_votes_by_category.get(cat, 0)
-        }
-        curriculum_skills.append(skill)
-
     return render_template(
         'user_profile.html',
         user=user,
         projects_created=projects_created,
         projects_contributed=projects_contributed,
         collaborations=collaborations,
-        num_projects_contributed=num_projects_contributed,
-        num_tasks_completed=num_tasks_completed,
-        task_type_counts=task_type_counts,
-        num_approved_solutions=num_approved_solutions,
-        total_equity=total_equity,
-        reputation_points=reputation_points,
-        skill_points=skill_points,
-        curriculum_skills=curriculum_skills,
-        total_solutions=total_solutions,
-        total_tasks_created=total_tasks_created,
+        collaborator_counts=collaborator_counts,
+        num_projects_contributed=stats['num_projects_contributed'],
+        num_tasks_completed=stats['num_tasks_completed'],
+        task_type_counts=stats['task_type_counts'],
+        num_approved_solutions=stats['num_approved_solutions'],
+        total_equity=stats['total_equity'],
+        reputation_points=stats['reputation_points'],
+        skill_points=stats['skill_points'],
+        curriculum_skills=stats['curriculum_skills'],
+        total_solutions=stats['total_solutions'],
+        total_tasks_created=stats['total_tasks_created'],
         ALLOWED_TASK_TYPES=ALLOWED_TASK_TYPES,
         equity_summary=equity_summary
     )
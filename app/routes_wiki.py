@@ -44,9 +44,9 @@ def wiki_index(project_id):
     
     project = Project.query.get_or_404(project_id)
     
-    # Ottieni la struttura ad albero
+    # Struttura ad albero costruita con una sola query (senza contenuto delle pagine)
     tree_structure = WikiPage.get_tree_structure(project_id)
-    root_pages = WikiPage.get_root_pages(project_id)
+    root_pages = tree_structure
     
     # Se non ci sono pagine, creiamo una pagina di benvenuto
     if not root_pages:
@@ -72,6 +72,8 @@ def create_wiki_page(project_id):
         project_id=project_id,
         is_folder=True
     ).order_by(WikiPage.title).all()
+    # Percorsi completi delle cartelle calcolati in memoria (una query invece di una per antenato)
+    folder_paths = WikiPage.get_path_strings(project_id)
     
     if request.method == 'POST':
         title = request.form.get('title', '').strip()
@@ -86,7 +88,7 @@ def create_wiki_page(project_id):
             cleaned_title = clean_plain_text_field('wiki', 'title', title)
         except ValueError as exc:
             flash(str(exc), 'error')
-            return render_template('wiki/create.html', project=project, folders=all_folders)
+            return render_template('wiki/create.html', project=project, folders=all_folders, folder_paths=folder_paths)
         
         # Per le pagine normali, il contenuto è obbligatorio (le cartelle usano stringa vuota)
         sanitized_content = ''
@@ -95,7 +97,7 @@ def create_wiki_page(project_id):
                 sanitized_content = clean_rich_text_field('wiki', 'content', content)
             except ValueError as exc:
                 flash(str(exc), 'error')
-                return render_template('wiki/create.html', project=project, folders=all_folders)
+                return render_template('wiki/create.html', project=project, folders=all_folders, folder_paths=folder_paths)
         
         # Verifica che il parent esista e sia una cartella
         if parent_id:
@@ -106,7 +108,7 @@ def create_wiki_page(project_id):
             ).first()
             if not parent:
                 flash('La cartella padre selezionata non esiste.', 'error')
-                return render_template('wiki/create.html', project=project, folders=all_folders)
+                return render_template('wiki/create.html', project=project, folders=all_folders, folder_paths=folder_paths)
         
         # Genera slug unico
         base_slug = slugify(title)
@@ -154,7 +156,7 @@ def create_wiki_page(project_id):
         else:
             return redirect(url_for('wiki.view_wiki_page', project_id=project_id, slug=slug))
     
-    return render_template('wiki/create.html', project=project, folders=all_folders)
+    return render_template('wiki/create.html', project=project, folders=all_folders, folder_paths=folder_paths)
 
 @wiki_bp.route('/projects/<int:project_id>/wiki/<slug>')
 @login_required
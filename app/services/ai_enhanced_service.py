@@ -7,9 +7,11 @@ Provides structured outputs, better error handling, and caching.
 import os
 import json
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator, Union
 from functools import lru_cache
 
+from app.services.llm_cache import cached_completion
+
 logger = logging.getLogger(__name__)
 
 # Try to import LangChain components
@@ -121,27 +123,17 @@ class EnhancedAIService:
             return {"error": "AI service not available"}
         
         try:
-            if LANGCHAIN_AVAILABLE:
-                messages = [
-                    SystemMessage(content=system_prompt),
-                    HumanMessage(content=user_prompt)
-                ]
-                
-                response = self.llm.invoke(messages)
-                content = response.content
-            else:
-                # Fallback to basic client
-                response = self.llm.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    max_tokens=2000,
-                    temperature=temperature,
-                    response_format={"type": "json_object"}
-                )
-                content = response.choices[0].message.content
+            content = self._complete(
+                'enhanced.structured',
+                [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                max_tokens=2000,
+                temperature=temperature,
+                validate=lambda text: "error" not in self._parse_json_response(text),
+                response_format={"type": "json_object"}
+            )
             
             # Parse JSON from response
             return self._parse_json_response(content)
@@ -154,8 +146,9 @@ class EnhancedAIService:
         self,
         messages: List[Dict[str, str]],
         context: Optional[str] = None,
-        system_prompt: Optional[str] = None
-    ) -> str:
+        system_prompt: Optional[str] = None,
+        stream: bool = False
+    ) -> Union[str, Iterator[str]]:
         """
         Chat with conversation history and optional context.
         
@@ -163,13 +156,72 @@ class EnhancedAIService:
             messages: List of {role, content} message dicts
             context: Optional context document
             system_prompt: Optional system instructions
+            stream: Return an iterator of tokens as they are generated
             
         Returns:
-            AI response string
+            AI response string, or a token iterator when stream=True
         """
+        if stream:
+            return self._stream_chat(messages, context, system_prompt)
+        
         if not self.available:
             return "AI service not available. Please check configuration."
         
+        full_system = self._chat_system_prompt(context, system_prompt)
+        
+        try:
+            all_messages = [{"role": "system", "content": full_system}]
+            all_messages.extend(messages)
+            return self._complete('enhanced.chat', all_messages, max_tokens=1000, temperature=0.7)
+                
+        except Exception as e:
+            logger.error(f"Chat error: {e}")
+            return "Mi dispiace, si è verificato un errore."
+    
+    def _stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        context: Optional[str],
+        system_prompt: Optional[str]
+    ) -> Iterator[str]:
+        """
+        Token generator behind chat_with_context(stream=True).
+        
+        Closing the generator closes the upstream HTTP stream, so the provider
+        stops generating (and billing) as soon as the client goes away.
+        Errors are raised to the caller, which owns the transport.
+        """
+        if not self.available:
+            yield "AI service not available. Please check configuration."
+            return
+        
+        full_system = self._chat_system_prompt(context, system_prompt)
+        
+        if LANGCHAIN_AVAILABLE:
+            lc_messages = self._langchain_messages([{"role": "system", "content": full_system}] + messages)
+            for chunk in self.llm.stream(lc_messages):
+                if chunk.content:
+                    yield chunk.content
+            return
+        
+        all_messages = [{"role": "system", "content": full_system}]
+        all_messages.extend(messages)
+        response = self.llm.chat.completions.create(
+            model=self.model,
+            messages=all_messages,
+            max_tokens=1000,
+            temperature=0.7,
+            stream=True
+        )
+        try:
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            response.close()
+    
+    def _chat_system_prompt(self, context: Optional[str], system_prompt: Optional[str]) -> str:
+        """Build the chat system prompt, appending the optional context."""
         default_system = (
             "Sei un AI Startup Mentor esperto. Il tuo obiettivo è guidare il fondatore "
             "nella creazione di una startup di successo. Sii conciso, pratico e diretto."
@@ -178,33 +230,58 @@ class EnhancedAIService:
         full_system = system_prompt or default_system
         if context:
             full_system += f"\n\nCONTESTO:\n{context}"
+        return full_system
+    
+    def _langchain_messages(self, messages: List[Dict[str, str]]) -> list:
+        """Convert {role, content} dicts to LangChain messages."""
+        lc_messages = []
+        for msg in messages:
+            if msg['role'] == 'system':
+                lc_messages.append(SystemMessage(content=msg['content']))
+            elif msg['role'] == 'user':
+                lc_messages.append(HumanMessage(content=msg['content']))
+            elif msg['role'] == 'assistant':
+                lc_messages.append(AIMessage(content=msg['content']))
+        return lc_messages
+    
+    def _complete(
+        self,
+        call_site: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        validate=None,
+        **params
+    ) -> str:
+        """
+        Run a (non-streaming) completion through the LLM response cache.
         
-        try:
-            if LANGCHAIN_AVAILABLE:
-                lc_messages = [SystemMessage(content=full_system)]
-                for msg in messages:
-                    if msg['role'] == 'user':
-                        lc_messages.append(HumanMessage(content=msg['content']))
-                    elif msg['role'] == 'assistant':
-                        lc_messages.append(AIMessage(content=msg['content']))
-                
-                response = self.llm.invoke(lc_messages)
-                return response.content
-            else:
-                all_messages = [{"role": "system", "content": full_system}]
-                all_messages.extend(messages)
-                
-                response = self.llm.chat.completions.create(
-                    model=self.model,
-                    messages=all_messages,
-                    max_tokens=1000,
-                    temperature=0.7
-                )
-                return response.choices[0].message.content
-                
-        except Exception as e:
-            logger.error(f"Chat error: {e}")
-            return "Mi dispiace, si è verificato un errore."
+        The LangChain client has its sampling settings fixed at construction,
+        so those are the values that go into the cache key on that path.
+        """
+        if LANGCHAIN_AVAILABLE:
+            return cached_completion(
+                call_site, provider=self.provider, model=self.model, messages=messages,
+                temperature=self.llm.temperature, max_tokens=self.llm.max_tokens,
+                compute=lambda: self.llm.invoke(self._langchain_messages(messages)).content,
+                validate=validate
+            )
+        
+        def compute():
+            response = self.llm.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                **params
+            )
+            return response.choices[0].message.content
+        
+        return cached_completion(
+            call_site, provider=self.provider, model=self.model, messages=messages,
+            temperature=temperature, max_tokens=max_tokens, compute=compute,
+            validate=validate, **params
+        )
     
     def generate_document(
         self,
@@ -254,24 +331,15 @@ ISTRUZIONI:
         user_prompt = f"Genera il contenuto completo per: {doc_type}"
         
         try:
-            if LANGCHAIN_AVAILABLE:
-                messages = [
-                    SystemMessage(content=system_prompt),
-                    HumanMessage(content=user_prompt)
-                ]
-                response = self.llm.invoke(messages)
-                return response.content
-            else:
-                response = self.llm.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    max_tokens=2000,
-                    temperature=0.7
-                )
-                return response.choices[0].message.content
+            return self._complete(
+                'enhanced.document',
+                [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                max_tokens=2000,
+                temperature=0.7
+            )
                 
         except Exception as e:
             logger.error(f"Document generation error: {e}")
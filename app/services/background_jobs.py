@@ -0,0 +1,138 @@
+# app/services/background_jobs.py
+"""
+Job in background per progetto con stato persistito nel workspace.
+
+Un BackgroundJobRunner gestisce un tipo di job (sync task -> GitHub Issues,
+generazione massiva documenti Hub, ...):
+- al massimo un job attivo per progetto in questo processo;
+- il job gira in un thread con il proprio app context e distribuisce gli
+  elementi su un pool di worker limitato (run_items);
+- ogni worker lavora nel proprio app context (quindi con la propria sessione
+  DB) e il progresso viene salvato nel file JSON del job dopo ogni elemento,
+  sempre dentro l'app context;
+- uno stato 'running' senza thread attivo viene riportato come 'interrupted'
+  (processo terminato durante il job).
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundJobRunner:
+    """Avvio, esecuzione e stato dei job di un tipo, un job per progetto."""
+
+    def __init__(
+        self,
+        name: str,
+        load_state: Callable[[int], Dict[str, Any]],
+        save_state: Callable[[int, Dict[str, Any]], None]
+    ):
+        self.name = name
+        self.load_state = load_state
+        self.save_state = save_state
+        self._jobs: Dict[int, threading.Thread] = {}
+        self._guard = threading.Lock()
+
+    def is_running(self, project_id: int) -> bool:
+        with self._guard:
+            return self._is_alive(project_id)
+
+    def _is_alive(self, project_id: int) -> bool:
+        thread = self._jobs.get(project_id)
+        return thread is not None and thread.is_alive()
+
+    def get_status(self, project_id: int) -> Dict[str, Any]:
+        state = self.load_state(project_id)
+        if not state:
+            return {'status': 'idle'}
+        if state.get('status') == 'running' and not self.is_running(project_id):
+            state['status'] = 'interrupted'
+        return state
+
+    def start(
+        self,
+        project_id: int,
+        prepare: Callable[[], Tuple[Dict[str, Any], Callable[[Any], Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Avvia il job in background (o restituisce lo stato di quello già in corso).
+
+        Args:
+            project_id: Progetto del job
+            prepare: Chiamata solo se non c'è un job attivo; restituisce
+                (stato iniziale, funzione job(app) eseguita nel thread)
+        """
+        with self._guard:
+            if self._is_alive(project_id):
+                return self.load_state(project_id)
+
+            state, job = prepare()
+            self.save_state(project_id, state)
+
+            app = current_app._get_current_object()
+            thread = threading.Thread(
+                target=self._run,
+                args=(app, project_id, job, state),
+                name=f"{self.name}-{project_id}",
+                daemon=True
+            )
+            self._jobs[project_id] = thread
+            thread.start()
+            return state
+
+    def _run(self, app, project_id: int, job: Callable[[Any], Any], state: Dict[str, Any]):
+        with app.app_context():
+            try:
+                job(app)
+            except Exception as e:
+                logger.error(f"{self.name} job failed for project {project_id}: {e}", exc_info=True)
+                state['status'] = 'failed'
+                state['error'] = str(e)
+                state['finished_at'] = datetime.now(timezone.utc).isoformat()
+                self.save_state(project_id, state)
+            finally:
+                with self._guard:
+                    if self._jobs.get(project_id) is threading.current_thread():
+                        self._jobs.pop(project_id, None)
+
+    def run_items(
+        self,
+        project_id: int,
+        state: Dict[str, Any],
+        items: Iterable[Any],
+        work: Callable[[Any], Any],
+        record: Callable[[Dict[str, Any], Any, Any], None],
+        max_workers: int,
+        app=None
+    ) -> Dict[str, Any]:
+        """
+        Esegue work(item) su un pool di worker e registra ogni risultato nello stato.
+
+        work gira nell'app context del worker; record(state, item, result) viene
+        chiamata sotto lock e lo stato salvato subito dopo, nello stesso contesto.
+        """
+        app = app or current_app._get_current_object()
+        state_lock = threading.Lock()
+
+        def _process(item):
+            # Ogni worker ha il proprio app context e quindi la propria sessione DB
+            with app.app_context():
+                result = work(item)
+                with state_lock:
+                    record(state, item, result)
+                    self.save_state(project_id, state)
+
+        with ThreadPoolExecutor(max_workers=max(1, int(max_workers))) as executor:
+            list(executor.map(_process, items))
+
+        state['status'] = 'completed'
+        state['finished_at'] = datetime.now(timezone.utc).isoformat()
+        self.save_state(project_id, state)
+        return state
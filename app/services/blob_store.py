@@ -0,0 +1,125 @@
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+from typing import Dict, Optional
+
+from app.workspace_utils import get_workspace_root
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+    """
+    Store content-addressed (SHA-256) per i file del workspace.
+
+    Ogni contenuto viene salvato una sola volta in {workspace_root}/_blobs/ab/abcdef...
+    Sessioni e mirror del repository puntano ai blob tramite hardlink, quindi un
+    file invariato tra due upload non costa né I/O né spazio disco. Il numero di
+    link dell'inode fa da refcount: un blob con un solo link non è più usato da
+    nessuno e può essere rimosso da collect_garbage().
+
+    I file collegati non vanno mai riscritti in place: per aggiornarli si usa
+    link() (rename atomico) oppure si rimuove prima il file.
+    """
+
+    DIR_NAME = '_blobs'
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.path.join(get_workspace_root(), self.DIR_NAME)
+        os.makedirs(self.root, exist_ok=True)
+
+    @classmethod
+    def hash_file(cls, path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as handle:
+            for chunk in iter(lambda: handle.read(cls.CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def has(self, digest: Optional[str]) -> bool:
+        return bool(digest) and os.path.exists(self.blob_path(digest))
+
+    @staticmethod
+    def _place(source: str, dest: str):
+        """Crea dest come hardlink di source (copia se il filesystem non lo supporta)."""
+        tmp_path = f"{dest}.tmp-{uuid.uuid4().hex}"
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, dest)
+
+    def ingest(self, path: str, digest: Optional[str] = None) -> str:
+        """
+        Registra il contenuto di un file nello store e restituisce il suo SHA-256.
+        Se il blob esiste già il file non viene copiato.
+        """
+        digest = digest or self.hash_file(path)
+        blob = self.blob_path(digest)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            self._place(path, blob)
+        return digest
+
+    def is_linked(self, digest: Optional[str], dest: str) -> bool:
+        """True se dest punta già al blob (stesso inode)."""
+        if not digest or not os.path.exists(dest):
+            return False
+        try:
+            return os.path.samefile(self.blob_path(digest), dest)
+        except OSError:
+            return False
+
+    def link(self, digest: str, dest: str) -> bool:
+        """
+        Collega il blob in dest. Restituisce False se dest era già identico,
+        True se il file è stato (ri)scritto.
+        """
+        if self.is_linked(digest, dest):
+            return False
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        self._place(self.blob_path(digest), dest)
+        return True
+
+    def collect_garbage(self, dry_run: bool = False, grace_seconds: int = 3600) -> Dict[str, int]:
+        """
+        Rimuove i blob non più referenziati (un solo hardlink, quello dello store).
+        I blob più recenti di grace_seconds vengono mantenuti per non interferire
+        con upload in corso.
+        """
+        stats = {'removed': 0, 'freed_bytes': 0, 'kept': 0}
+        cutoff = time.time() - grace_seconds
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                blob = os.path.join(prefix_dir, name)
+                try:
+                    stat = os.stat(blob)
+                except OSError:
+                    continue
+                if '.tmp-' in name:
+                    # Residuo di una scrittura interrotta
+                    if stat.st_ctime < cutoff and not dry_run:
+                        os.remove(blob)
+                    continue
+                # ctime cambia a ogni link/unlink: protegge i blob appena creati o scollegati
+                if stat.st_nlink > 1 or stat.st_ctime >= cutoff:
+                    stats['kept'] += 1
+                    continue
+                stats['removed'] += 1
+                stats['freed_bytes'] += stat.st_size
+                if not dry_run:
+                    try:
+                        os.remove(blob)
+                    except OSError as exc:
+                        logger.warning("Unable to remove blob %s: %s", blob, exc)
+        return stats
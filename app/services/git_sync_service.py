@@ -2,23 +2,45 @@
 """
 Git Sync Service - Upload workspace usando git commands invece di GitHub API.
 Più veloce, più semplice, più robusto per upload massivi.
+
+Ogni progetto mantiene un clone persistente (mirror) nella propria workspace:
+prima di ogni sync viene aggiornato con fetch + reset invece di essere
+ri-clonato, così il costo del sync dipende dalla dimensione del diff e non
+da quella del repository. I mirror meno usati vengono rimossi (LRU) quando
+superano il budget disco GIT_MIRROR_MAX_DISK_MB.
 """
 
+import filecmp
+import json
 import logging
 import os
+import re
 import subprocess
-import tempfile
 import shutil
 import threading
-from typing import Dict, Optional, Any
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timezone
 
 from flask import current_app
 from app.models import Project
 from app.services.github_sync_service import GitHubSyncService
+from app.workspace_utils import ensure_project_workspace, get_workspace_root, git_mirror_dir
+
+try:
+    import fcntl  # Lock inter-processo (non disponibile su Windows)
+except ImportError:  # pragma: no cover - dipende dalla piattaforma
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
+MIRROR_USAGE_FILE = 'kick_mirror_usage.json'
+
+# Lock per progetto condivisi tra le istanze del servizio (stesso processo)
+_mirror_thread_locks: Dict[int, threading.Lock] = {}
+_mirror_thread_locks_guard = threading.Lock()
+
 
 class GitSyncService:
     """
@@ -52,18 +74,25 @@ class GitSyncService:
         self,
         project: Project,
         source_directory: str,
-        initiated_by: Optional[int] = None
+        initiated_by: Optional[int] = None,
+        progress=None,
+        deleted_paths: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """
         Sincronizza un'intera directory workspace su GitHub usando git commands.
+        Usa il mirror persistente del progetto (fetch incrementale) e ne
+        serializza l'accesso con un lock per progetto.
         
         Args:
             project: Progetto da sincronizzare
             source_directory: Directory locale con i file da caricare
             initiated_by: ID utente che ha avviato il sync
+            progress: SyncProgress opzionale (bytes copiati, oggetti inviati)
+            deleted_paths: Path del repository ('workspace/...') da rimuovere nello stesso commit
         
         Returns:
-            Dict con risultati: {'status': str, 'message': str, 'commit_sha': str, 'files_synced': int}
+            Dict con risultati: {'status': str, 'message': str, 'commit_sha': str,
+            'files_synced': int, 'files_deleted': int}
         """
         if not self.is_enabled():
             return {
@@ -82,173 +111,30 @@ class GitSyncService:
                     'method': 'git'
                 }
         
-        temp_repo_dir = None
+        # Ottieni token GitHub
+        github_token = current_app.config.get('GITHUB_TOKEN')
+        if not github_token:
+            return {
+                'status': 'error',
+                'message': 'GitHub token not configured',
+                'method': 'git'
+            }
+        
+        public_url, auth_url = self._remote_urls(project, github_token)
+        lock_timeout = current_app.config.get('GIT_MIRROR_LOCK_TIMEOUT', 600)
+        
         try:
-            # Crea directory temporanea per clone
-            temp_repo_dir = tempfile.mkdtemp(prefix=f"git_sync_{project.id}_")
-            logger.info(f"Created temp directory for git sync: {temp_repo_dir}")
-            
-            # Ottieni token GitHub
-            github_token = current_app.config.get('GITHUB_TOKEN')
-            if not github_token:
-                return {
-                    'status': 'error',
-                    'message': 'GitHub token not configured',
-                    'method': 'git'
-                }
-            
-            # Costruisci URL con token per autenticazione
-            repo_url = f"https://github.com/{project.github_repo_name}.git"
-            repo_url_with_token = repo_url.replace(
-                'https://github.com/',
-                f'https://{github_token}@github.com/'
-            )
-            
-            # 1. Clone repository
-            logger.info(f"Cloning repository {project.github_repo_name}...")
-            clone_result = subprocess.run(
-                ['git', 'clone', repo_url_with_token, temp_repo_dir],
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minuti timeout
-            )
-            
-            if clone_result.returncode != 0:
-                error_msg = clone_result.stderr or clone_result.stdout or "Unknown error"
-                logger.error(f"Git clone failed: {error_msg}")
-                return {
-                    'status': 'error',
-                    'message': f'Git clone failed: {error_msg}',
-                    'method': 'git'
-                }
-            
-            # 2. Copia file dalla directory sorgente al repository
-            logger.info(f"Copying files from {source_directory} to repository...")
-            files_copied = self._copy_files_to_repo(source_directory, temp_repo_dir)
-            
-            if files_copied == 0:
-                logger.warning("No files to sync")
-                return {
-                    'status': 'info',
-                    'message': 'No files to sync',
-                    'files_synced': 0,
-                    'method': 'git'
-                }
-            
-            # 3. Configura git user (necessario per commit)
-            subprocess.run(
-                ['git', '-C', temp_repo_dir, 'config', 'user.name', 'KickthisUSs Bot'],
-                check=False,
-                capture_output=True
-            )
-            subprocess.run(
-                ['git', '-C', temp_repo_dir, 'config', 'user.email', 'bot@kickthisuss.com'],
-                check=False,
-                capture_output=True
-            )
-            
-            # 4. Git add
-            logger.info("Staging files...")
-            add_result = subprocess.run(
-                ['git', '-C', temp_repo_dir, 'add', '.'],
-                capture_output=True,
-                text=True,
-                timeout=60
-            )
-            
-            if add_result.returncode != 0:
-                logger.warning(f"Git add had warnings: {add_result.stderr}")
-            
-            # 5. Git commit
-            commit_message = f"Upload workspace: {files_copied} files via KickthisUSs"
-            logger.info(f"Committing changes: {commit_message}")
-            commit_result = subprocess.run(
-                ['git', '-C', temp_repo_dir, 'commit', '-m', commit_message],
-                capture_output=True,
-                text=True,
-                timeout=60
-            )
-            
-            if commit_result.returncode != 0:
-                # Potrebbe essere che non ci sono cambiamenti (tutto già committato)
-                if 'nothing to commit' in commit_result.stdout.lower():
-                    logger.info("No changes to commit (files already up to date)")
-                    # Ottieni ultimo commit SHA
-                    log_result = subprocess.run(
-                        ['git', '-C', temp_repo_dir, 'log', '-1', '--format=%H'],
-                        capture_output=True,
-                        text=True,
-                        timeout=10
-                    )
-                    commit_sha = log_result.stdout.strip() if log_result.returncode == 0 else None
-                    
-                    return {
-                        'status': 'success',
-                        'message': f'Workspace already up to date ({files_copied} files)',
-                        'commit_sha': commit_sha,
-                        'files_synced': files_copied,
-                        'method': 'git'
-                    }
-                else:
-                    error_msg = commit_result.stderr or commit_result.stdout or "Unknown error"
-                    logger.error(f"Git commit failed: {error_msg}")
-                    return {
-                        'status': 'error',
-                        'message': f'Git commit failed: {error_msg}',
-                        'method': 'git'
-                    }
-            
-            # Ottieni commit SHA
-            log_result = subprocess.run(
-                ['git', '-C', temp_repo_dir, 'log', '-1', '--format=%H'],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            commit_sha = log_result.stdout.strip() if log_result.returncode == 0 else None
-            
-            # 6. Git push
-            logger.info("Pushing to GitHub...")
-            push_result = subprocess.run(
-                ['git', '-C', temp_repo_dir, 'push', 'origin', 'main'],
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minuti timeout
-            )
-            
-            if push_result.returncode != 0:
-                # Prova con 'master' se 'main' fallisce
-                push_result = subprocess.run(
-                    ['git', '-C', temp_repo_dir, 'push', 'origin', 'master'],
-                    capture_output=True,
-                    text=True,
-                    timeout=300
+            with self._mirror_lock(project.id, timeout=lock_timeout):
+                return self._sync_with_mirror(
+                    project, source_directory, public_url, auth_url, progress, deleted_paths
                 )
-            
-            if push_result.returncode != 0:
-                error_msg = push_result.stderr or push_result.stdout or "Unknown error"
-                logger.error(f"Git push failed: {error_msg}")
-                return {
-                    'status': 'error',
-                    'message': f'Git push failed: {error_msg}',
-                    'commit_sha': commit_sha,
-                    'method': 'git'
-                }
-            
-            logger.info(
-                f"✅ Git sync completed for project {project.id}: "
-                f"{files_copied} files in commit {commit_sha}"
-            )
-            
+        except TimeoutError:
+            logger.error(f"Timeout waiting for git mirror lock of project {project.id}")
             return {
-                'status': 'success',
-                'message': f'Workspace synchronized: {files_copied} files in 1 commit',
-                'commit_sha': commit_sha,
-                'commit_url': f"https://github.com/{project.github_repo_name}/commit/{commit_sha}" if commit_sha else None,
-                'files_synced': files_copied,
+                'status': 'error',
+                'message': 'Another sync is already running for this project',
                 'method': 'git'
             }
-            
         except subprocess.TimeoutExpired:
             logger.error(f"Git command timeout for project {project.id}")
             return {
@@ -264,15 +150,397 @@ class GitSyncService:
                 'method': 'git'
             }
         finally:
-            # Cleanup: rimuovi directory temporanea
-            if temp_repo_dir and os.path.exists(temp_repo_dir):
+            try:
+                self._evict_cold_mirrors(active_project_id=project.id)
+            except Exception as evict_err:
+                logger.warning(f"Git mirror eviction failed: {evict_err}")
+    
+    def _sync_with_mirror(
+        self,
+        project: Project,
+        source_directory: str,
+        public_url: str,
+        auth_url: str,
+        progress=None,
+        deleted_paths: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Esegue copy/rm/commit/push sul mirror del progetto. Richiede il lock del mirror."""
+        # 1. Aggiorna (o crea) il mirror persistente
+        repo_dir, branch, error_msg = self._prepare_mirror(project, public_url, auth_url)
+        if error_msg:
+            return {
+                'status': 'error',
+                'message': error_msg,
+                'method': 'git'
+            }
+        
+        # 2. Copia file dalla directory sorgente al repository
+        logger.info(f"Copying files from {source_directory} to repository...")
+        if progress:
+            progress.phase('copying', bytes_copied=0)
+        files_copied = self._copy_files_to_repo(source_directory, repo_dir, progress)
+        files_deleted = self._remove_files_from_repo(repo_dir, deleted_paths or [])
+        
+        if files_copied == 0 and files_deleted == 0:
+            logger.warning("No files to sync")
+            return {
+                'status': 'info',
+                'message': 'No files to sync',
+                'files_synced': 0,
+                'method': 'git'
+            }
+        
+        # 3. Configura git user (necessario per commit)
+        self._git(repo_dir, 'config', 'user.name', 'KickthisUSs Bot')
+        self._git(repo_dir, 'config', 'user.email', 'bot@kickthisuss.com')
+        
+        # 4. Git add
+        logger.info("Staging files...")
+        if progress:
+            progress.phase('committing')
+        add_result = self._git(repo_dir, 'add', '.', timeout=60)
+        
+        if add_result.returncode != 0:
+            logger.warning(f"Git add had warnings: {add_result.stderr}")
+        
+        # 5. Git commit
+        commit_message = f"Upload workspace: {files_copied} files via KickthisUSs"
+        if files_deleted:
+            commit_message += f" ({files_deleted} removed)"
+        logger.info(f"Committing changes: {commit_message}")
+        commit_result = self._git(repo_dir, 'commit', '-m', commit_message, timeout=60)
+        
+        if commit_result.returncode != 0:
+            # Potrebbe essere che non ci sono cambiamenti (tutto già committato)
+            if 'nothing to commit' in commit_result.stdout.lower():
+                logger.info("No changes to commit (files already up to date)")
+                return {
+                    'status': 'success',
+                    'message': f'Workspace already up to date ({files_copied} files)',
+                    'commit_sha': self._head_sha(repo_dir),
+                    'files_synced': files_copied,
+                    'files_deleted': files_deleted,
+                    'method': 'git'
+                }
+            error_msg = commit_result.stderr or commit_result.stdout or "Unknown error"
+            logger.error(f"Git commit failed: {error_msg}")
+            return {
+                'status': 'error',
+                'message': f'Git commit failed: {error_msg}',
+                'method': 'git'
+            }
+        
+        # Ottieni commit SHA
+        commit_sha = self._head_sha(repo_dir)
+        
+        # 6. Git push (sul branch remoto tracciato, oppure main/master per repo vuoti)
+        logger.info("Pushing to GitHub...")
+        if progress:
+            progress.phase('pushing', objects_pushed=0, objects_total=0)
+        push_result = None
+        for target_branch in ([branch] if branch else ['main', 'master']):
+            push_result = self._git_push(
+                repo_dir, auth_url, f'HEAD:refs/heads/{target_branch}',
+                timeout=300,  # 5 minuti timeout
+                progress=progress
+            )
+            if push_result.returncode == 0:
+                # Allinea il ref remoto locale: il prossimo fetch sarà un no-op
+                self._git(repo_dir, 'update-ref', f'refs/remotes/origin/{target_branch}', 'HEAD')
+                break
+        
+        if push_result.returncode != 0:
+            error_msg = push_result.stderr or push_result.stdout or "Unknown error"
+            logger.error(f"Git push failed: {error_msg}")
+            return {
+                'status': 'error',
+                'message': f'Git push failed: {error_msg}',
+                'commit_sha': commit_sha,
+                'method': 'git'
+            }
+        
+        logger.info(
+            f"✅ Git sync completed for project {project.id}: "
+            f"{files_copied} files in commit {commit_sha}"
+        )
+        
+        return {
+            'status': 'success',
+            'message': f'Workspace synchronized: {files_copied} files in 1 commit',
+            'commit_sha': commit_sha,
+            'commit_url': f"https://github.com/{project.github_repo_name}/commit/{commit_sha}" if commit_sha else None,
+            'files_synced': files_copied,
+            'files_deleted': files_deleted,
+            'method': 'git'
+        }
+    
+    # ------------------------------------------------------------------
+    # Mirror persistente
+    # ------------------------------------------------------------------
+    
+    def _remote_urls(self, project: Project, github_token: str) -> Tuple[str, str]:
+        """
+        Restituisce (url pubblico, url autenticato) del repository.
+        L'url con token viene passato solo sulla command line di fetch/push
+        e non viene mai salvato nella config del mirror.
+        """
+        repo_url = f"https://github.com/{project.github_repo_name}.git"
+        repo_url_with_token = repo_url.replace(
+            'https://github.com/',
+            f'https://{github_token}@github.com/'
+        )
+        return repo_url, repo_url_with_token
+    
+    def _git(self, repo_dir: str, *args: str, timeout: int = 30) -> subprocess.CompletedProcess:
+        """Esegue un comando git nel repository indicato senza prompt interattivi."""
+        env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+        return subprocess.run(
+            ['git', '-C', repo_dir, *args],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            env=env
+        )
+    
+    def _git_push(
+        self,
+        repo_dir: str,
+        remote: str,
+        refspec: str,
+        timeout: int = 300,
+        progress=None
+    ) -> subprocess.CompletedProcess:
+        """
+        git push con --progress: le righe "Writing objects: n% (x/y)" di stderr
+        vengono inoltrate al reporter mentre il push è in corso.
+        """
+        if progress is None:
+            return self._git(repo_dir, 'push', remote, refspec, timeout=timeout)
+        
+        env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+        args = ['git', '-C', repo_dir, 'push', '--progress', remote, refspec]
+        process = subprocess.Popen(
+            args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env
+        )
+        stdout_chunks = []
+        reader = threading.Thread(
+            target=lambda: stdout_chunks.append(process.stdout.read()), daemon=True
+        )
+        reader.start()
+        
+        # read1() è bloccante: il timeout è garantito da un timer che termina git
+        timed_out = threading.Event()
+        
+        def _kill():
+            timed_out.set()
+            process.kill()
+        
+        timer = threading.Timer(timeout, _kill)
+        timer.start()
+        stderr_lines = []
+        buffer = b''
+        try:
+            while True:
+                chunk = process.stderr.read1(4096)
+                if not chunk:
+                    break
+                buffer += chunk
+                # git separa gli aggiornamenti di avanzamento con \r
+                *lines, buffer = re.split(rb'[\r\n]', buffer)
+                for raw in lines:
+                    line = raw.decode('utf-8', errors='replace')
+                    if line:
+                        stderr_lines.append(line)
+                        progress.git_output(line)
+            if buffer:
+                stderr_lines.append(buffer.decode('utf-8', errors='replace'))
+            returncode = process.wait()
+        finally:
+            timer.cancel()
+        reader.join(timeout=5)
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(args, timeout)
+        stdout = b''.join(stdout_chunks).decode('utf-8', errors='replace')
+        # Il token è nell'URL remoto: non deve comparire nei messaggi d'errore
+        stderr = '\n'.join(stderr_lines).replace(remote, '<remote>')
+        return subprocess.CompletedProcess(args, returncode, stdout, stderr)
+    
+    def _head_sha(self, repo_dir: str) -> Optional[str]:
+        log_result = self._git(repo_dir, 'log', '-1', '--format=%H', timeout=10)
+        return log_result.stdout.strip() if log_result.returncode == 0 else None
+    
+    def _prepare_mirror(
+        self,
+        project: Project,
+        public_url: str,
+        auth_url: str
+    ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """
+        Porta il mirror del progetto allo stato del branch remoto.
+        
+        Se il mirror esiste viene eseguito un fetch incrementale seguito da
+        reset --hard + clean; altrimenti (o se il fetch fallisce) viene clonato.
+        
+        Returns:
+            Tuple (mirror_dir, branch remoto o None se repo vuoto, messaggio di errore)
+        """
+        mirror_dir = git_mirror_dir(project.id)
+        git_dir = os.path.join(mirror_dir, '.git')
+        
+        if os.path.isdir(git_dir):
+            logger.info(f"Fetching updates into git mirror for {project.github_repo_name}...")
+            fetch_result = self._git(
+                mirror_dir, 'fetch', '--prune', auth_url,
+                '+refs/heads/*:refs/remotes/origin/*',
+                timeout=300
+            )
+            if fetch_result.returncode != 0:
+                logger.warning(
+                    f"Git fetch failed for project {project.id}, re-cloning mirror: "
+                    f"{fetch_result.stderr or fetch_result.stdout}"
+                )
+                shutil.rmtree(mirror_dir, ignore_errors=True)
+        
+        if not os.path.isdir(git_dir):
+            shutil.rmtree(mirror_dir, ignore_errors=True)
+            logger.info(f"Cloning repository {project.github_repo_name} into git mirror...")
+            clone_result = subprocess.run(
+                ['git', 'clone', auth_url, mirror_dir],
+                capture_output=True,
+                text=True,
+                timeout=300,  # 5 minuti timeout
+                env=dict(os.environ, GIT_TERMINAL_PROMPT='0')
+            )
+            if clone_result.returncode != 0:
+                shutil.rmtree(mirror_dir, ignore_errors=True)
+                error_msg = clone_result.stderr or clone_result.stdout or "Unknown error"
+                logger.error(f"Git clone failed: {error_msg}")
+                return None, None, f'Git clone failed: {error_msg}'
+            # Non lasciare il token nella config del mirror persistente
+            self._git(mirror_dir, 'remote', 'set-url', 'origin', public_url)
+        
+        branch = self._remote_branch(mirror_dir)
+        if branch:
+            checkout_result = self._git(mirror_dir, 'checkout', '-f', '-B', branch, f'origin/{branch}')
+            if checkout_result.returncode != 0:
+                return None, None, f'Git checkout failed: {checkout_result.stderr or checkout_result.stdout}'
+            self._git(mirror_dir, 'reset', '--hard', f'origin/{branch}', timeout=120)
+        # Rimuove residui di sync precedenti non andati a buon fine
+        self._git(mirror_dir, 'clean', '-ffdx', timeout=120)
+        
+        self._touch_mirror(mirror_dir)
+        return mirror_dir, branch, None
+    
+    def _remote_branch(self, mirror_dir: str) -> Optional[str]:
+        """Determina il branch remoto da aggiornare (default del repo, poi main/master)."""
+        head_result = self._git(mirror_dir, 'symbolic-ref', '--short', 'refs/remotes/origin/HEAD')
+        candidates = []
+        if head_result.returncode == 0 and head_result.stdout.strip().startswith('origin/'):
+            candidates.append(head_result.stdout.strip()[len('origin/'):])
+        candidates.extend(['main', 'master'])
+        
+        for candidate in candidates:
+            verify = self._git(mirror_dir, 'rev-parse', '--verify', '--quiet', f'refs/remotes/origin/{candidate}')
+            if verify.returncode == 0:
+                return candidate
+        return None
+    
+    @contextmanager
+    def _mirror_lock(self, project_id: int, timeout: float = 600):
+        """
+        Lock esclusivo sul mirror di un progetto.
+        Combina un lock di thread (stesso processo) con flock su file
+        (worker diversi) quando disponibile. Solleva TimeoutError se non
+        acquisito entro `timeout` secondi (0 = non bloccante).
+        """
+        with _mirror_thread_locks_guard:
+            thread_lock = _mirror_thread_locks.setdefault(project_id, threading.Lock())
+        
+        if not thread_lock.acquire(timeout=timeout):
+            raise TimeoutError(f"Git mirror lock busy for project {project_id}")
+        
+        lock_file = None
+        try:
+            if fcntl is not None:
+                lock_path = os.path.join(ensure_project_workspace(project_id), 'git_mirror.lock')
+                lock_file = open(lock_path, 'a+')
+                deadline = time.monotonic() + timeout
+                while True:
+                    try:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() >= deadline:
+                            raise TimeoutError(f"Git mirror lock busy for project {project_id}")
+                        time.sleep(0.2)
+            yield
+        finally:
+            if lock_file is not None:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                finally:
+                    lock_file.close()
+            thread_lock.release()
+    
+    def _touch_mirror(self, mirror_dir: str):
+        """Registra ultimo utilizzo e dimensione del mirror (usati per l'eviction LRU)."""
+        size_bytes = 0
+        for root, _, filenames in os.walk(mirror_dir):
+            for filename in filenames:
                 try:
-                    shutil.rmtree(temp_repo_dir, ignore_errors=True)
-                    logger.debug(f"Cleaned up temp directory: {temp_repo_dir}")
-                except Exception as cleanup_err:
-                    logger.warning(f"Failed to cleanup temp directory: {cleanup_err}")
+                    size_bytes += os.lstat(os.path.join(root, filename)).st_size
+                except OSError:
+                    continue
+        usage_path = os.path.join(mirror_dir, '.git', MIRROR_USAGE_FILE)
+        with open(usage_path, 'w', encoding='utf-8') as fp:
+            json.dump({
+                'last_used_at': datetime.now(timezone.utc).isoformat(),
+                'size_bytes': size_bytes
+            }, fp)
     
-    def _copy_files_to_repo(self, source_dir: str, repo_dir: str) -> int:
+    def _evict_cold_mirrors(self, active_project_id: Optional[int] = None) -> int:
+        """
+        Rimuove i mirror usati meno di recente finché lo spazio occupato
+        non rientra in GIT_MIRROR_MAX_DISK_MB. Il mirror del progetto attivo
+        e quelli con un sync in corso non vengono mai toccati.
+        
+        Returns:
+            Numero di mirror rimossi
+        """
+        budget = current_app.config.get('GIT_MIRROR_MAX_DISK_MB', 2048) * 1024 * 1024
+        root = get_workspace_root()
+        
+        mirrors = []
+        for entry in os.listdir(root):
+            if not entry.isdigit():
+                continue
+            usage_path = os.path.join(root, entry, 'git_mirror', '.git', MIRROR_USAGE_FILE)
+            try:
+                last_used = os.path.getmtime(usage_path)
+                with open(usage_path, 'r', encoding='utf-8') as fp:
+                    size_bytes = int(json.load(fp).get('size_bytes', 0))
+            except (OSError, ValueError):
+                continue
+            mirrors.append((last_used, int(entry), size_bytes))
+        
+        total = sum(size for _, _, size in mirrors)
+        evicted = 0
+        for _, project_id, size_bytes in sorted(mirrors):
+            if total <= budget:
+                break
+            if project_id == active_project_id:
+                continue
+            try:
+                with self._mirror_lock(project_id, timeout=0):
+                    shutil.rmtree(git_mirror_dir(project_id), ignore_errors=True)
+            except TimeoutError:
+                continue
+            total -= size_bytes
+            evicted += 1
+            logger.info(f"Evicted cold git mirror for project {project_id} ({size_bytes / 1024 / 1024:.1f} MB)")
+        return evicted
+    
+    def _copy_files_to_repo(self, source_dir: str, repo_dir: str, progress=None) -> int:
         """
         Copia file dalla directory sorgente al repository.
         Esclude file e cartelle non necessari (.git, __pycache__, etc.)
@@ -321,16 +589,57 @@ class GitSyncService:
                     logger.debug(f"Skipping filtered file: {relative_path}")
                     continue
                 
-                # Copia file
+                # Copia file (saltando quelli identici già presenti nel mirror:
+                # mantiene valida la stat cache di git, che così ri-hasha solo i file modificati)
                 dest_path = os.path.join(dest_root, filename)
                 try:
-                    shutil.copy2(source_path, dest_path)
+                    if not self._is_unchanged(source_path, dest_path):
+                        shutil.copy2(source_path, dest_path)
                     files_copied += 1
+                    if progress:
+                        progress.advance(bytes_copied=os.path.getsize(source_path))
                 except Exception as e:
                     logger.warning(f"Failed to copy file {relative_path}: {e}")
         
         return files_copied
     
+    def _remove_files_from_repo(self, repo_dir: str, deleted_paths: List[str]) -> int:
+        """
+        Rimuove dal repository (indice e working tree) i path 'workspace/...' indicati.
+        
+        Returns:
+            Numero di file rimossi
+        """
+        from app.workspace_utils import sanitize_workspace_path
+        
+        existing = []
+        for path in deleted_paths:
+            try:
+                relative = sanitize_workspace_path(path[len('workspace/'):])
+            except ValueError:
+                continue
+            if os.path.isfile(os.path.join(repo_dir, 'workspace', *relative.split('/'))):
+                existing.append(f"workspace/{relative}")
+        
+        # A blocchi, per non superare la lunghezza massima della riga di comando
+        for start in range(0, len(existing), 500):
+            rm_result = self._git(
+                repo_dir, 'rm', '-q', '--ignore-unmatch', '--', *existing[start:start + 500], timeout=60
+            )
+            if rm_result.returncode != 0:
+                raise RuntimeError(f"git rm failed: {rm_result.stderr or rm_result.stdout}")
+        return len(existing)
+    
+    @staticmethod
+    def _is_unchanged(source_path: str, dest_path: str) -> bool:
+        """True se dest_path esiste già con lo stesso contenuto di source_path."""
+        try:
+            if os.path.getsize(source_path) != os.path.getsize(dest_path):
+                return False
+        except OSError:
+            return False
+        return filecmp.cmp(source_path, dest_path, shallow=False)
+    
     def sync_workspace_async(
         self,
         project: Project,
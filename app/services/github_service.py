@@ -12,6 +12,7 @@ DESIGN PRINCIPLES:
 
 import os
 import base64
+import hashlib
 import logging
 from typing import Optional, Dict, Any, List
 from datetime import datetime
@@ -21,7 +22,7 @@ from flask import current_app
 from app.common_utils.github_utils import sanitize_repo_name, generate_pr_body
 
 try:
-    from github import Github, GithubException, RateLimitExceededException
+    from github import Github, GithubException, RateLimitExceededException, InputGitTreeElement
     from github.Repository import Repository
     from github.GithubObject import NotSet
     GITHUB_AVAILABLE = True
@@ -30,6 +31,7 @@ except ImportError:
     Github = None
     GithubException = Exception
     RateLimitExceededException = Exception
+    InputGitTreeElement = None
     Repository = None
 
 logger = logging.getLogger(__name__)
@@ -40,6 +42,16 @@ class GitHubServiceError(Exception):
     pass
 
 
+def git_blob_sha(content: bytes) -> str:
+    """SHA-1 di un blob calcolato come fa git (header 'blob <size>\\0' + contenuto)."""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    digest = hashlib.sha1()
+    digest.update(f"blob {len(content)}\0".encode('ascii'))
+    digest.update(content)
+    return digest.hexdigest()
+
+
 class GitHubService:
     """
     Service per interagire con GitHub API.
@@ -127,7 +139,31 @@ class GitHubService:
         except Exception as e:
             logger.error(f"Failed to get rate limit: {e}")
             return {'enabled': True, 'error': str(e)}
-    
+
+    def get_last_rate_limit(self) -> Optional[Dict[str, Any]]:
+        """
+        Rate limit core letto dagli header X-RateLimit-* dell'ultima risposta.
+
+        A differenza di get_rate_limit() non consuma una richiesta (salvo la
+        prima volta, quando PyGithub non ha ancora visto alcun header).
+
+        Returns:
+            Dict con 'remaining', 'limit' e 'reset' (epoch) o None se non disponibile
+        """
+        if not self.is_enabled():
+            return None
+
+        try:
+            remaining, limit = self.github.rate_limiting
+            return {
+                'remaining': remaining,
+                'limit': limit,
+                'reset': self.github.rate_limiting_resettime
+            }
+        except Exception as e:
+            logger.debug(f"Rate limit headers not available: {e}")
+            return None
+
     def create_repository(
         self, 
         name: str, 
@@ -244,26 +280,38 @@ class GitHubService:
         repo_name: str,
         files: List[Dict[str, Any]],
         commit_message: str = "Batch upload via KickthisUSs",
-        branch: str = "main"
+        branch: str = "main",
+        deleted_paths: Optional[List[str]] = None,
+        known_tree: Optional[Dict[str, str]] = None,
+        known_commit_sha: Optional[str] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Carica multipli file su GitHub usando Tree API (batch upload).
         Molto più veloce di upload sequenziali (10-30x).
         
+        I file il cui SHA git coincide con quello già presente sul branch non
+        vengono inviati: tutte le modifiche finiscono in un unico tree/commit,
+        e se non cambia nulla non viene creato alcun commit.
+        
         Args:
             repo_name: Nome repository (es. "org/repo")
             files: Lista di dict con keys: 'path', 'content' (bytes), 'mode' (opzionale, default '100644')
             commit_message: Messaggio commit
             branch: Branch su cui committare
+            deleted_paths: Path da rimuovere dal branch
+            known_tree: Mappa path -> blob SHA nota (manifest dell'ultimo sync)
+            known_commit_sha: Commit a cui si riferisce known_tree; se coincide con
+                la testa del branch evita di scaricare il tree ricorsivo
         
         Returns:
-            Dict con info del commit creato o None se errore
+            Dict con info del commit creato o None se errore.
+            'tree_files' contiene la mappa path -> blob SHA risultante.
         """
         if not self.is_enabled():
             logger.warning("GitHub service not enabled - cannot upload files batch")
             return None
         
-        if not files:
+        if not files and not deleted_paths:
             logger.warning("Empty files list for batch upload")
             return None
         
@@ -300,25 +348,30 @@ class GitHubService:
                 except GithubException as e:
                     raise GitHubServiceError(f"Could not get base commit for branch {branch}: {e}")
             
-            # Ottieni tree corrente (recursive per vedere tutti i file)
             base_commit = repo.get_git_commit(base_commit_sha)
             base_tree_sha = base_commit.tree.sha
             
-            # Costruisci mappa path -> SHA per file esistenti
-            existing_files = {}
-            try:
-                base_tree = repo.get_git_tree(base_tree_sha, recursive=True)
-                for item in base_tree.tree:
-                    if item.type == 'blob':  # Solo file, non directory
-                        existing_files[item.path] = item.sha
-            except GithubException as e:
-                logger.warning(f"Could not get recursive tree (might be empty repo): {e}")
+            # Mappa path -> SHA per file esistenti: dal manifest se ancora valido,
+            # altrimenti dal tree ricorsivo del branch
+            if known_tree is not None and known_commit_sha == base_commit_sha:
+                existing_files = dict(known_tree)
+            else:
                 existing_files = {}
+                try:
+                    base_tree = repo.get_git_tree(base_tree_sha, recursive=True)
+                    for item in base_tree.tree:
+                        if item.type == 'blob':  # Solo file, non directory
+                            existing_files[item.path] = item.sha
+                except GithubException as e:
+                    logger.warning(f"Could not get recursive tree (might be empty repo): {e}")
+                    existing_files = {}
             
-            # Crea blob per nuovi file o usa SHA esistenti
+            # Crea blob solo per file nuovi o modificati
             tree_items = []
             new_files_count = 0
             updated_files_count = 0
+            unchanged_files_count = 0
+            resulting_files = dict(existing_files)
             
             for file_info in files:
                 file_path = file_info.get('path')
@@ -328,48 +381,67 @@ class GitHubService:
                 if isinstance(content, str):
                     content = content.encode('utf-8')
                 
-                # Se file esiste e contenuto è identico, usa SHA esistente
+                local_sha = git_blob_sha(content)
+                if existing_files.get(file_path) == local_sha:
+                    unchanged_files_count += 1
+                    continue
+                
                 if file_path in existing_files:
-                    # Verifica se contenuto è cambiato (opzionale: potremmo sempre creare nuovo blob)
-                    # Per semplicità, creiamo sempre nuovo blob se file è nella lista upload
-                    blob_sha = existing_files[file_path]
                     updated_files_count += 1
                 else:
-                    blob_sha = None
                     new_files_count += 1
                 
-                # Crea nuovo blob (anche per file esistenti, per garantire contenuto aggiornato)
                 content_base64 = base64.b64encode(content).decode('utf-8')
                 blob = repo.create_git_blob(content_base64, 'base64')
-                blob_sha = blob.sha
-                
-                tree_items.append({
-                    'path': file_path,
-                    'mode': mode,
-                    'type': 'blob',
-                    'sha': blob_sha
-                })
+                resulting_files[file_path] = blob.sha
+                tree_items.append(InputGitTreeElement(path=file_path, mode=mode, type='blob', sha=blob.sha))
+            
+            deleted_files_count = 0
+            for file_path in deleted_paths or []:
+                if file_path in existing_files:
+                    # sha=None rimuove il path dal tree
+                    tree_items.append(InputGitTreeElement(path=file_path, mode='100644', type='blob', sha=None))
+                    resulting_files.pop(file_path, None)
+                    deleted_files_count += 1
+            
+            elapsed = (datetime.utcnow() - start_time).total_seconds()
+            if not tree_items:
+                logger.info(f"Batch upload skipped: {unchanged_files_count} files already up to date on {branch}")
+                return {
+                    'commit': {'sha': base_commit_sha, 'url': None, 'message': None},
+                    'tree': {'sha': base_tree_sha},
+                    'files_count': len(files),
+                    'new_files': 0,
+                    'updated_files': 0,
+                    'deleted_files': 0,
+                    'unchanged_files': unchanged_files_count,
+                    'tree_files': resulting_files,
+                    'elapsed_seconds': elapsed,
+                    'total_size_bytes': total_size
+                }
             
             # Crea nuovo tree
             # base_tree mantiene automaticamente tutti i file esistenti non modificati
-            # tree_items contiene solo i file nuovi/aggiornati
-            new_tree = repo.create_git_tree(tree_items, base_tree=base_tree_sha)
+            # tree_items contiene solo i file nuovi/aggiornati/rimossi
+            new_tree = repo.create_git_tree(tree_items, base_tree=base_commit.tree)
             
             # Crea commit
             new_commit = repo.create_git_commit(
                 message=commit_message,
-                tree=new_tree.sha,
-                parents=[base_commit_sha]
+                tree=new_tree,
+                parents=[base_commit]
             )
             
             # Aggiorna branch
-            branch_ref_obj = repo.get_git_ref(f"refs/heads/{branch}")
+            branch_ref_obj = repo.get_git_ref(f"heads/{branch}")
             branch_ref_obj.edit(new_commit.sha)
             
             elapsed = (datetime.utcnow() - start_time).total_seconds()
             logger.info(
-                f"Batch upload successful: {len(files)} files ({new_files_count} new, {updated_files_count} updated) "
-                f"in {elapsed:.2f}s ({total_size / 1024 / 1024:.2f} MB total)"
+                f"Batch upload successful: {len(tree_items)} changes ({new_files_count} new, "
+                f"{updated_files_count} updated, {deleted_files_count} deleted, "
+                f"{unchanged_files_count} unchanged) in {elapsed:.2f}s "
+                f"({total_size / 1024 / 1024:.2f} MB total)"
             )
             
             return {
@@ -384,6 +456,9 @@ class GitHubService:
                 'files_count': len(files),
                 'new_files': new_files_count,
                 'updated_files': updated_files_count,
+                'deleted_files': deleted_files_count,
+                'unchanged_files': unchanged_files_count,
+                'tree_files': resulting_files,
                 'elapsed_seconds': elapsed,
                 'total_size_bytes': total_size
             }
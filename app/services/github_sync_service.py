@@ -17,7 +17,7 @@ from typing import Optional, Dict, Any, List
 from datetime import datetime, timezone
 from flask import current_app
 
-from .github_service import GitHubService, GitHubServiceError
+from .github_service import GitHubService, GitHubServiceError, git_blob_sha
 from app.models import Project, Task, User, db
 from app.services.zip_processor import ZipProcessor
 import shutil
@@ -164,21 +164,29 @@ class GitHubSyncService:
     def sync_multiple_files(
         self,
         project: Project,
-        files: List[Dict[str, Any]]
+        files: List[Dict[str, Any]],
+        deleted_paths: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """
         Sincronizza multipli file con GitHub.
         Usa batch upload (Tree API) quando possibile per performance 10-30x migliori.
         Fallback automatico a metodo sequenziale se batch fallisce.
         
+        Il manifest per progetto (path -> blob SHA dell'ultimo sync riuscito)
+        permette di confrontare gli SHA git calcolati in locale: solo i file
+        aggiunti, modificati o rimossi finiscono in un unico tree/commit.
+        
         Args:
             project: Progetto a cui appartengono i file
             files: Lista di dict con keys: 'path', 'content', 'message' (opzionale)
+            deleted_paths: Path da rimuovere dal repository (opzionale)
         
         Returns:
             Dict con risultati: {'success': int, 'failed': int, 'errors': List[str], 'method': str, 'blocked': List[str]}
         """
-        from app.workspace_utils import is_file_safe, should_sync_to_github
+        from app.workspace_utils import (
+            is_file_safe, should_sync_to_github, load_github_manifest, save_github_manifest
+        )
         
         results = {
             'success': 0,
@@ -186,7 +194,8 @@ class GitHubSyncService:
             'errors': [],
             'method': 'unknown',
             'blocked': [],  # File bloccati per sicurezza
-            'ignored': []   # File ignorati (build artifacts, etc)
+            'ignored': [],  # File ignorati (build artifacts, etc)
+            'unchanged': 0  # File identici all'ultimo sync
         }
         
         if not self.is_enabled():
@@ -220,7 +229,7 @@ class GitHubSyncService:
             
             valid_files.append(file_info)
         
-        if not valid_files:
+        if not valid_files and not deleted_paths:
             return results
         
         # Assicura che il repository esista
@@ -231,75 +240,95 @@ class GitHubSyncService:
                 results['failed'] = len(valid_files)
                 return results
         
-        # PRIORITÀ: Prova batch upload (veloce) - solo se > 1 file o se esplicitamente richiesto
-        if len(valid_files) > 1:  # Batch ha senso solo con > 1 file
-            try:
-                import time
-                start_time = time.time()
-                
-                # Prepara files per batch upload
-                batch_files = []
-                for file_info in valid_files:
-                    batch_files.append({
-                        'path': file_info.get('path'),
-                        'content': file_info.get('content', b''),
-                        'mode': '100644'  # Default: file normale
-                    })
-                
-                # Genera commit message intelligente
-                commit_message = self._generate_batch_commit_message(valid_files)
-                
-                # Limita batch a 100 file alla volta (se più file, dividi in batch multipli)
-                BATCH_SIZE = 100
-                total_success = 0
-                total_failed = 0
-                
-                for i in range(0, len(batch_files), BATCH_SIZE):
-                    batch_chunk = batch_files[i:i + BATCH_SIZE]
-                    
-                    batch_result = self.github_service.upload_files_batch(
-                        repo_name=project.github_repo_name,
-                        files=batch_chunk,
-                        commit_message=commit_message if i == 0 else f"{commit_message} (batch {i // BATCH_SIZE + 1})",
-                        branch='main'  # TODO: leggere branch da ProjectRepository se disponibile
-                    )
-                    
-                    if batch_result:
-                        total_success += len(batch_chunk)
-                        logger.info(
-                            f"Batch upload successful for project {project.id}: "
-                            f"{len(batch_chunk)} files in {batch_result.get('elapsed_seconds', 0):.2f}s"
-                        )
-                    else:
-                        total_failed += len(batch_chunk)
-                        results['errors'].append(f"Batch upload failed for chunk {i // BATCH_SIZE + 1}")
-                
+        # Confronto locale con il manifest dell'ultimo sync: nessuna chiamata API
+        # se nessun file è cambiato e non ci sono rimozioni
+        branch = 'main'  # TODO: leggere branch da ProjectRepository se disponibile
+        manifest = load_github_manifest(project.id)
+        manifest_valid = (
+            manifest.get('repo') == project.github_repo_name and manifest.get('branch') == branch
+        )
+        known_tree = manifest.get('files', {}) if manifest_valid else None
+        
+        changed_files = []
+        for file_info in valid_files:
+            if known_tree is not None and known_tree.get(file_info['path']) == git_blob_sha(file_info['content']):
+                results['unchanged'] += 1
+            else:
+                changed_files.append(file_info)
+        pending_deletions = [
+            path for path in (deleted_paths or [])
+            if known_tree is None or path in known_tree
+        ]
+        
+        if not changed_files and not pending_deletions:
+            results['success'] = len(valid_files)
+            results['method'] = 'unchanged'
+            logger.info(f"Project {project.id}: {len(valid_files)} files already up to date on GitHub")
+            return results
+        
+        # PRIORITÀ: batch upload (Tree API) - un solo tree/commit per tutte le modifiche
+        try:
+            import time
+            start_time = time.time()
+            
+            batch_files = [
+                {
+                    'path': file_info.get('path'),
+                    'content': file_info.get('content', b''),
+                    'mode': '100644'  # Default: file normale
+                }
+                for file_info in changed_files
+            ]
+            
+            # Genera commit message intelligente
+            commit_message = self._generate_batch_commit_message(changed_files or valid_files)
+            
+            batch_result = self.github_service.upload_files_batch(
+                repo_name=project.github_repo_name,
+                files=batch_files,
+                commit_message=commit_message,
+                branch=branch,
+                deleted_paths=pending_deletions,
+                known_tree=known_tree,
+                known_commit_sha=manifest.get('commit_sha') if manifest_valid else None
+            )
+            
+            if batch_result:
+                save_github_manifest(project.id, {
+                    'repo': project.github_repo_name,
+                    'branch': branch,
+                    'commit_sha': batch_result['commit']['sha'],
+                    'files': batch_result.get('tree_files', {}),
+                    'updated_at': datetime.now(timezone.utc).isoformat()
+                })
                 elapsed = time.time() - start_time
-                
-                if total_success > 0:
-                    results['success'] = total_success
-                    results['failed'] = total_failed
-                    results['method'] = 'batch'
-                    logger.info(
-                        f"Batch upload completed for project {project.id}: "
-                        f"{total_success} files in {elapsed:.2f}s "
-                        f"({len(valid_files) / elapsed:.1f} files/sec)"
-                    )
-                    return results
-                else:
-                    # Batch completamente fallito - fallback a sequenziale
-                    logger.warning(
-                        f"Batch upload failed for project {project.id}, "
-                        f"falling back to sequential method"
-                    )
-            
-            except Exception as e:
-                logger.warning(
-                    f"Batch upload failed for project {project.id}, "
-                    f"falling back to sequential: {e}",
-                    exc_info=True
+                results['success'] = len(valid_files)
+                results['unchanged'] += batch_result.get('unchanged_files', 0)
+                results['deleted'] = batch_result.get('deleted_files', 0)
+                results['method'] = 'batch'
+                logger.info(
+                    f"Batch upload completed for project {project.id}: "
+                    f"{len(changed_files)} changed, {len(pending_deletions)} deleted, "
+                    f"{results['unchanged']} unchanged in {elapsed:.2f}s"
                 )
-                # Continua con fallback sequenziale
+                return results
+            
+            logger.warning(
+                f"Batch upload failed for project {project.id}, "
+                f"falling back to sequential method"
+            )
+        except Exception as e:
+            logger.warning(
+                f"Batch upload failed for project {project.id}, "
+                f"falling back to sequential: {e}",
+                exc_info=True
+            )
+            # Continua con fallback sequenziale
+        
+        # Il fallback sequenziale invalida il manifest: il prossimo sync
+        # riparte dal tree remoto
+        save_github_manifest(project.id, {})
+        valid_files = changed_files
         
         # FALLBACK: Metodo sequenziale esistente (non rimuovere!)
         import time
@@ -0,0 +1,206 @@
+# app/services/github_task_sync_service.py
+"""
+Sync massivo Task -> GitHub Issues in background.
+
+Il job gira in un thread separato (BackgroundJobRunner) e distribuisce i task
+su un pool di worker limitato (GITHUB_TASK_SYNC_WORKERS). Tutti i worker
+attingono a un unico token bucket alimentato dagli header X-RateLimit-* delle
+risposte GitHub: quando la quota scende sotto GITHUB_RATE_LIMIT_RESERVE il job
+attende il reset invece di esaurire il token condiviso con il resto della
+piattaforma.
+
+Il progresso è persistito per task tramite github_synced_at (commit dopo ogni
+task) e lo stato del job in {workspace}/{project_id}/github_task_sync.json:
+un job interrotto riparte saltando i task già sincronizzati.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import current_app
+
+from app.extensions import db
+from app.models import Project, Task
+from app.services.background_jobs import BackgroundJobRunner
+from app.services.github_service import GitHubService
+from app.workspace_utils import load_github_task_sync_state, save_github_task_sync_state
+
+logger = logging.getLogger(__name__)
+
+# Richieste API stimate per task (get_repo + get_issue + edit nel caso peggiore)
+REQUESTS_PER_TASK = 3
+# I task sincronizzati più di recente vengono saltati (come il vecchio endpoint sincrono)
+RECENT_SYNC_WINDOW = timedelta(hours=24)
+
+# Job attivi in questo processo, per progetto
+_jobs = BackgroundJobRunner('github-task-sync', load_github_task_sync_state, save_github_task_sync_state)
+
+
+class RateLimitBucket:
+    """
+    Token bucket condiviso tra i worker.
+
+    I token corrispondono alle richieste ancora disponibili (remaining - reserve)
+    fino al prossimo reset. Dopo ogni chiamata il bucket viene riallineato agli
+    header di GitHub, che restano la fonte autorevole anche quando lo stesso
+    token è usato da altri processi.
+    """
+
+    def __init__(
+        self,
+        reserve: int = 0,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.reserve = reserve
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens: Optional[int] = None  # None = quota sconosciuta
+        self._limit: Optional[int] = None
+        self._reset_at = 0.0
+
+    def update(self, rate_limit: Optional[Dict[str, Any]]):
+        """Riallinea il bucket a remaining/limit/reset letti dagli header."""
+        if not rate_limit or rate_limit.get('remaining') is None:
+            return
+        if rate_limit.get('limit') is not None and rate_limit['limit'] < 0:
+            return
+        with self._lock:
+            self._tokens = max(0, int(rate_limit['remaining']) - self.reserve)
+            self._limit = rate_limit.get('limit')
+            self._reset_at = float(rate_limit.get('reset') or 0)
+
+    def acquire(self, cost: int = 1) -> float:
+        """
+        Preleva cost token, attendendo il reset della quota se necessario.
+
+        Returns:
+            Secondi trascorsi in attesa
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                if self._tokens is None or self._tokens >= cost:
+                    if self._tokens is not None:
+                        self._tokens -= cost
+                    return waited
+                now = self._clock()
+                if now >= self._reset_at:
+                    # Finestra scaduta: la quota è stata ripristinata
+                    if self._limit:
+                        self._tokens = max(0, self._limit - self.reserve)
+                    else:
+                        self._tokens = None
+                    continue
+                delay = self._reset_at - now + 1
+            logger.info(f"GitHub rate limit budget exhausted, waiting {delay:.0f}s for reset")
+            self._sleep(delay)
+            waited += delay
+
+
+class GitHubTaskSyncService:
+    """Avvia, esegue e riporta lo stato dei job di sync task -> GitHub Issues."""
+
+    def __init__(self, github_service: Optional[GitHubService] = None):
+        self.github_service = github_service or GitHubService()
+
+    def is_enabled(self) -> bool:
+        return self.github_service.is_enabled()
+
+    @staticmethod
+    def pending_task_ids(project_id: int, synced_before: datetime) -> List[int]:
+        """Task pubblici e approvati non ancora sincronizzati dopo synced_before."""
+        rows = db.session.query(Task.id).filter(
+            Task.project_id == project_id,
+            (Task.is_private == False) | (Task.is_private.is_(None)),  # NULL = pubblico
+            Task.status.notin_(['suggested']),
+            (Task.github_synced_at.is_(None)) | (Task.github_synced_at < synced_before)
+        ).order_by(Task.id).all()
+        return [row.id for row in rows]
+
+    @staticmethod
+    def get_status(project_id: int) -> Dict[str, Any]:
+        # Uno stato 'interrupted' ripartirà dai task mancanti
+        return _jobs.get_status(project_id)
+
+    def start(self, project: Project, initiated_by: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Avvia il job in background (o restituisce quello già in corso).
+        Un job interrotto viene ripreso con la stessa soglia synced_before.
+        """
+        def prepare():
+            previous = load_github_task_sync_state(project.id)
+            resumed = previous.get('status') in ('running', 'interrupted') and previous.get('synced_before')
+            if resumed:
+                synced_before = datetime.fromisoformat(previous['synced_before'])
+            else:
+                synced_before = datetime.utcnow() - RECENT_SYNC_WINDOW
+
+            task_ids = self.pending_task_ids(project.id, synced_before)
+            state = {
+                'job_id': previous.get('job_id') if resumed else uuid.uuid4().hex,
+                'status': 'running',
+                'initiated_by': initiated_by,
+                'synced_before': synced_before.isoformat(),
+                'started_at': datetime.now(timezone.utc).isoformat(),
+                'finished_at': None,
+                'total': len(task_ids),
+                'synced': 0,
+                'failed': 0,
+                'failed_task_ids': [],
+                'rate_limit_waits': 0,
+                'resumed': bool(resumed),
+            }
+            return state, lambda app: self.run_job(project.id, task_ids, state, app=app)
+
+        return _jobs.start(project.id, prepare)
+
+    def run_job(self, project_id: int, task_ids: List[int], state: Dict[str, Any], app=None) -> Dict[str, Any]:
+        """Esegue il sync dei task indicati con un pool di worker limitato."""
+        app = app or current_app._get_current_object()
+        bucket = RateLimitBucket(reserve=int(app.config.get('GITHUB_RATE_LIMIT_RESERVE', 200)))
+        bucket.update(self.github_service.get_last_rate_limit())
+
+        def _sync_one(task_id: int):
+            waited = bucket.acquire(REQUESTS_PER_TASK)
+            success = False
+            try:
+                task = db.session.get(Task, task_id)
+                project = db.session.get(Project, project_id)
+                if task is not None and project is not None:
+                    success = self.github_service.sync_task_to_github(task, project)
+                    if success:
+                        db.session.commit()  # github_synced_at = progresso persistito
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"GitHub sync failed for task {task_id}: {e}")
+                success = False
+            bucket.update(self.github_service.get_last_rate_limit())
+            return success, waited
+
+        def _record(state: Dict[str, Any], task_id: int, result):
+            success, waited = result
+            if success:
+                state['synced'] += 1
+            else:
+                state['failed'] += 1
+                state['failed_task_ids'].append(task_id)
+            if waited:
+                state['rate_limit_waits'] += 1
+
+        _jobs.run_items(project_id, state, task_ids, _sync_one, _record,
+                        max_workers=app.config.get('GITHUB_TASK_SYNC_WORKERS', 4), app=app)
+        logger.info(
+            f"GitHub task sync completed for project {project_id}: "
+            f"{state['synced']} synced, {state['failed']} failed"
+        )
+        return state
+
+
+def is_job_running(project_id: int) -> bool:
+    return _jobs.is_running(project_id)
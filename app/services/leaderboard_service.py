@@ -0,0 +1,187 @@
+# app/services/leaderboard_service.py
+"""
+Investment Leaderboard Service
+
+Keeps the investments page TOP N precomputed instead of aggregating
+ProjectVote and Investment on every request:
+
+- Project.vote_count and the InvestmentProject counters (total_invested,
+  equity_sold, investors_count) are updated by mapper events with an atomic
+  SQL increment, inside the same transaction that writes the vote or the
+  investment, so they cannot drift from the underlying rows.
+- The TOP N view model is cached under the leaderboard tag; commits that
+  touch votes, investments or listed projects bump the tag generation.
+"""
+
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import event
+
+from ..cache import cache, invalidate_tags, register_tag_invalidation, tagged_key, tagged_timeout
+from ..extensions import db
+from ..models import EquityConfiguration, Investment, InvestmentProject, Project, ProjectVote
+
+
+LEADERBOARD_TAG = 'investments_leaderboard'
+DEFAULT_TOP_N = 10
+
+# Models whose changes can alter the cached leaderboard
+_LEADERBOARD_MODELS = (ProjectVote, Investment, InvestmentProject, Project)
+_listeners_registered = False
+
+
+class InvestmentLeaderboardService:
+    """Service for the maintained investments leaderboard"""
+
+    @staticmethod
+    def top_cache_key(limit):
+        return tagged_key(f"investments:top:{int(limit)}", LEADERBOARD_TAG)
+
+    @staticmethod
+    def get_top_projects(limit=DEFAULT_TOP_N):
+        """
+        Return the TOP N public projects by votes with their investment stats.
+
+        Returns:
+            list: Plain (picklable) dicts with the fields used by
+            investments_page.html
+        """
+        cache_key = InvestmentLeaderboardService.top_cache_key(limit)
+        top_projects = cache.get(cache_key)
+        if top_projects is not None:
+            return top_projects
+
+        top_projects = InvestmentLeaderboardService.build_top_projects(limit)
+        try:
+            cache.set(cache_key, top_projects, timeout=tagged_timeout())
+        except Exception as e:
+            current_app.logger.warning(f"Could not cache investments leaderboard: {e}")
+        return top_projects
+
+    @staticmethod
+    def build_top_projects(limit=DEFAULT_TOP_N):
+        """Build the leaderboard from the counters (two indexed reads)."""
+        projects = db.session.query(
+            Project.id, Project.name, Project.description, Project.vote_count
+        ).filter(Project.private == False)\
+         .order_by(Project.vote_count.desc(), Project.created_at.desc())\
+         .limit(limit).all()
+        if not projects:
+            return []
+
+        listings = {}
+        for listing in InvestmentProject.query.filter(
+            InvestmentProject.project_id.in_([row.id for row in projects])
+        ).order_by(InvestmentProject.id):
+            # Come filter_by(project_id=...).first(): vale il primo listing
+            listings.setdefault(listing.project_id, listing)
+
+        top_projects = []
+        for row in projects:
+            listing = listings.get(row.id)
+            if listing is None:
+                continue
+            equity_sold = listing.equity_sold or 0.0
+            top_projects.append({
+                'project': {'id': row.id, 'name': row.name, 'description': row.description or ''},
+                'total_votes': row.vote_count or 0,
+                'investment_project': {
+                    'id': listing.id,
+                    'available_equity_percentage': listing.available_equity_percentage or 0.0,
+                },
+                'total_invested': listing.total_invested or 0.0,
+                'equity_sold': equity_sold,
+                'equity_remaining': max(0, (listing.available_equity_percentage or 0.0) - equity_sold),
+                'investors_count': listing.investors_count or 0,
+            })
+        return top_projects
+
+    @staticmethod
+    def ensure_investment_project(project):
+        """
+        Return the investment listing of a project, creating it if missing.
+        The caller commits (the listing is created together with the first vote).
+        total_votes is seeded from the ProjectVote rows, pending votes included
+        (project.vote_count is only bumped by SQL when the vote is flushed).
+        """
+        listing = InvestmentProject.query.filter_by(project_id=project.id).first()
+        if listing:
+            return listing
+
+        equity_config = EquityConfiguration.query.filter_by(project_id=project.id).first()
+        now = datetime.now()
+        listing = InvestmentProject(
+            project_id=project.id,
+            publication_month=now.month,
+            publication_year=now.year,
+            total_votes=ProjectVote.query.filter_by(project_id=project.id).count(),
+            available_equity_percentage=equity_config.investors_percentage if equity_config else 10.0,
+            equity_price_per_percent=100.0,  # Default price
+            is_active=True
+        )
+        db.session.add(listing)
+        return listing
+
+    @staticmethod
+    def invalidate():
+        invalidate_tags(LEADERBOARD_TAG)
+
+
+# ============================================
+# Counter maintenance
+# ============================================
+
+def _apply_vote(connection, target, delta):
+    projects = Project.__table__
+    connection.execute(
+        projects.update()
+        .where(projects.c.id == target.project_id)
+        .values(vote_count=projects.c.vote_count + delta)
+    )
+
+
+def _apply_investment(connection, target, sign):
+    listings = InvestmentProject.__table__
+    connection.execute(
+        listings.update()
+        .where(listings.c.id == target.investment_project_id)
+        .values(
+            total_invested=listings.c.total_invested + sign * (target.amount_paid or 0.0),
+            equity_sold=listings.c.equity_sold + sign * (target.equity_percentage or 0.0),
+            investors_count=listings.c.investors_count + sign
+        )
+    )
+
+
+def _vote_inserted(mapper, connection, target):
+    _apply_vote(connection, target, 1)
+
+
+def _vote_deleted(mapper, connection, target):
+    _apply_vote(connection, target, -1)
+
+
+def _investment_inserted(mapper, connection, target):
+    _apply_investment(connection, target, 1)
+
+
+def _investment_deleted(mapper, connection, target):
+    _apply_investment(connection, target, -1)
+
+
+def _leaderboard_tags(session, obj):
+    return (LEADERBOARD_TAG,)
+
+
+def register_leaderboard_listeners():
+    """Keep counters and the cached leaderboard in sync with committed rows."""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(ProjectVote, 'after_insert', _vote_inserted)
+    event.listen(ProjectVote, 'after_delete', _vote_deleted)
+    event.listen(Investment, 'after_insert', _investment_inserted)
+    event.listen(Investment, 'after_delete', _investment_deleted)
+    register_tag_invalidation('leaderboard', _LEADERBOARD_MODELS, _leaderboard_tags)
+    _listeners_registered = True
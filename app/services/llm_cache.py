@@ -0,0 +1,309 @@
+# app/services/llm_cache.py
+"""
+LLM Response Cache
+
+Completion texts are cached under a fingerprint of the request
+(provider, model, messages, temperature, max_tokens and any extra API
+parameter such as ``response_format``), so an identical prompt - the same
+Hub document for an unchanged project, the same contextual help, a
+resubmitted solution - is answered without calling the provider again.
+Message contents are whitespace-normalized before hashing, so prompts that
+differ only in trailing spaces or blank lines share an entry.
+
+Backends (LLM_CACHE_BACKEND):
+- 'sqlite': a file on disk (LLM_CACHE_PATH, default in the instance folder)
+  shared by every worker, bounded to LLM_CACHE_MAX_MB with least-recently-
+  used eviction;
+- 'cache': the application Flask-Caching backend (Redis in production,
+  bounded by the server's maxmemory LRU policy);
+- 'none' (default when not configured): no caching.
+
+Each call site has its own TTL (DEFAULT_CALL_SITE_TTLS, overridable with
+LLM_CACHE_TTLS); a TTL of 0 disables caching for that site. Entries of
+deterministic calls (temperature 0) never expire and only leave the cache
+through eviction. Hits and misses are counted per call site and exposed by
+``/health/perf``.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from flask import current_app, has_app_context
+
+from ..cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MAX_MB = 64
+DEFAULT_TTL = 86400
+DEFAULT_CALL_SITE_TTLS = {
+    'analyze_with_ai': 86400,
+    'project_details': 3600,
+    'suggested_tasks': 3600,
+    'validation_experiment': 3600,
+    'solution_analysis': 30 * 86400,
+    'contextual_help': 7 * 86400,
+    'hub.chat': 0,
+    'hub.document': 86400,
+    'enhanced.structured': 86400,
+    'enhanced.chat': 0,
+    'enhanced.document': 86400,
+}
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def completion_fingerprint(provider, model, messages, temperature, max_tokens, **params) -> str:
+    """Stable hash of a completion request (whitespace-normalized messages)."""
+    payload = {
+        'provider': provider,
+        'model': model,
+        'messages': [
+            {'role': message.get('role'), 'content': _normalize(message.get('content'))}
+            for message in messages
+        ],
+        'temperature': temperature,
+        'max_tokens': max_tokens,
+        'params': params,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def _normalize(content) -> str:
+    lines = [line.rstrip() for line in str(content or '').strip().splitlines()]
+    normalized = []
+    for line in lines:
+        if line or (normalized and normalized[-1]):
+            normalized.append(line)
+    return '\n'.join(normalized)
+
+
+def cached_completion(call_site: str, *, provider, model, messages, temperature, max_tokens,
+                      compute: Callable[[], Optional[str]],
+                      validate: Optional[Callable[[str], bool]] = None, **params) -> Optional[str]:
+    """
+    Return the cached completion text for this request, or call ``compute``
+    (the actual provider call) and store its result.
+
+    Empty results, results rejected by ``validate`` (e.g. malformed JSON) and
+    provider errors are never cached; a failing cache backend only costs the
+    cache, never the call.
+    """
+    ttl = call_site_ttl(call_site)
+    store = get_llm_cache() if ttl != 0 else None
+    if store is None:
+        return compute()
+
+    key = completion_fingerprint(provider, model, messages, temperature, max_tokens, **params)
+    try:
+        value = store.get(key)
+    except Exception as e:
+        logger.warning(f"LLM cache read failed ({call_site}): {e}")
+        _count(call_site, 'errors')
+        value = None
+    if value is not None:
+        _count(call_site, 'hits')
+        return value
+
+    _count(call_site, 'misses')
+    value = compute()
+    if value and value.strip() and (validate is None or validate(value)):
+        try:
+            # Le chiamate deterministiche restano valide finché non vengono espulse
+            store.set(key, call_site, value, None if temperature == 0 else ttl)
+        except Exception as e:
+            logger.warning(f"LLM cache write failed ({call_site}): {e}")
+            _count(call_site, 'errors')
+    return value
+
+
+def is_json(value: str) -> bool:
+    """Validator for JSON-mode call sites."""
+    try:
+        json.loads(value)
+        return True
+    except ValueError:
+        return False
+
+
+def call_site_ttl(call_site: str) -> int:
+    """TTL in seconds for a call site (0 = not cached)."""
+    if not has_app_context():
+        return 0
+    overrides = current_app.config.get('LLM_CACHE_TTLS') or {}
+    if isinstance(overrides, str):
+        overrides = parse_call_site_ttls(overrides)
+    if call_site in overrides:
+        return int(overrides[call_site])
+    return DEFAULT_CALL_SITE_TTLS.get(call_site, current_app.config.get('LLM_CACHE_DEFAULT_TTL', DEFAULT_TTL))
+
+
+def parse_call_site_ttls(value):
+    """Parse ``"call_site=seconds,call_site=seconds"`` (as read from the environment) into a dict."""
+    ttls = {}
+    for item in (value or '').split(','):
+        call_site, _, seconds = item.partition('=')
+        if call_site.strip() and seconds.strip().isdigit():
+            ttls[call_site.strip()] = int(seconds)
+    return ttls
+
+
+def get_llm_cache():
+    """The LLM cache store of the current app (None when disabled or outside an app)."""
+    if not has_app_context():
+        return None
+    app = current_app._get_current_object()
+    if 'llm_cache' not in app.extensions:
+        app.extensions['llm_cache'] = _create_store(app)
+    return app.extensions['llm_cache']
+
+
+def _create_store(app):
+    backend = (app.config.get('LLM_CACHE_BACKEND') or 'none').lower()
+    if backend == 'sqlite':
+        path = app.config.get('LLM_CACHE_PATH') or os.path.join(app.instance_path, 'llm_cache.sqlite3')
+        max_bytes = int(app.config.get('LLM_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024
+        try:
+            return SQLiteLLMStore(path, max_bytes)
+        except (OSError, sqlite3.Error) as e:
+            app.logger.warning(f"LLM cache disabled: cannot open {path}: {e}")
+            return None
+    if backend == 'cache':
+        return FlaskCacheLLMStore()
+    return None
+
+
+# ============================================
+# Stores
+# ============================================
+
+class SQLiteLLMStore:
+    """Size-bounded LRU store in a SQLite file (safe across threads and worker processes)."""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    call_site TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used ON llm_cache (last_used)')
+
+    @contextmanager
+    def _connection(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute('SELECT value, expires_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                return None
+            conn.execute('UPDATE llm_cache SET last_used = ? WHERE key = ?', (now, key))
+            return value
+
+    def set(self, key: str, call_site: str, value: str, ttl: Optional[int]):
+        now = time.time()
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, call_site, value, size, expires_at, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, call_site, value, size, now + ttl if ttl else None, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM llm_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        conn.execute('DELETE FROM llm_cache WHERE expires_at IS NOT NULL AND expires_at <= ?', (now,))
+        kept = 0
+        evicted = []
+        for key, size in conn.execute('SELECT key, size FROM llm_cache ORDER BY last_used DESC'):
+            kept += size
+            if kept > self.max_bytes:
+                evicted.append((key,))
+        conn.executemany('DELETE FROM llm_cache WHERE key = ?', evicted)
+
+    def size(self) -> dict:
+        with self._connection() as conn:
+            entries, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache').fetchone()
+        return {'backend': 'sqlite', 'entries': entries, 'bytes': total, 'max_bytes': self.max_bytes}
+
+
+class FlaskCacheLLMStore:
+    """Store on the application cache (eviction delegated to the backend, e.g. Redis allkeys-lru)."""
+
+    @staticmethod
+    def _key(key):
+        return f"llm:{key}"
+
+    def get(self, key: str) -> Optional[str]:
+        return cache.get(self._key(key))
+
+    def set(self, key: str, call_site: str, value: str, ttl: Optional[int]):
+        cache.set(self._key(key), value, timeout=ttl or 0)
+
+    def size(self) -> dict:
+        return {'backend': 'cache'}
+
+
+# ============================================
+# Stats
+# ============================================
+
+def _count(call_site, counter):
+    with _stats_lock:
+        stats = _stats.setdefault(call_site, {'hits': 0, 'misses': 0, 'errors': 0})
+        stats[counter] += 1
+
+
+def get_llm_cache_stats() -> dict:
+    """Per-call-site hit/miss counters of this process, with the store size when available."""
+    with _stats_lock:
+        call_sites = {call_site: dict(stats) for call_site, stats in _stats.items()}
+    for stats in call_sites.values():
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else None
+    store = get_llm_cache()
+    try:
+        storage = store.size() if store is not None else {'backend': 'none'}
+    except Exception as e:
+        storage = {'error': str(e)}
+    return {'storage': storage, 'call_sites': call_sites}
+
+
+def reset_llm_cache_stats():
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,155 @@
+# app/services/notification_counter.py
+"""
+Notification Counter Service
+
+Keeps the per-user unread-notification count in the cache, so the navbar
+badge (and the SSE stream that pushes it) never runs a COUNT over the
+notification table on the hot path.
+
+The counter is computed once on a miss and then adjusted in place:
+
+- ORM changes (new unread notification, is_read flipped, deletion) are
+  collected after each flush;
+- bulk writes (fan-out inserts, mark-all-read) record their delta
+  explicitly with record_unread_delta / record_unread_reset.
+
+Deltas are applied only after the transaction commits and dropped on
+rollback. A counter that is not cached is left alone (the next read
+recomputes it), and every entry has a TTL so any drift heals itself.
+
+The counter is only authoritative with a cache shared by every worker
+(CACHE_TYPE=RedisCache): with a per-process SimpleCache each gunicorn worker
+keeps its own copy, adjusted only by the commits that worker served. The SSE
+badge stream therefore reads the counter only when the backend is shared and
+otherwise falls back to a COUNT per poll (see ``is_shared``).
+"""
+
+from flask import current_app
+from sqlalchemy import inspect
+
+from ..cache import cache, register_transaction_hook
+from ..extensions import db
+from ..models import Notification
+
+
+DEFAULT_COUNTER_TIMEOUT = 600
+_RESET = 'reset'
+_DELTAS_INFO_KEY = 'unread_count_deltas'
+# Backend con una copia per processo: il contatore non è condiviso tra i worker
+_PER_PROCESS_BACKENDS = {'SimpleCache', 'NullCache'}
+
+
+def unread_count_key(user_id):
+    return f"notifications:unread:{int(user_id)}"
+
+
+class NotificationCounterService:
+    """Service for the cached unread-notification counters"""
+
+    @staticmethod
+    def get_unread_count(user_id):
+        """Return the unread count of a user (COUNT query only on a cache miss)."""
+        key = unread_count_key(user_id)
+        count = cache.get(key)
+        if count is not None:
+            return max(0, int(count))
+
+        count = NotificationCounterService.count_unread(user_id)
+        try:
+            cache.set(key, count, timeout=_counter_timeout())
+        except Exception as e:
+            current_app.logger.warning(f"Could not cache unread count for user {user_id}: {e}")
+        return count
+
+    @staticmethod
+    def peek_unread_count(user_id):
+        """Return the cached unread count without touching the database (None on a miss)."""
+        count = cache.get(unread_count_key(user_id))
+        return max(0, int(count)) if count is not None else None
+
+    @staticmethod
+    def count_unread(user_id):
+        """Return the unread count straight from the database."""
+        return Notification.query.filter_by(user_id=user_id, is_read=False).count()
+
+    @staticmethod
+    def is_shared():
+        """True when the cache backend is shared by every worker process (e.g. Redis)."""
+        return type(cache.cache).__name__ not in _PER_PROCESS_BACKENDS
+
+    @staticmethod
+    def apply_delta(user_id, delta):
+        """Adjust a cached counter in place; a missing counter is left to be recomputed."""
+        key = unread_count_key(user_id)
+        backend = cache.cache
+        try:
+            if delta == _RESET:
+                backend.set(key, 0, timeout=_counter_timeout())
+            elif delta and backend.get(key) is not None:
+                # INCR/DECR atomico su Redis; su SimpleCache get+set nello stesso processo
+                if delta > 0:
+                    updated = backend.inc(key, delta)
+                else:
+                    updated = backend.dec(key, -delta)
+                if updated is None:
+                    backend.delete(key)
+        except Exception as e:
+            # Un contatore non aggiornabile viene ricalcolato alla prossima lettura
+            current_app.logger.warning(f"Could not update unread count for user {user_id}: {e}")
+            cache.delete(key)
+
+
+def _counter_timeout():
+    return current_app.config.get('NOTIFICATION_UNREAD_CACHE_TIMEOUT', DEFAULT_COUNTER_TIMEOUT)
+
+
+# ============================================
+# Transactional deltas
+# ============================================
+
+def _pending_deltas(session):
+    return session.info.setdefault(_DELTAS_INFO_KEY, {})
+
+
+def record_unread_delta(user_ids, delta, session=None):
+    """Record a counter change for users written with bulk statements (applied on commit)."""
+    deltas = _pending_deltas(session or db.session)
+    for user_id in user_ids:
+        if deltas.get(user_id) != _RESET:
+            deltas[user_id] = deltas.get(user_id, 0) + delta
+
+
+def record_unread_reset(user_id, session=None):
+    """Record that every notification of the user has been marked as read (applied on commit)."""
+    _pending_deltas(session or db.session)[user_id] = _RESET
+
+
+def _unread_delta(session, obj):
+    if obj in session.new:
+        return 1 if not obj.is_read else 0
+    if obj in session.deleted:
+        return -1 if not obj.is_read else 0
+    history = inspect(obj).attrs.is_read.history
+    if not history.has_changes():
+        return 0
+    was_read = bool(history.deleted[0]) if history.deleted else False
+    if was_read == bool(obj.is_read):
+        return 0
+    return -1 if obj.is_read else 1
+
+
+def _collect_unread_changes(session, obj, deltas):
+    delta = _unread_delta(session, obj)
+    if delta and obj.user_id is not None and deltas.get(obj.user_id) != _RESET:
+        deltas[obj.user_id] = deltas.get(obj.user_id, 0) + delta
+
+
+def _apply_committed_deltas(deltas):
+    for user_id, delta in deltas.items():
+        NotificationCounterService.apply_delta(user_id, delta)
+
+
+def register_notification_counter_listeners():
+    """Keep the cached unread counters in step with committed notification changes."""
+    register_transaction_hook(_DELTAS_INFO_KEY, _apply_committed_deltas,
+                              models=Notification, collect=_collect_unread_changes)
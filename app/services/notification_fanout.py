@@ -0,0 +1,191 @@
+# app/services/notification_fanout.py
+"""
+Fan-out delle notifiche ai membri di un progetto.
+
+Un evento di progetto produce una sola INSERT multi-riga per tutti i
+destinatari (``insert().values([...])``) invece di un oggetto ORM per
+collaboratore. Per i tipi "rumorosi" (DIGEST_TYPES: salvataggi wiki ripetuti,
+sync workspace, ...) le notifiche non lette dello stesso tipo, utente e
+progetto entro NOTIFICATION_DIGEST_WINDOW_SECONDS vengono unite in un'unica
+riga digest (event_count incrementato, messaggio e timestamp aggiornati).
+
+Backend (NOTIFICATION_FANOUT_BACKEND):
+- 'inline' (default): le righe vengono scritte nella transazione del
+  chiamante e confermate dal suo commit.
+- 'thread': l'evento viene accodato al commit della sessione del chiamante
+  (scartato in caso di rollback) ed eseguito da un worker in background.
+"""
+
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import insert, select, union, update
+
+from app.cache import register_transaction_hook
+from app.extensions import db
+from app.models import Collaborator, Notification, Project
+from app.services.notification_counter import record_unread_delta
+
+logger = logging.getLogger(__name__)
+
+# Tipi i cui eventi ripetuti vengono uniti in una notifica digest
+DIGEST_TYPES = frozenset({
+    'task_updated',
+    'wiki_page_updated',
+    'milestone_updated',
+    'comment_added',
+    'workspace_upload_ready',
+    'workspace_sync_completed',
+    'workspace_sync_failed',
+})
+DEFAULT_DIGEST_WINDOW_SECONDS = 900
+
+_events: 'queue.Queue' = queue.Queue()
+_worker: Optional[threading.Thread] = None
+_worker_guard = threading.Lock()
+# Eventi in attesa del commit della sessione che li ha generati
+_EVENTS_INFO_KEY = 'pending_notification_fanout'
+
+
+def project_recipient_ids(project_id: int, exclude_user_id: Optional[int] = None) -> list:
+    """ID dei collaboratori del progetto più il creatore (una sola query)."""
+    recipients = db.session.execute(union(
+        select(Collaborator.user_id).where(Collaborator.project_id == project_id),
+        select(Project.creator_id).where(Project.id == project_id),
+    )).scalars().all()
+    return sorted(user_id for user_id in set(recipients) if user_id != exclude_user_id)
+
+
+def fan_out(project_id: int, notification_type: str, message: str,
+            exclude_user_id: Optional[int] = None, recipients: Optional[Iterable[int]] = None) -> int:
+    """
+    Scrive la notifica per tutti i destinatari nella sessione corrente (senza commit).
+
+    Returns:
+        int: Numero di destinatari notificati (nuove righe + digest aggiornati)
+    """
+    if recipients is None:
+        recipients = project_recipient_ids(project_id, exclude_user_id)
+    recipients = [user_id for user_id in recipients if user_id != exclude_user_id]
+    if not recipients:
+        return 0
+
+    now = datetime.now(timezone.utc)
+    digested = set()
+    window = _digest_window_seconds()
+    if notification_type in DIGEST_TYPES and window > 0:
+        pending_digest = (
+            (Notification.project_id == project_id)
+            & (Notification.type == notification_type)
+            & (Notification.is_read == False)
+            & (Notification.timestamp >= now - timedelta(seconds=window))
+            & (Notification.user_id.in_(recipients))
+        )
+        digested = set(db.session.execute(
+            select(Notification.user_id).where(pending_digest)
+        ).scalars())
+        if digested:
+            db.session.execute(
+                update(Notification).where(pending_digest).values(
+                    event_count=Notification.event_count + 1,
+                    message=message,
+                    timestamp=now,
+                ).execution_options(synchronize_session=False)
+            )
+
+    new_rows = [
+        {
+            'user_id': user_id,
+            'project_id': project_id,
+            'type': notification_type,
+            'message': message,
+            'is_read': False,
+            'event_count': 1,
+            'timestamp': now,
+        }
+        for user_id in recipients if user_id not in digested
+    ]
+    if new_rows:
+        db.session.execute(insert(Notification).values(new_rows))
+        # Le INSERT bulk non passano dal flush: delta dei contatori registrato qui
+        record_unread_delta([row['user_id'] for row in new_rows], 1)
+    return len(recipients)
+
+
+def _digest_window_seconds() -> int:
+    if not has_app_context():
+        return DEFAULT_DIGEST_WINDOW_SECONDS
+    return int(current_app.config.get('NOTIFICATION_DIGEST_WINDOW_SECONDS', DEFAULT_DIGEST_WINDOW_SECONDS))
+
+
+def fanout_backend() -> str:
+    return (current_app.config.get('NOTIFICATION_FANOUT_BACKEND') or 'inline').lower()
+
+
+def defer_fan_out(project_id: int, notification_type: str, message: str,
+                  exclude_user_id: Optional[int] = None):
+    """Accoda il fan-out al commit della sessione corrente (scartato al rollback)."""
+    # Garantisce una transazione aperta, così after_commit/after_rollback scattano sempre
+    db.session.connection()
+    db.session.info.setdefault(_EVENTS_INFO_KEY, []).append(
+        (project_id, notification_type, message, exclude_user_id)
+    )
+
+
+# ============================================
+# Background worker
+# ============================================
+
+def _enqueue_committed_events(events):
+    app = current_app._get_current_object()
+    for item in events:
+        _events.put((app, item))
+    _ensure_worker()
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_guard:
+        if _worker is not None and _worker.is_alive():
+            return
+        _worker = threading.Thread(target=_work, name='notification-fanout', daemon=True)
+        _worker.start()
+
+
+def _work():
+    while True:
+        app, (project_id, notification_type, message, exclude_user_id) = _events.get()
+        try:
+            with app.app_context():
+                try:
+                    fan_out(project_id, notification_type, message, exclude_user_id)
+                    db.session.commit()
+                except Exception as exc:
+                    db.session.rollback()
+                    logger.error("Notification fan-out failed (project=%s, type=%s): %s",
+                                 project_id, notification_type, exc, exc_info=True)
+        finally:
+            _events.task_done()
+
+
+def wait_for_pending(timeout: Optional[float] = None) -> bool:
+    """Attende lo svuotamento della coda (test e shutdown). Restituisce False al timeout."""
+    if timeout is None:
+        _events.join()
+        return True
+    deadline = time.monotonic() + timeout
+    while _events.unfinished_tasks:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def register_notification_listeners():
+    """Avvia il fan-out differito solo dopo il commit della transazione che l'ha generato."""
+    register_transaction_hook(_EVENTS_INFO_KEY, _enqueue_committed_events)
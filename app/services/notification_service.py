@@ -6,9 +6,11 @@ Fornisce funzioni helper per creare notifiche in modo consistente.
 """
 
 from datetime import datetime, timezone
-from typing import List, Optional
-from ..models import Notification, Project, Task, Solution, Collaborator, User
+from typing import Optional
+from ..models import Notification, Project, Task, Solution, User
 from ..extensions import db
+from .notification_counter import NotificationCounterService, record_unread_reset
+from .notification_fanout import defer_fan_out, fan_out, fanout_backend
 
 
 class NotificationService:
@@ -38,6 +40,9 @@ class NotificationService:
         'workspace_upload_ready': 'Workspace Upload Pronto',
         'workspace_sync_completed': 'Workspace Sync Completato',
         'workspace_sync_failed': 'Workspace Sync Fallito',
+        'milestone_created': 'Milestone Creata',
+        'milestone_updated': 'Milestone Aggiornata',
+        'milestone_completed': 'Milestone Completata',
     }
     
     @staticmethod
@@ -83,10 +88,15 @@ class NotificationService:
         notification_type: str,
         message: str,
         exclude_user_id: Optional[int] = None
-    ) -> List[Notification]:
+    ) -> int:
         """
         Notifica tutti i collaboratori di un progetto (incluso il creatore).
         
+        Le righe vengono scritte con una sola INSERT multi-riga; gli eventi
+        ripetuti dei tipi in DIGEST_TYPES vengono uniti in una notifica digest.
+        Con NOTIFICATION_FANOUT_BACKEND='thread' il fan-out viene eseguito in
+        background dopo il commit del chiamante.
+        
         Args:
             project_id: ID del progetto
             notification_type: Tipo di notifica
@@ -94,35 +104,16 @@ class NotificationService:
             exclude_user_id: ID utente da escludere (es. chi ha generato l'evento)
         
         Returns:
-            List[Notification]: Lista delle notifiche create
+            int: Numero di destinatari notificati (0 se il fan-out è differito)
         """
-        project = Project.query.get_or_404(project_id)
-        
-        # Raccogli tutti gli ID dei collaboratori
-        # Optimize: Use database query to get only user_ids instead of loading full objects
-        collaborator_ids = db.session.query(Collaborator.user_id).filter_by(
-            project_id=project_id
-        ).all()
-        collaborator_ids = [user_id for (user_id,) in collaborator_ids]
-        
-        # Aggiungi il creatore se non è già nella lista
-        if project.creator_id not in collaborator_ids:
-            collaborator_ids.append(project.creator_id)
+        if notification_type not in NotificationService.TYPES:
+            raise ValueError(f"Tipo notifica non valido: {notification_type}")
         
-        notifications = []
-        for user_id in set(collaborator_ids):
-            if exclude_user_id and user_id == exclude_user_id:
-                continue
-            
-            notification = NotificationService.create_notification(
-                user_id=user_id,
-                notification_type=notification_type,
-                message=message,
-                project_id=project_id
-            )
-            notifications.append(notification)
+        if fanout_backend() == 'thread':
+            defer_fan_out(project_id, notification_type, message, exclude_user_id)
+            return 0
         
-        return notifications
+        return fan_out(project_id, notification_type, message, exclude_user_id)
     
     @staticmethod
     def notify_task_created(task: Task, project: Project, creator_id: int):
@@ -252,11 +243,8 @@ class NotificationService:
     
     @staticmethod
     def get_unread_count(user_id: int) -> int:
-        """Ottiene il numero di notifiche non lette per un utente"""
-        return Notification.query.filter_by(
-            user_id=user_id,
-            is_read=False
-        ).count()
+        """Ottiene il numero di notifiche non lette per un utente (contatore in cache)"""
+        return NotificationCounterService.get_unread_count(user_id)
     
     @staticmethod
     def mark_as_read(notification_id: int, user_id: int) -> bool:
@@ -279,6 +267,7 @@ class NotificationService:
             user_id=user_id,
             is_read=False
         ).update({'is_read': True})
+        record_unread_reset(user_id)
         
         db.session.commit()
         return count
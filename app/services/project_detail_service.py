@@ -0,0 +1,260 @@
+# app/services/project_detail_service.py
+"""
+Project Detail Snapshot Service
+
+Builds the viewer-independent part of the project detail page once and
+keeps it in the cache, tagged with the project generation (see app.cache).
+Any committed change to rows of the project (workspace sessions and history
+included) bumps the generation, so the snapshot can live for
+CACHE_TAGGED_TIMEOUT instead of being rebuilt per hit.
+
+Only the per-viewer bits (creator, collaborator, endorsement, monthly vote)
+are computed per request, in a single query.
+"""
+
+from datetime import date, datetime
+
+from flask import current_app
+from sqlalchemy import exists, func, select
+
+from ..cache import cache, project_tag, tagged_key, tagged_timeout
+from ..extensions import db
+from ..models import Collaborator, Endorsement, Milestone, ProjectVote, Task, User
+from ..workspace_utils import list_session_metadata, load_history_entries
+from .reporting_service import ReportingService
+
+
+ACTIVE_TASK_STATUSES = ('open', 'in_progress', 'submitted', 'suggested')
+COMPLETED_TASK_STATUSES = ('approved', 'closed')
+
+# Stuck 'syncing' sessions are only recovered when list_session_metadata runs,
+# so snapshots that contain them are kept for a short time.
+IN_FLIGHT_SESSION_STATUSES = ('syncing',)
+IN_FLIGHT_SNAPSHOT_TIMEOUT = 60
+
+
+def _empty_transparency_data(project):
+    try:
+        uses_shares = project.uses_shares_system() if hasattr(project, 'uses_shares_system') else False
+    except Exception:
+        uses_shares = False
+    return {
+        'uses_shares_system': uses_shares,
+        'shares': {'total': 0, 'distributed': 0, 'available': 0, 'holders_count': 0, 'holders': []},
+        'revenue': {'total': 0, 'currency': 'EUR', 'records_count': 0, 'history': []},
+        'distributions': {'total': 0, 'count': 0, 'history': []},
+        'growth': {'new_holders_this_month': 0}
+    }
+
+
+class ProjectDetailService:
+    """Service for the cached, denormalized project detail view model"""
+
+    @staticmethod
+    def snapshot_cache_key(project_id):
+        return tagged_key(f"project_detail:{int(project_id)}", project_tag(project_id))
+
+    @staticmethod
+    def get_snapshot(project):
+        """
+        Return the cached detail snapshot for a project, building it on a miss.
+
+        Args:
+            project: Project instance
+
+        Returns:
+            dict: Plain (picklable) data shared by every viewer of the page
+        """
+        cache_key = ProjectDetailService.snapshot_cache_key(project.id)
+        snapshot = cache.get(cache_key)
+        if snapshot is not None:
+            return snapshot
+
+        snapshot = ProjectDetailService.build_snapshot(project)
+        timeout = tagged_timeout()
+        if any(s['status'] in IN_FLIGHT_SESSION_STATUSES for s in snapshot['workspace_sessions']):
+            timeout = min(timeout, IN_FLIGHT_SNAPSHOT_TIMEOUT)
+        try:
+            cache.set(cache_key, snapshot, timeout=timeout)
+        except Exception as e:
+            current_app.logger.warning(f"Could not cache project detail snapshot {project.id}: {e}")
+        return snapshot
+
+    @staticmethod
+    def build_snapshot(project):
+        """Assemble the viewer-independent detail data for a project."""
+        distributed_equity = db.session.query(
+            func.coalesce(func.sum(Collaborator.equity_share), 0)
+        ).filter(Collaborator.project_id == project.id).scalar()
+
+        try:
+            transparency_data = ReportingService().get_transparency_data(project, anonymize_holders=False)
+        except Exception as e:
+            current_app.logger.error(f"Error loading transparency data: {e}", exc_info=True)
+            transparency_data = _empty_transparency_data(project)
+
+        tasks = (
+            db.session.query(
+                Task.id, Task.title, Task.status, Task.phase, Task.equity_reward,
+                Task.task_type, Task.difficulty, Task.is_private, User.username
+            )
+            .outerjoin(User, User.id == Task.creator_id)
+            .filter(
+                Task.project_id == project.id,
+                Task.status.in_(ACTIVE_TASK_STATUSES + COMPLETED_TASK_STATUSES)
+            )
+            .order_by(Task.id)
+            .all()
+        )
+
+        collaborators = (
+            db.session.query(Collaborator.user_id, Collaborator.equity_share, Collaborator.role, User.username)
+            .join(User, User.id == Collaborator.user_id)
+            .filter(Collaborator.project_id == project.id)
+            .order_by(Collaborator.equity_share.desc())
+            .all()
+        )
+
+        milestones = Milestone.query.filter_by(project_id=project.id).order_by(
+            Milestone.display_order,
+            Milestone.created_at
+        ).all()
+
+        workspace_repo = None
+        if project.repository:
+            workspace_repo = {
+                'provider': project.repository.provider,
+                'repo_name': project.repository.repo_name,
+                'branch': project.repository.branch,
+                'status': project.repository.status,
+                'last_sync_at': project.repository.last_sync_at
+            }
+
+        workspace_history = load_history_entries(project.id, limit=5)
+        for history_item in workspace_history:
+            files = history_item.get('files') or []
+            if not history_item.get('file_count'):
+                history_item['file_count'] = len(files)
+
+        workspace_sessions = []
+        for session_meta in list_session_metadata(project.id, limit=5):
+            workspace_sessions.append({
+                'session_id': session_meta.get('session_id'),
+                'status': session_meta.get('status', 'pending'),
+                'type': session_meta.get('type', 'manual'),
+                'file_count': session_meta.get('file_count') or len(session_meta.get('files') or []),
+                'total_size': session_meta.get('total_size'),
+                'created_at': session_meta.get('created_at'),
+                'updated_at': session_meta.get('updated_at'),
+                'finalized_at': session_meta.get('finalized_at')
+            })
+
+        return {
+            'distributed_equity': distributed_equity,
+            'transparency_data': transparency_data,
+            'tasks': [
+                {
+                    'id': t.id,
+                    'title': t.title,
+                    'status': t.status,
+                    'phase': t.phase,
+                    'equity_reward': t.equity_reward,
+                    'task_type': t.task_type,
+                    'difficulty': t.difficulty,
+                    'is_private': bool(t.is_private),
+                    'creator': {'username': t.username} if t.username else None,
+                }
+                for t in tasks
+            ],
+            'collaborators': [
+                {
+                    'user_id': c.user_id,
+                    'username': c.username,
+                    'equity_share': c.equity_share,
+                    'role': c.role,
+                }
+                for c in collaborators
+            ],
+            'milestones': [
+                {
+                    'id': m.id,
+                    'title': m.title,
+                    'description': m.description,
+                    'target_date': m.target_date,
+                    'completed': m.completed,
+                }
+                for m in milestones
+            ],
+            'workspace_repo': workspace_repo,
+            'workspace_history': workspace_history,
+            'workspace_sessions': workspace_sessions,
+        }
+
+    @staticmethod
+    def get_viewer_state(project, user):
+        """
+        Per-viewer overlay for the detail page, resolved in a single query.
+
+        Returns:
+            dict: is_creator, is_collaborator, has_endorsed, has_voted_this_month
+        """
+        state = {
+            'is_creator': False,
+            'is_collaborator': False,
+            'has_endorsed': False,
+            'has_voted_this_month': False,
+        }
+        if not user.is_authenticated:
+            return state
+
+        current_date = datetime.now()
+        current_month = int(f"{current_date.year}{current_date.month:02d}")
+
+        is_collaborator, has_endorsed, has_voted = db.session.execute(select(
+            exists().where(Collaborator.project_id == project.id, Collaborator.user_id == user.id),
+            exists().where(Endorsement.project_id == project.id, Endorsement.user_id == user.id),
+            exists().where(
+                ProjectVote.project_id == project.id,
+                ProjectVote.user_id == user.id,
+                ProjectVote.vote_month == current_month,
+                ProjectVote.vote_year == current_date.year
+            ),
+        )).one()
+
+        state.update(
+            is_creator=user.id == project.creator_id,
+            is_collaborator=bool(is_collaborator),
+            has_endorsed=bool(has_endorsed),
+            has_voted_this_month=bool(has_voted),
+        )
+        return state
+
+    @staticmethod
+    def visible_tasks(snapshot, can_see_private):
+        """Split snapshot tasks into (active, completed) lists visible to the viewer."""
+        active, completed = [], []
+        for task in snapshot['tasks']:
+            if task['is_private'] and not can_see_private:
+                continue
+            if task['status'] in ACTIVE_TASK_STATUSES:
+                active.append(task)
+            else:
+                completed.append(task)
+        return active, completed
+
+    @staticmethod
+    def milestones_for_today(snapshot):
+        """Milestones with the date-dependent fields (is_overdue, days_until_target) filled in."""
+        today = date.today()
+        milestones = []
+        for milestone in snapshot['milestones']:
+            item = dict(milestone)
+            target = item['target_date']
+            if target and not item['completed']:
+                item['is_overdue'] = today > target
+                item['days_until_target'] = (target - today).days
+            else:
+                item['is_overdue'] = False
+                item['days_until_target'] = None
+            milestones.append(item)
+        return milestones
@@ -0,0 +1,235 @@
+# app/services/project_listing_service.py
+"""
+Project Listing Service
+
+Keyset (cursor) pagination for the project listing and the activity feed:
+pages are addressed by the ``(created_at, id)`` / ``(timestamp, id)`` of the
+last row shown, so every page is an index seek plus LIMIT and a deep page
+costs the same as the first one (no OFFSET scan, no COUNT query). Rows with
+a NULL sort value come last on every backend and are paged by id alone.
+
+The first page seen by anonymous visitors (per category / project type
+filter) and the first page of the activity feed are shared by everyone, so
+their ordered row IDs are cached under a tag; commits that create, delete or
+change a project (or add an activity) bump the tag generation.
+"""
+
+import base64
+import binascii
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+
+from ..cache import cache, invalidate_tags, register_tag_invalidation, tagged_key, tagged_timeout
+from ..extensions import db
+from ..models import Activity, Collaborator, Project, ProjectVote
+
+
+PROJECTS_LISTING_TAG = 'projects_listing'
+ACTIVITY_FEED_TAG = 'activity_feed'
+PROJECTS_PER_PAGE = 12
+ACTIVITIES_PER_PAGE = 50
+
+
+# ============================================
+# Cursors
+# ============================================
+
+def encode_cursor(sort_value, row_id):
+    """Encode the keyset position ``(sort_value, id)`` as an opaque URL token (NULL -> empty)."""
+    raw = f"{sort_value.isoformat() if sort_value is not None else ''}|{int(row_id)}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Returns:
+        tuple | None: ``(datetime | None, id)``, or None for a missing/invalid
+        token (callers fall back to the first page)
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        sort_value, row_id = raw.rsplit('|', 1)
+        return (datetime.fromisoformat(sort_value) if sort_value else None), int(row_id)
+    except (ValueError, UnicodeError, binascii.Error):
+        return None
+
+
+def keyset_page(query, sort_column, id_column, cursor, per_page):
+    """
+    Return one page of ``query`` ordered by ``(sort_column, id_column)`` desc.
+
+    Args:
+        cursor: Decoded cursor (see decode_cursor) of the last row of the
+            previous page, or None for the first page
+
+    Returns:
+        tuple: ``(rows, next_cursor)``; next_cursor is None on the last page
+    """
+    if cursor is not None:
+        sort_value, row_id = cursor
+        if sort_value is None:
+            # Già tra le righe senza valore (in coda): si prosegue solo per id
+            query = query.filter(sort_column.is_(None), id_column < row_id)
+        else:
+            query = query.filter(or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, id_column < row_id),
+                sort_column.is_(None)
+            ))
+    # NULLS LAST esplicito: PostgreSQL li metterebbe in testa con DESC, SQLite/MySQL in coda.
+    # Una riga in più per sapere se esiste la pagina successiva (niente COUNT)
+    rows = query.order_by(sort_column.desc().nulls_last(), id_column.desc()).limit(per_page + 1).all()
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+
+def _load_ordered(model, ids, *options):
+    """Load rows by primary key preserving the order of ``ids``."""
+    if not ids:
+        return []
+    rows = {row.id: row for row in model.query.options(*options).filter(model.id.in_(ids))}
+    return [rows[row_id] for row_id in ids if row_id in rows]
+
+
+class ProjectListingService:
+    """Service for the keyset-paginated project listing and activity feed"""
+
+    # ============================================
+    # Projects
+    # ============================================
+
+    @staticmethod
+    def visible_projects_query(user=None, category=None, project_type=None):
+        """Projects visible to ``user`` (public ones for anonymous visitors)."""
+        query = Project.query
+        if user is not None and user.is_authenticated:
+            # I progetti privati visibili sono pochi: un'unica lettura degli ID
+            # invece di una subquery su Collaborator valutata per ogni riga
+            private_ids = {
+                project_id for (project_id,) in db.session.query(Project.id).filter(
+                    Project.private == True, Project.creator_id == user.id
+                ).union(
+                    db.session.query(Collaborator.project_id).join(
+                        Project, Project.id == Collaborator.project_id
+                    ).filter(Project.private == True, Collaborator.user_id == user.id)
+                )
+            }
+            if private_ids:
+                query = query.filter(or_(Project.private == False, Project.id.in_(private_ids)))
+            else:
+                query = query.filter(Project.private == False)
+        else:
+            query = query.filter(Project.private == False)
+
+        if category:
+            query = query.filter(Project.category == category)
+        if project_type:
+            query = query.filter(Project.project_type == project_type)
+        return query
+
+    @staticmethod
+    def get_projects_page(user=None, category=None, project_type=None, cursor=None,
+                          per_page=PROJECTS_PER_PAGE):
+        """
+        Return a page of the project listing.
+
+        Args:
+            cursor: Opaque cursor from a previous page (None for the first page)
+
+        Returns:
+            tuple: ``(projects, next_cursor)`` with the creators eager loaded
+        """
+        position = decode_cursor(cursor)
+        anonymous = user is None or not user.is_authenticated
+
+        if anonymous and position is None:
+            cache_key = tagged_key(
+                f"projects:list:{category or ''}:{project_type or ''}:{int(per_page)}",
+                PROJECTS_LISTING_TAG
+            )
+            cached = cache.get(cache_key)
+            if cached is not None:
+                project_ids, next_cursor = cached
+                return _load_ordered(Project, project_ids, joinedload(Project.creator)), next_cursor
+
+        query = ProjectListingService.visible_projects_query(user, category, project_type)\
+            .options(joinedload(Project.creator))
+        projects, next_cursor = keyset_page(query, Project.created_at, Project.id, position, per_page)
+
+        if anonymous and position is None:
+            try:
+                cache.set(cache_key, ([p.id for p in projects], next_cursor), timeout=tagged_timeout())
+            except Exception as e:
+                current_app.logger.warning(f"Could not cache projects listing: {e}")
+        return projects, next_cursor
+
+    @staticmethod
+    def get_user_votes(user, project_ids):
+        """Return ``{project_id: True}`` for the given projects voted by ``user``."""
+        if user is None or not user.is_authenticated or not project_ids:
+            return {}
+        voted = db.session.query(ProjectVote.project_id).filter(
+            ProjectVote.user_id == user.id,
+            ProjectVote.project_id.in_(project_ids)
+        ).distinct()
+        return {project_id: True for (project_id,) in voted}
+
+    # ============================================
+    # Activity feed
+    # ============================================
+
+    @staticmethod
+    def get_activities_page(cursor=None, per_page=ACTIVITIES_PER_PAGE):
+        """
+        Return a page of the activity feed (newest first).
+
+        Returns:
+            tuple: ``(activities, next_cursor)`` with user and project eager loaded
+        """
+        position = decode_cursor(cursor)
+        options = (joinedload(Activity.user), joinedload(Activity.project))
+
+        if position is None:
+            cache_key = tagged_key(f"activity_feed:first:{int(per_page)}", ACTIVITY_FEED_TAG)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                activity_ids, next_cursor = cached
+                return _load_ordered(Activity, activity_ids, *options), next_cursor
+
+        query = Activity.query.options(*options)
+        activities, next_cursor = keyset_page(query, Activity.timestamp, Activity.id, position, per_page)
+
+        if position is None:
+            try:
+                cache.set(cache_key, ([a.id for a in activities], next_cursor), timeout=tagged_timeout())
+            except Exception as e:
+                current_app.logger.warning(f"Could not cache activity feed: {e}")
+        return activities, next_cursor
+
+    @staticmethod
+    def invalidate(*tags):
+        invalidate_tags(*(tags or (PROJECTS_LISTING_TAG, ACTIVITY_FEED_TAG)))
+
+
+# ============================================
+# Invalidation hooks
+# ============================================
+
+def _listing_tags(session, obj):
+    return (PROJECTS_LISTING_TAG,) if isinstance(obj, Project) else (ACTIVITY_FEED_TAG,)
+
+
+def register_listing_listeners():
+    """Invalidate the cached first pages when projects or activities change."""
+    register_tag_invalidation('listings', (Project, Activity), _listing_tags)
@@ -0,0 +1,321 @@
+# app/services/resumable_upload_service.py
+"""
+Upload riprendibili a chunk per i file del workspace.
+
+Ogni upload ha un file parziale preallocato alla dimensione finale e uno
+stato JSON con gli intervalli di byte già ricevuti. I chunk dichiarano il
+proprio offset e vengono scritti con write posizionali, quindi possono
+arrivare in qualsiasi ordine, in parallelo e ripetuti senza duplicare dati.
+Ogni chunk viene prima ricevuto in un file temporaneo e copiato nel file
+parziale (sotto lock) solo se il suo SHA-256 coincide con quello dichiarato
+dal client; un upload completato non accetta più scritture.
+
+Quando tutti i byte sono stati ricevuti (e l'eventuale SHA-256 del file è
+verificato) il file viene spostato nella sessione di upload.
+
+Struttura su disco:
+    {workspace}/{project_id}/partial_uploads/{upload_id}/data.part
+    {workspace}/{project_id}/partial_uploads/{upload_id}/state.json
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from app.services.blob_store import BlobStore
+from app.workspace_utils import ensure_project_workspace, session_dir as ws_session_dir
+
+try:
+    import fcntl  # Lock inter-processo (non disponibile su Windows)
+except ImportError:  # pragma: no cover - dipende dalla piattaforma
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+READ_BLOCK_SIZE = 1024 * 1024
+_UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+# Lock per upload condivisi tra i thread dello stesso processo
+_upload_thread_locks: Dict[str, threading.Lock] = {}
+_upload_thread_locks_guard = threading.Lock()
+
+
+class ResumableUploadError(Exception):
+    """Errore del protocollo di upload, con lo status HTTP da restituire."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def merge_ranges(ranges: List[List[int]]) -> List[List[int]]:
+    """Unisce intervalli [start, end) sovrapposti o adiacenti."""
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def missing_ranges(ranges: List[List[int]], size: int) -> List[List[int]]:
+    """Intervalli [start, end) non ancora ricevuti."""
+    missing = []
+    cursor = 0
+    for start, end in ranges:
+        if start > cursor:
+            missing.append([cursor, start])
+        cursor = max(cursor, end)
+    if cursor < size:
+        missing.append([cursor, size])
+    return missing
+
+
+def _pwrite(fd: int, data: bytes, offset: int):
+    if hasattr(os, 'pwrite'):
+        written = 0
+        while written < len(data):
+            written += os.pwrite(fd, data[written:], offset + written)
+    else:  # pragma: no cover - Windows
+        os.lseek(fd, offset, os.SEEK_SET)
+        os.write(fd, data)
+
+
+class ResumableUploadService:
+    """Gestisce gli upload riprendibili di un progetto."""
+
+    def __init__(self, project_id: int):
+        self.project_id = project_id
+        self.root = os.path.join(ensure_project_workspace(project_id), 'partial_uploads')
+
+    # ------------------------------------------------------------------
+    # Stato
+    # ------------------------------------------------------------------
+
+    def _upload_dir(self, upload_id: str) -> str:
+        if not _UPLOAD_ID_RE.match(upload_id or ''):
+            raise ResumableUploadError('Upload non trovato.', 404)
+        return os.path.join(self.root, upload_id)
+
+    def _state_path(self, upload_id: str) -> str:
+        return os.path.join(self._upload_dir(upload_id), 'state.json')
+
+    def _part_path(self, upload_id: str) -> str:
+        return os.path.join(self._upload_dir(upload_id), 'data.part')
+
+    def _load_state(self, upload_id: str) -> Dict[str, Any]:
+        try:
+            with open(self._state_path(upload_id), 'r', encoding='utf-8') as fp:
+                return json.load(fp)
+        except (OSError, json.JSONDecodeError):
+            raise ResumableUploadError('Upload non trovato.', 404)
+
+    def _save_state(self, state: Dict[str, Any]):
+        path = self._state_path(state['upload_id'])
+        tmp_path = f"{path}.tmp"
+        state['updated_at'] = datetime.now(timezone.utc).isoformat()
+        with open(tmp_path, 'w', encoding='utf-8') as fp:
+            json.dump(state, fp)
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def _locked(self, upload_id: str):
+        """Serializza gli aggiornamenti dello stato (thread e processi)."""
+        with _upload_thread_locks_guard:
+            thread_lock = _upload_thread_locks.setdefault(upload_id, threading.Lock())
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self._upload_dir(upload_id), 'lock'), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def describe(state: Dict[str, Any]) -> Dict[str, Any]:
+        """Vista pubblica dello stato: offset contiguo, byte ricevuti e intervalli mancanti."""
+        ranges = state.get('ranges', [])
+        contiguous = ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+        return {
+            'upload_id': state['upload_id'],
+            'session_id': state['session_id'],
+            'path': state['path'],
+            'size': state['size'],
+            'chunk_size': state['chunk_size'],
+            'offset': contiguous,
+            'received_bytes': sum(end - start for start, end in ranges),
+            'missing': missing_ranges(ranges, state['size']),
+            'status': state['status'],
+            'sha256': state.get('final_sha256'),
+        }
+
+    # ------------------------------------------------------------------
+    # Protocollo
+    # ------------------------------------------------------------------
+
+    def create(
+        self,
+        relative_path: str,
+        size: int,
+        session_id: str,
+        sha256: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        max_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Registra un nuovo upload e prealloca il file parziale."""
+        if size is None or size < 0:
+            raise ResumableUploadError('Dimensione del file non valida.')
+        if max_size and size > max_size:
+            raise ResumableUploadError('File troppo grande.', 413)
+        if sha256 and not re.match(r'^[0-9a-fA-F]{64}$', sha256):
+            raise ResumableUploadError('SHA-256 non valido.')
+
+        upload_id = uuid.uuid4().hex
+        upload_dir = self._upload_dir(upload_id)
+        os.makedirs(upload_dir, exist_ok=True)
+        with open(self._part_path(upload_id), 'wb') as part:
+            part.truncate(size)
+
+        state = {
+            'upload_id': upload_id,
+            'project_id': self.project_id,
+            'session_id': session_id,
+            'path': relative_path,
+            'size': size,
+            'chunk_size': chunk_size or DEFAULT_CHUNK_SIZE,
+            'sha256': sha256.lower() if sha256 else None,
+            'ranges': [],
+            'status': 'uploading',
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        }
+        self._save_state(state)
+        if size == 0:
+            with self._locked(upload_id):
+                self._complete(state)
+        return state
+
+    def get(self, upload_id: str) -> Dict[str, Any]:
+        return self._load_state(upload_id)
+
+    def write_chunk(
+        self,
+        upload_id: str,
+        offset: int,
+        stream: BinaryIO,
+        length: Optional[int] = None,
+        chunk_sha256: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Scrive un chunk all'offset indicato.
+
+        Returns:
+            (stato aggiornato, True se questo chunk ha completato l'upload)
+        """
+        state = self._load_state(upload_id)
+        if state['status'] == 'complete':
+            return state, False
+        if offset is None or offset < 0 or offset > state['size']:
+            raise ResumableUploadError('Offset non valido.', 416)
+        if length is not None and offset + length > state['size']:
+            raise ResumableUploadError('Il chunk supera la dimensione dichiarata.', 416)
+
+        # Il chunk viene ricevuto e verificato in un file temporaneo fuori dal lock
+        # (chunk diversi procedono in parallelo); nel file parziale entrano solo
+        # byte verificati, copiati sotto lock
+        chunk_path = os.path.join(self._upload_dir(upload_id), f"chunk-{uuid.uuid4().hex}.tmp")
+        try:
+            digest = hashlib.sha256()
+            written = 0
+            with open(chunk_path, 'wb') as chunk_file:
+                for block in iter(lambda: stream.read(READ_BLOCK_SIZE), b''):
+                    if offset + written + len(block) > state['size']:
+                        raise ResumableUploadError('Il chunk supera la dimensione dichiarata.', 416)
+                    chunk_file.write(block)
+                    digest.update(block)
+                    written += len(block)
+
+            if length is not None and written != length:
+                raise ResumableUploadError('Chunk incompleto.', 400)
+            if chunk_sha256 and digest.hexdigest() != chunk_sha256.lower():
+                # Il chunk viene scartato: il client lo ripete
+                raise ResumableUploadError('Checksum del chunk non valido.', 422)
+
+            with self._locked(upload_id):
+                state = self._load_state(upload_id)
+                if state['status'] == 'complete':
+                    # Il file è già nella sessione (e nel blob store): nessuna scrittura
+                    return state, False
+                if written:
+                    self._copy_into_part(upload_id, chunk_path, offset)
+                    state['ranges'] = merge_ranges(state['ranges'] + [[offset, offset + written]])
+                completed = not missing_ranges(state['ranges'], state['size'])
+                if completed:
+                    self._complete(state)
+                else:
+                    self._save_state(state)
+        finally:
+            if os.path.exists(chunk_path):
+                os.remove(chunk_path)
+        return state, completed
+
+    def _copy_into_part(self, upload_id: str, chunk_path: str, offset: int):
+        """Copia un chunk verificato nel file parziale all'offset indicato (sotto lock)."""
+        fd = os.open(self._part_path(upload_id), os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            position = offset
+            with open(chunk_path, 'rb') as chunk_file:
+                for block in iter(lambda: chunk_file.read(READ_BLOCK_SIZE), b''):
+                    _pwrite(fd, block, position)
+                    position += len(block)
+        finally:
+            os.close(fd)
+
+    def _complete(self, state: Dict[str, Any]):
+        """Verifica il file completo e lo sposta nella sessione di upload (sotto lock)."""
+        upload_id = state['upload_id']
+        part_path = self._part_path(upload_id)
+        final_sha256 = BlobStore.hash_file(part_path)
+        if state.get('sha256') and final_sha256 != state['sha256']:
+            # Contenuto incoerente: l'upload riparte da zero
+            state['ranges'] = []
+            self._save_state(state)
+            raise ResumableUploadError('Checksum del file non valido: upload da ripetere.', 422)
+
+        session_directory = ws_session_dir(self.project_id, state['session_id'])
+        destination = os.path.join(session_directory, state['path'])
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        if os.path.exists(destination):
+            # Il file può essere un hardlink del blob store: mai riscriverlo in place
+            os.remove(destination)
+        os.replace(part_path, destination)
+
+        blob_store = BlobStore()
+        blob_store.ingest(destination, final_sha256)
+        blob_store.link(final_sha256, destination)
+
+        state['status'] = 'complete'
+        state['final_sha256'] = final_sha256
+        state['completed_at'] = datetime.now(timezone.utc).isoformat()
+        self._save_state(state)
+        logger.info(
+            "Resumable upload %s completed (project=%s, path=%s, %s bytes)",
+            upload_id, self.project_id, state['path'], state['size']
+        )
+
+    def discard(self, upload_id: str):
+        shutil.rmtree(self._upload_dir(upload_id), ignore_errors=True)
+        with _upload_thread_locks_guard:
+            _upload_thread_locks.pop(upload_id, None)
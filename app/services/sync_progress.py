@@ -0,0 +1,89 @@
+# app/services/sync_progress.py
+"""
+Avanzamento di un sync workspace, salvato nel record della sessione.
+
+Il job aggiorna metadata['progress'] (fase corrente e contatori) e lo
+scrive in metadata.json al massimo ogni MIN_SAVE_INTERVAL secondi; i cambi
+di fase aggiornano anche l'indice delle sessioni nel DB e fanno subito
+commit (il sync possiede la propria transazione), così i lock di scrittura
+non restano aperti per tutto il sync. L'endpoint SSE delle sessioni
+inoltra il file al browser.
+"""
+
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from app.extensions import db
+from app.workspace_utils import save_session_metadata, write_session_metadata_file
+
+# Righe di avanzamento di `git push --progress`, es. "Writing objects:  45% (9/20)"
+GIT_OBJECTS_RE = re.compile(r'(Counting|Compressing|Writing) objects:\s+\d+% \((\d+)/(\d+)\)')
+
+
+class SyncProgress:
+    """Reporter thread-safe delle fasi di sync (files hashed, bytes copied, objects pushed)."""
+
+    MIN_SAVE_INTERVAL = 0.5
+
+    COUNTERS = (
+        'files_total', 'files_hashed', 'bytes_total', 'bytes_copied',
+        'objects_total', 'objects_pushed',
+    )
+
+    def __init__(self, session_directory: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None):
+        self.session_directory = session_directory
+        self.metadata = metadata if metadata is not None else {}
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+        progress = self.metadata.get('progress') or {}
+        self.state: Dict[str, Any] = {name: progress.get(name, 0) for name in self.COUNTERS}
+        self.state['phase'] = progress.get('phase', 'queued')
+
+    def phase(self, name: str, **totals):
+        """Passa a una nuova fase (salvata subito) impostando eventuali totali."""
+        with self._lock:
+            self.state['phase'] = name
+            self.state.update(totals)
+        self._save(force=True)
+
+    def advance(self, **deltas):
+        """Incrementa i contatori indicati (salvataggio limitato nel tempo)."""
+        with self._lock:
+            for name, value in deltas.items():
+                self.state[name] = self.state.get(name, 0) + value
+        self._save()
+
+    def set(self, **values):
+        with self._lock:
+            self.state.update(values)
+        self._save()
+
+    def git_output(self, line: str):
+        """Interpreta una riga di stderr di git push --progress."""
+        match = GIT_OBJECTS_RE.search(line)
+        if match and match.group(1) == 'Writing':
+            self.set(objects_pushed=int(match.group(2)), objects_total=int(match.group(3)))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = dict(self.state)
+        snapshot['updated_at'] = datetime.now(timezone.utc).isoformat()
+        return snapshot
+
+    def _save(self, force: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_save < self.MIN_SAVE_INTERVAL:
+                return
+            self._last_save = now
+        self.metadata['progress'] = self.snapshot()
+        if not self.session_directory:
+            return
+        if force:
+            save_session_metadata(self.session_directory, self.metadata)
+            db.session.commit()
+        else:
+            write_session_metadata_file(self.session_directory, self.metadata)
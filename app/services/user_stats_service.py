@@ -0,0 +1,173 @@
+# app/services/user_stats_service.py
+"""
+User Stats Service
+
+Computes the statistics shown on the user profile (completed tasks per
+category, skill and reputation points, votes received, equity totals) with
+a few grouped aggregate queries instead of loading every solution and
+counting votes per solution.
+
+The result is cached per user under the user tag; commits that approve or
+submit a solution, add a vote, create a task or change a collaboration of
+the user (or change the category of a task the user solved) bump the tag
+generation.
+"""
+
+from flask import current_app
+from sqlalchemy import distinct, func, inspect, select
+
+from ..cache import cache, invalidate_tags, register_tag_invalidation, tagged_key, tagged_timeout
+from ..extensions import db
+from ..models import ALLOWED_TASK_TYPES, Collaborator, Project, Solution, Task, Vote
+
+
+# Punti reputazione / skill
+TASK_POINTS = 10
+APPROVED_SOLUTION_POINTS = 20
+VOTE_POINTS = 10
+
+
+def user_tag(user_id):
+    """Tag covering every cached value derived from a user's activity."""
+    return f"user_stats:{int(user_id)}"
+
+
+class UserStatsService:
+    """Service for the cached profile statistics of a user"""
+
+    @staticmethod
+    def stats_cache_key(user_id):
+        return tagged_key(f"user_profile_stats:{int(user_id)}", user_tag(user_id))
+
+    @staticmethod
+    def get_stats(user_id):
+        """
+        Return the cached profile stats of a user, computing them on a miss.
+
+        Returns:
+            dict: Plain (picklable) data with the values used by user_profile.html
+        """
+        cache_key = UserStatsService.stats_cache_key(user_id)
+        stats = cache.get(cache_key)
+        if stats is not None:
+            return stats
+
+        stats = UserStatsService.compute_stats(user_id)
+        try:
+            cache.set(cache_key, stats, timeout=tagged_timeout())
+        except Exception as e:
+            current_app.logger.warning(f"Could not cache profile stats for user {user_id}: {e}")
+        return stats
+
+    @staticmethod
+    def compute_stats(user_id):
+        """Compute the profile stats with grouped aggregates (three queries)."""
+        approved = (Solution.submitted_by_user_id == user_id) & (Solution.is_approved == True)
+
+        # Task completati per categoria (task con almeno una soluzione approvata)
+        tasks_by_type = dict(
+            db.session.query(Task.task_type, func.count(distinct(Task.id)))
+            .join(Solution, Solution.task_id == Task.id)
+            .filter(approved)
+            .group_by(Task.task_type)
+            .all()
+        )
+
+        # Voti ricevuti sulle soluzioni approvate, per categoria del task
+        votes_by_type = dict(
+            db.session.query(Task.task_type, func.count(Vote.id))
+            .select_from(Vote)
+            .join(Solution, Solution.id == Vote.solution_id)
+            .join(Task, Task.id == Solution.task_id)
+            .filter(approved)
+            .group_by(Task.task_type)
+            .all()
+        )
+
+        totals = db.session.execute(select(
+            select(func.count(Solution.id)).where(approved).scalar_subquery().label('approved_solutions'),
+            select(func.count(Solution.id)).where(Solution.submitted_by_user_id == user_id)
+                .scalar_subquery().label('total_solutions'),
+            select(func.count(Task.id)).where(Task.creator_id == user_id)
+                .scalar_subquery().label('total_tasks_created'),
+            select(func.coalesce(func.sum(Collaborator.equity_share), 0.0)).where(Collaborator.user_id == user_id)
+                .scalar_subquery().label('total_equity'),
+            select(func.count(Collaborator.id)).join(Project, Project.id == Collaborator.project_id)
+                .where(Collaborator.user_id == user_id).scalar_subquery().label('projects_contributed'),
+        )).one()
+
+        task_type_counts = {k: tasks_by_type.get(k, 0) for k in ALLOWED_TASK_TYPES.keys()}
+        skill_points = {k: count * TASK_POINTS for k, count in task_type_counts.items()}
+        positive_votes_by_category = {k: votes_by_type.get(k, 0) for k in ALLOWED_TASK_TYPES.keys()}
+
+        num_tasks_completed = sum(tasks_by_type.values())
+        positive_votes = sum(votes_by_type.values())
+        reputation_points = (
+            num_tasks_completed * TASK_POINTS
+            + totals.approved_solutions * APPROVED_SOLUTION_POINTS
+            + positive_votes * VOTE_POINTS
+        )
+
+        # Skill points dettagliati per categoria (curriculum)
+        curriculum_skills = [
+            {
+                'category': label,
+                'tasks_completed': task_type_counts[cat],
+                'skill_points': skill_points[cat],
+                'positive_votes': positive_votes_by_category[cat]
+            }
+            for cat, label in ALLOWED_TASK_TYPES.items()
+        ]
+
+        return {
+            'num_projects_contributed': totals.projects_contributed,
+            'num_tasks_completed': num_tasks_completed,
+            'task_type_counts': task_type_counts,
+            'num_approved_solutions': totals.approved_solutions,
+            'total_equity': float(totals.total_equity or 0.0),
+            'reputation_points': reputation_points,
+            'skill_points': skill_points,
+            'positive_votes': positive_votes,
+            'curriculum_skills': curriculum_skills,
+            'total_solutions': totals.total_solutions,
+            'total_tasks_created': totals.total_tasks_created,
+        }
+
+    @staticmethod
+    def invalidate(*user_ids):
+        invalidate_tags(*(user_tag(user_id) for user_id in user_ids))
+
+
+# ============================================
+# Invalidation hooks
+# ============================================
+
+def _affected_user_ids(session, obj):
+    if isinstance(obj, Solution):
+        return [obj.submitted_by_user_id]
+    if isinstance(obj, Vote):
+        solution = obj.solution
+        if solution is None and obj.solution_id is not None:
+            solution = session.get(Solution, obj.solution_id)
+        return [solution.submitted_by_user_id] if solution is not None else []
+    if isinstance(obj, Task):
+        user_ids = [obj.creator_id]
+        # Le statistiche dei solutori sono per categoria del task: un cambio di task_type le altera.
+        # (Una cancellazione passa già dalle Solution rimosse in cascata)
+        if obj.id is not None and inspect(obj).attrs.task_type.history.has_changes():
+            user_ids.extend(session.scalars(
+                select(Solution.submitted_by_user_id).where(Solution.task_id == obj.id).distinct()
+            ))
+        return user_ids
+    if isinstance(obj, Collaborator):
+        return [obj.user_id]
+    return []
+
+
+def _changed_user_tags(session, obj):
+    return [user_tag(user_id) for user_id in _affected_user_ids(session, obj) if isinstance(user_id, int)]
+
+
+def register_user_stats_listeners():
+    """Invalidate cached profile stats when the user's activity changes."""
+    register_tag_invalidation('user_stats', (Solution, Vote, Task, Collaborator), _changed_user_tags)
@@ -0,0 +1,135 @@
+# app/services/workspace_sync_queue.py
+"""
+Coda dei sync workspace -> GitHub.
+
+finalize-upload non esegue più il sync dentro la richiesta HTTP: la sessione
+viene accodata e il job gira in background, riportando l'avanzamento nel
+record della sessione (vedi SyncProgress).
+
+Backend (WORKSPACE_SYNC_QUEUE):
+- 'thread' (default): un worker per progetto nel processo web. Le sessioni
+  dello stesso progetto vengono eseguite in sequenza e un finalize ripetuto
+  per una sessione già in coda o in esecuzione viene unito al job esistente.
+- 'celery': accoda il task sync_workspace_session (worker separato).
+- 'inline': esegue il sync dentro la richiesta (test e sviluppo).
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from flask import current_app
+
+from app.models import Project
+from app.workspace_utils import load_session_metadata, save_session_metadata, session_dir as ws_session_dir
+
+logger = logging.getLogger(__name__)
+
+# Stati in cui una sessione è già affidata a un job
+ACTIVE_STATUSES = ('queued', 'syncing')
+
+# Sessioni in attesa per progetto (session_id -> initiated_by) e worker attivi
+_pending: Dict[int, 'OrderedDict[str, Optional[int]]'] = {}
+_running: Dict[int, Optional[str]] = {}
+_workers: Dict[int, threading.Thread] = {}
+_guard = threading.Lock()
+
+
+class WorkspaceSyncQueue:
+    """Accoda i sync delle sessioni e ne coalesce le richieste duplicate."""
+
+    def enqueue(self, project: Project, session_id: str, initiated_by: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Accoda il sync della sessione.
+
+        Returns:
+            Dict con 'status' ('queued' o lo stato corrente), 'coalesced' (True se
+            la sessione era già in coda/in esecuzione) e 'backend'
+        """
+        backend = current_app.config.get('WORKSPACE_SYNC_QUEUE', 'thread')
+        session_directory = ws_session_dir(project.id, session_id)
+
+        with _guard:
+            metadata = load_session_metadata(session_directory)
+            if self._is_active(project.id, session_id, metadata, backend):
+                return {'status': metadata.get('status'), 'coalesced': True, 'backend': backend}
+
+            metadata['status'] = 'queued'
+            metadata['queued_at'] = datetime.now(timezone.utc).isoformat()
+            metadata['progress'] = {'phase': 'queued', 'updated_at': metadata['queued_at']}
+            metadata.pop('error', None)
+            save_session_metadata(session_directory, metadata)
+
+            if backend == 'celery':
+                from tasks.github_tasks import sync_workspace_session
+                task = sync_workspace_session.delay(project.id, session_id, initiated_by)
+                metadata['sync_task_id'] = task.id
+                save_session_metadata(session_directory, metadata)
+            elif backend != 'inline':
+                _pending.setdefault(project.id, OrderedDict())[session_id] = initiated_by
+                self._ensure_worker(project.id)
+
+        if backend == 'inline':
+            from app.services.workspace_sync_service import WorkspaceSyncService
+            result = WorkspaceSyncService().sync_session(project, session_id, initiated_by=initiated_by)
+            return {'status': result.get('status'), 'coalesced': False, 'backend': backend}
+
+        logger.info("Workspace sync queued (project=%s, session=%s, backend=%s)", project.id, session_id, backend)
+        return {'status': 'queued', 'coalesced': False, 'backend': backend}
+
+    @staticmethod
+    def _is_active(project_id: int, session_id: str, metadata: Dict[str, Any], backend: str) -> bool:
+        if backend != 'thread':
+            return metadata.get('status') in ACTIVE_STATUSES
+        return session_id in _pending.get(project_id, {}) or _running.get(project_id) == session_id
+
+    def _ensure_worker(self, project_id: int):
+        """Avvia il worker del progetto se non è già attivo (chiamare con _guard)."""
+        worker = _workers.get(project_id)
+        if worker is not None and worker.is_alive():
+            return
+        app = current_app._get_current_object()
+        worker = threading.Thread(
+            target=self._work, args=(app, project_id), name=f"workspace-sync-{project_id}", daemon=True
+        )
+        _workers[project_id] = worker
+        worker.start()
+
+    def _work(self, app, project_id: int):
+        """Esegue in sequenza le sessioni accodate per il progetto."""
+        from app.services.workspace_sync_service import WorkspaceSyncService
+
+        while True:
+            with _guard:
+                pending = _pending.get(project_id)
+                if not pending:
+                    _pending.pop(project_id, None)
+                    _running.pop(project_id, None)
+                    _workers.pop(project_id, None)
+                    return
+                session_id, initiated_by = pending.popitem(last=False)
+                _running[project_id] = session_id
+
+            with app.app_context():
+                try:
+                    project = Project.query.get(project_id)
+                    if project is None:
+                        logger.error("Project %s not found during queued sync", project_id)
+                        continue
+                    result = WorkspaceSyncService().sync_session(project, session_id, initiated_by=initiated_by)
+                    logger.info("Queued sync finished (project=%s, session=%s): %s",
+                                project_id, session_id, result.get('status'))
+                except Exception as exc:
+                    # sync_session ha già marcato la sessione come 'error'
+                    logger.error("Queued sync failed (project=%s, session=%s): %s",
+                                 project_id, session_id, exc, exc_info=True)
+                finally:
+                    with _guard:
+                        _running.pop(project_id, None)
+
+
+def is_sync_active(project_id: int) -> bool:
+    with _guard:
+        return bool(_pending.get(project_id)) or project_id in _running
@@ -13,12 +13,15 @@ from app.workspace_utils import (
     sanitize_workspace_path,
     save_session_metadata,
     session_dir as ws_session_dir,
-    synced_repo_dir
+    synced_repo_dir,
+    list_exportable_repo_files
 )
 from app.services.notification_service import NotificationService
 from .managed_repo_service import ManagedRepoService
 from .github_sync_service import GitHubSyncService
 from .git_sync_service import GitSyncService
+from .blob_store import BlobStore
+from .sync_progress import SyncProgress
 
 logger = logging.getLogger(__name__)
 
@@ -66,6 +69,7 @@ class WorkspaceSyncService:
                         metadata['error'] = f'Sync timeout after {elapsed:.0f}s (server restart or crash)'
                         metadata['sync_finished_at'] = datetime.now(timezone.utc).isoformat()
                         save_session_metadata(session_directory, metadata)
+                        db.session.commit()
                         return metadata
                 except Exception as parse_err:
                     logger.warning(f"Could not parse sync_started_at: {parse_err}")
@@ -75,18 +79,37 @@ class WorkspaceSyncService:
 
         metadata['status'] = 'syncing'
         metadata['sync_started_at'] = datetime.now(timezone.utc).isoformat()
-        save_session_metadata(session_directory, metadata)
+        metadata.pop('progress', None)
+        progress = SyncProgress(session_directory, metadata)
+        progress.phase(
+            'collecting',
+            files_total=len(metadata.get('files', [])),
+            bytes_total=sum(item.get('size', 0) for item in metadata.get('files', []))
+        )
+        # Il sync possiede la propria transazione: phase() fa commit, lo stato 'syncing'
+        # è subito visibile nell'indice
 
         # Wrap entire sync process in try-except to ensure status is always updated
         try:
             # Raccogli file (con lazy loading per file grandi)
             collect_start = time.time()
-            files = self._collect_files(session_directory, lazy=True)
+            digests = {
+                item['path']: item['sha256']
+                for item in metadata.get('files', [])
+                if item.get('path') and item.get('sha256')
+            }
+            files = self._collect_files(
+                session_directory, lazy=True, digests=digests, repo_dir=synced_repo_dir(project.id),
+                progress=progress
+            )
             collect_elapsed = time.time() - collect_start
+            # Solo i blob cambiati rispetto al mirror vanno inviati a GitHub
+            changed_files = [f for f in files if not f.get('unchanged')]
+            deleted_paths = self._deleted_paths(project, metadata, files)
             
             # Carica contenuto per file lazy prima di inviare a GitHub
             load_start = time.time()
-            for file_data in files:
+            for file_data in changed_files:
                 if file_data.get('lazy') and file_data.get('full_path'):
                     # Carica contenuto solo quando necessario
                     try:
@@ -102,7 +125,7 @@ class WorkspaceSyncService:
             
             logger.info(
                 f"Session {session_id} for project {project.id}: "
-                f"{total_files} files ({total_size / 1024 / 1024:.2f} MB) "
+                f"{total_files} files ({total_size / 1024 / 1024:.2f} MB, {len(changed_files)} changed) "
                 f"collected in {collect_elapsed:.2f}s, loaded in {load_elapsed:.2f}s"
             )
             
@@ -121,7 +144,8 @@ class WorkspaceSyncService:
                             logger.info(f"Using git sync for project {project.id} session {session_id}")
                             sync_start = time.time()
                             git_result = self.git_sync.sync_workspace_from_directory(
-                                project, session_directory, initiated_by
+                                project, session_directory, initiated_by, progress=progress,
+                                deleted_paths=deleted_paths
                             )
                             sync_elapsed = time.time() - sync_start
                             sync_method = git_result.get('method', 'git')
@@ -138,8 +162,9 @@ class WorkspaceSyncService:
                                 logger.warning(
                                     f"Git sync failed, falling back to GitHub API: {git_result.get('message')}"
                                 )
+                                progress.phase('uploading', objects_total=len(changed_files), objects_pushed=0)
                                 sync_start = time.time()
-                                sync_result = self.github_sync.sync_multiple_files(project, files)
+                                sync_result = self._sync_changed_files(project, changed_files, deleted_paths)
                                 sync_elapsed = time.time() - sync_start
                                 sync_method = sync_result.get('method', 'api_fallback')
                                 
@@ -149,8 +174,9 @@ class WorkspaceSyncService:
                         else:
                             # Git non disponibile, usa GitHub API
                             logger.info(f"Git not available, using GitHub API for project {project.id} session {session_id}")
+                            progress.phase('uploading', objects_total=len(changed_files), objects_pushed=0)
                             sync_start = time.time()
-                            sync_result = self.github_sync.sync_multiple_files(project, files)
+                            sync_result = self._sync_changed_files(project, changed_files, deleted_paths)
                             sync_elapsed = time.time() - sync_start
                             sync_method = sync_result.get('method', 'api')
                             
@@ -160,7 +186,7 @@ class WorkspaceSyncService:
                             
                             logger.info(
                                 f"GitHub API sync for project {project.id} session {session_id}: "
-                                f"{sync_result.get('success', 0)}/{total_files} files "
+                                f"{sync_result.get('success', 0)}/{len(changed_files)} changed files "
                                 f"using {sync_method} method in {sync_elapsed:.2f}s "
                                 f"({sync_result.get('success', 0) / sync_elapsed:.1f} files/sec if success > 0)"
                             )
@@ -176,8 +202,10 @@ class WorkspaceSyncService:
                 
                 if success:
                     # Mirror locale (parallelizzato)
+                    progress.phase('mirroring')
                     mirror_start = time.time()
                     self._mirror_files_locally(project, files)
+                    self._prune_mirror(project, deleted_paths)
                     mirror_elapsed = time.time() - mirror_start
                     logger.debug(
                         f"Local mirror for project {project.id} session {session_id}: "
@@ -200,6 +228,7 @@ class WorkspaceSyncService:
                 'total_size_bytes': total_size
             }
             
+            metadata['progress'] = dict(progress.snapshot(), phase='done' if success else 'failed')
             if success:
                 metadata['status'] = 'completed'
                 metadata['error'] = None
@@ -219,6 +248,7 @@ class WorkspaceSyncService:
 
             save_session_metadata(session_directory, metadata)
             self._record_history_entry(project, metadata)
+            db.session.commit()
 
             return metadata
             
@@ -231,22 +261,68 @@ class WorkspaceSyncService:
             metadata['status'] = 'error'
             metadata['error'] = f'Unexpected error: {str(unexpected_exc)}'
             metadata['sync_finished_at'] = datetime.now(timezone.utc).isoformat()
+            metadata['progress'] = dict(progress.snapshot(), phase='failed')
+            db.session.rollback()
             save_session_metadata(session_directory, metadata)
+            db.session.commit()
             raise  # Re-raise to propagate error
 
-    def _collect_files(self, session_directory: str, lazy: bool = False) -> List[Dict[str, any]]:
+    def _sync_changed_files(self, project: Project, files: List[Dict[str, any]],
+                            deleted_paths: Optional[List[str]] = None) -> Dict[str, any]:
+        """Invia via API solo i file cambiati; nessuna chiamata se non è cambiato nulla."""
+        if not files and not deleted_paths:
+            return {'success': 0, 'failed': 0, 'errors': [], 'method': 'unchanged', 'blocked': []}
+        return self.github_sync.sync_multiple_files(project, files, deleted_paths=deleted_paths)
+
+    def _deleted_paths(self, project: Project, metadata: Dict[str, any],
+                       files: List[Dict[str, any]]) -> List[str]:
+        """
+        Path GitHub ('workspace/...') presenti nel mirror ma assenti da un upload ZIP
+        (solo con PROJECT_WORKSPACE_ZIP_PRUNES_DELETED attivo).
+        Gli upload manuali sono parziali e non rimuovono nulla.
+        Vengono rimossi su GitHub sia dal git sync sia dal fallback API, e dal
+        mirror locale solo dopo un sync riuscito.
+        """
+        if metadata.get('type') != 'zip' or not current_app.config.get('PROJECT_WORKSPACE_ZIP_PRUNES_DELETED', False):
+            return []
+        uploaded = {f['relative_path'] for f in files}
+        return [
+            f"workspace/{relative}"
+            for relative, _, _ in list_exportable_repo_files(project.id)
+            if relative not in uploaded
+        ]
+
+    def _prune_mirror(self, project: Project, deleted_paths: List[str]):
+        repo_dir = synced_repo_dir(project.id)
+        for path in deleted_paths:
+            try:
+                relative = sanitize_workspace_path(path[len('workspace/'):])
+                os.remove(os.path.join(repo_dir, *relative.split('/')))
+            except (ValueError, OSError):
+                continue
+
+    def _collect_files(self, session_directory: str, lazy: bool = False,
+                       digests: Optional[Dict[str, str]] = None,
+                       repo_dir: Optional[str] = None,
+                       progress: Optional[SyncProgress] = None) -> List[Dict[str, any]]:
         """
         Raccoglie file dalla sessione directory.
         
         Args:
             session_directory: Directory della sessione
             lazy: Se True, per file >= 10MB carica solo path + size (non content)
+            digests: SHA-256 noti per path relativo (dai metadata della sessione)
+            repo_dir: Mirror locale; i file il cui blob è già collegato lì sono
+                marcati 'unchanged' e non vengono letti
+            progress: Reporter opzionale (files_hashed per ogni file esaminato)
         
         Returns:
             Lista di dict con 'path', 'content' (o None se lazy), 'relative_path', 'message'
         """
         files = []
         LARGE_FILE_THRESHOLD = 10 * 1024 * 1024  # 10MB
+        digests = digests or {}
+        blob_store = BlobStore() if repo_dir else None
         
         for root, _, filenames in os.walk(session_directory):
             for filename in filenames:
@@ -254,18 +330,25 @@ class WorkspaceSyncService:
                     continue
                 full_path = os.path.join(root, filename)
                 rel_path = os.path.relpath(full_path, session_directory).replace('\\', '/')
+                digest = digests.get(rel_path)
                 
                 # Ottieni dimensione file
                 file_size = os.path.getsize(full_path)
                 
-                # Per file grandi con lazy=True, carica solo metadata
-                if lazy and file_size >= LARGE_FILE_THRESHOLD:
+                unchanged = bool(blob_store) and blob_store.is_linked(
+                    digest, os.path.join(repo_dir, *rel_path.split('/'))
+                )
+                
+                # Per file grandi con lazy=True (o invariati), carica solo metadata
+                if unchanged or (lazy and file_size >= LARGE_FILE_THRESHOLD):
                     files.append({
                         'path': f"workspace/{rel_path}",
                         'relative_path': rel_path,
                         'content': None,  # Lazy loading - carica quando necessario
                         'full_path': full_path,  # Salva path per lazy loading
                         'size': file_size,
+                        'sha256': digest,
+                        'unchanged': unchanged,
                         'message': f"Add {rel_path}",
                         'lazy': True
                     })
@@ -277,25 +360,31 @@ class WorkspaceSyncService:
                         'path': f"workspace/{rel_path}",
                         'relative_path': rel_path,
                         'content': content,
+                        'full_path': full_path,
                         'size': file_size,
+                        'sha256': digest,
+                        'unchanged': False,
                         'message': f"Add {rel_path}",
                         'lazy': False
                     })
+                if progress:
+                    progress.advance(files_hashed=1)
         
         return files
 
     def _mirror_files_locally(self, project: Project, files: List[Dict[str, any]]):
         """
         Crea mirror locale dei file sincronizzati.
-        Ottimizzato per file grandi usando shutil.copy2 e parallelizzazione.
+        I file sono hardlink del blob store: i contenuti invariati non vengono
+        toccati, quelli nuovi vengono collegati senza copiare i byte.
         """
-        import shutil
         from concurrent.futures import ThreadPoolExecutor, as_completed
         
         repo_dir = synced_repo_dir(project.id)
+        blob_store = BlobStore()
         
         def copy_file(file_data):
-            """Helper per copiare un singolo file."""
+            """Helper per collegare un singolo file nel mirror."""
             relative_path = file_data.get('relative_path') or file_data.get('path')
             if not relative_path:
                 return False
@@ -309,30 +398,19 @@ class WorkspaceSyncService:
                 logger.warning("Skipping invalid workspace path during mirror: %s", relative_path)
                 return False
             
-            dest_path = os.path.join(repo_dir, *sanitized.split('/'))
-            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-            
-            # Se abbiamo full_path (lazy loading), usa shutil.copy2 (più efficiente)
-            if file_data.get('lazy') and file_data.get('full_path'):
-                try:
-                    shutil.copy2(file_data['full_path'], dest_path)
-                    return True
-                except Exception as e:
-                    logger.warning(f"Failed to copy file {relative_path}: {e}")
-                    return False
-            else:
-                # Altrimenti scrivi da content in memoria
-                content = file_data.get('content', b'')
-                if content:
-                    try:
-                        with open(dest_path, 'wb') as handle:
-                            handle.write(content)
-                        return True
-                    except Exception as e:
-                        logger.warning(f"Failed to write file {relative_path}: {e}")
-                        return False
+            if file_data.get('unchanged'):
+                return True
             
-            return False
+            dest_path = os.path.join(repo_dir, *sanitized.split('/'))
+            try:
+                digest = file_data.get('sha256')
+                if not blob_store.has(digest):
+                    digest = blob_store.ingest(file_data['full_path'])
+                blob_store.link(digest, dest_path)
+                return True
+            except Exception as e:
+                logger.warning(f"Failed to mirror file {relative_path}: {e}")
+                return False
         
         # Parallelizza I/O per file multipli (max 4 workers)
         MAX_WORKERS = 4
@@ -2,13 +2,15 @@
 ZIP Processor Service
 Gestisce l'estrazione, validazione e analisi di file ZIP per i contributi.
 """
+import hashlib
 import os
+import posixpath
 import zipfile
 import tarfile
 import tempfile
 import shutil
 import difflib
-from typing import List, Dict, Tuple, Optional
+from typing import Iterator, List, Dict, Tuple, Optional
 from pathlib import Path
 from werkzeug.datastructures import FileStorage
 from flask import current_app
@@ -24,6 +26,9 @@ class ZipProcessor:
     
     MAX_FILE_SIZE = 52428800  # 50MB default fallback
     MAX_FILES = 1000  # Massimo numero di file in un ZIP
+    MAX_COMPRESSION_RATIO = 200  # Oltre questo rapporto un contenuto è considerato zip bomb
+    RATIO_MIN_BYTES = 1024 * 1024  # Sotto questa dimensione il rapporto non viene verificato
+    CHUNK_SIZE = 1024 * 1024
     ALLOWED_EXTENSIONS = {'.py', '.js', '.jsx', '.ts', '.tsx', '.html', '.css', 
                          '.scss', '.json', '.md', '.txt', '.yml', '.yaml', '.xml',
                          '.java', '.cpp', '.c', '.h', '.go', '.rs', '.rb', '.php',
@@ -46,24 +51,47 @@ class ZipProcessor:
             max_zip_bytes * 2
         )
         self.max_file_count = current_app.config.get('PROJECT_WORKSPACE_MAX_FILES', self.MAX_FILES)
+        self.max_compression_ratio = current_app.config.get(
+            'PROJECT_WORKSPACE_MAX_COMPRESSION_RATIO',
+            self.MAX_COMPRESSION_RATIO
+        )
     
-    def extract_zip(self, zip_file: FileStorage) -> List[Dict]:
+    def extract_zip(self, zip_file: FileStorage, destination: Optional[str] = None) -> List[Dict]:
         """
         Estrae i file da un archivio ZIP/TAR
         
         Args:
-            zip_file: FileStorage object da Flask
+            zip_file: FileStorage object da Flask (o file aperto in 'rb')
+            destination: Directory finale dei file (es. la sessione di upload);
+                se assente i file vanno in una directory temporanea (self.temp_dir)
             
         Returns:
-            List di dict con info sui file estratti: {path, content, size, type}
+            List di dict con info sui file estratti: {path, full_path, content, size, type, extension, sha256}
             
         Raises:
             ZipProcessorError: Se l'estrazione fallisce
         """
+        files = {}
+        for file_info in self.iter_extract(zip_file, destination):
+            files[file_info['path']] = file_info  # Path ripetuti: vale l'ultimo
+        self.extracted_files = list(files.values())
+        return self.extracted_files
+    
+    def iter_extract(self, zip_file: FileStorage, destination: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Estrazione in un solo passaggio: ogni membro viene scritto direttamente
+        nella destinazione finale calcolandone SHA-256 e tipo, mentre i limiti
+        (numero file, dimensione totale, rapporto di compressione) sono verificati
+        durante la scrittura. Restituisce le voci del manifest man mano.
+        Un path ripetuto nell'archivio produce più voci: vale l'ultima.
+        """
+        stream = getattr(zip_file, 'stream', zip_file)
+        filename = (getattr(zip_file, 'filename', None) or getattr(zip_file, 'name', '') or '').lower()
+        
         # Validazione dimensione
-        zip_file.seek(0, os.SEEK_END)
-        file_size = zip_file.tell()
-        zip_file.seek(0)
+        stream.seek(0, os.SEEK_END)
+        file_size = stream.tell()
+        stream.seek(0)
         
         if file_size > self.max_archive_bytes:
             raise ZipProcessorError(
@@ -71,28 +99,37 @@ class ZipProcessor:
                 f"Massimo consentito: {self.max_archive_bytes / 1024 / 1024:.0f}MB"
             )
         
-        # Crea directory temporanea
-        self.temp_dir = tempfile.mkdtemp(prefix='kickthisuss_zip_')
+        if destination is None:
+            # Crea directory temporanea
+            self.temp_dir = tempfile.mkdtemp(prefix='kickthisuss_zip_')
+            destination = self.temp_dir
+        os.makedirs(destination, exist_ok=True)
+        
+        self._archive_size = file_size
+        self._total_bytes = 0
+        self._file_count = 0
         
         try:
-            filename = zip_file.filename.lower()
-            
             # Estrai in base al tipo di archivio
             if filename.endswith('.zip'):
-                self._extract_zip_archive(zip_file)
+                members = self._iter_zip_archive(stream, destination)
             elif filename.endswith(('.tar', '.tar.gz', '.tgz')):
-                self._extract_tar_archive(zip_file)
+                members = self._iter_tar_archive(stream, filename, destination)
             else:
                 raise ZipProcessorError("Formato archivio non supportato")
             
-            # Valida struttura estratta
-            self._validate_extracted_structure()
-            
-            # Leggi i file estratti
-            self._read_extracted_files()
+            for file_info in members:
+                self.extracted_files.append(file_info)
+                if self._file_count % 100 == 0:
+                    current_app.logger.debug(f"Processed {self._file_count} files...")
+                yield file_info
             
-            return self.extracted_files
+            if self._file_count == 0:
+                raise ZipProcessorError("Nessun file valido trovato nell'archivio")
+            current_app.logger.debug(f"Total files processed: {self._file_count}")
             
+        except ZipProcessorError:
+            raise
         except zipfile.BadZipFile:
             raise ZipProcessorError("File ZIP corrotto o non valido")
         except tarfile.TarError:
@@ -101,121 +138,123 @@ class ZipProcessor:
             current_app.logger.error(f"Errore estrazione ZIP: {e}", exc_info=True)
             raise ZipProcessorError(f"Errore durante l'estrazione: {str(e)}")
     
-    def _extract_zip_archive(self, zip_file: FileStorage):
-        """Estrae un archivio ZIP"""
-        with zipfile.ZipFile(zip_file.stream, 'r') as zf:
-            allowed_members: List[str] = []
+    def _iter_zip_archive(self, stream, destination: str) -> Iterator[Dict]:
+        """Estrae un archivio ZIP membro per membro"""
+        with zipfile.ZipFile(stream, 'r') as zf:
+            allowed_members = []
+            declared_total = 0
             for info in zf.infolist():
-                name = info.filename
-                if not name or name.endswith('/'):
+                if info.is_dir():
                     continue
-                relative_path = Path(name)
-                if self._is_forbidden_path(relative_path):
+                relative_path = self._safe_relative_path(info.filename)
+                if relative_path is None:
                     continue
-                allowed_members.append(name)
-
-            if len(allowed_members) > self.max_file_count:
-                raise ZipProcessorError(
-                    f"Troppi file nell'archivio: {len(allowed_members)}. "
-                    f"Massimo consentito: {self.max_file_count}"
-                )
-
-            base_dir = Path(self.temp_dir).resolve()
-            for member in allowed_members:
-                member_path = (base_dir / Path(member)).resolve()
-                if not str(member_path).startswith(str(base_dir)):
-                    raise ZipProcessorError(f"Path non sicuro rilevato: {member}")
-                zf.extract(member, self.temp_dir)
+                allowed_members.append((info, relative_path))
+                declared_total += info.file_size
+                self._check_ratio(info.file_size, info.compress_size, info.filename)
+            
+            # Limiti dichiarati nella directory centrale: rifiuta prima di scrivere
+            self._check_count(len(allowed_members))
+            self._check_total(declared_total)
+            
+            for info, relative_path in allowed_members:
+                with zf.open(info) as source:
+                    yield self._write_member(source, relative_path, destination, info.compress_size)
     
-    def _extract_tar_archive(self, tar_file: FileStorage):
-        """Estrae un archivio TAR/TAR.GZ"""
-        mode = 'r:gz' if tar_file.filename.lower().endswith(('.gz', '.tgz')) else 'r'
-        
-        with tarfile.open(fileobj=tar_file.stream, mode=mode) as tf:
-            file_members = [m for m in tf.getmembers() if not m.isdir()]
-            allowed_members = []
-            for member in file_members:
-                path_obj = Path(member.name)
-                if self._is_forbidden_path(path_obj):
+    def _iter_tar_archive(self, stream, filename: str, destination: str) -> Iterator[Dict]:
+        """Estrae un archivio TAR/TAR.GZ in modalità streaming (nessun seek, una sola decompressione)"""
+        mode = 'r|gz' if filename.endswith(('.gz', '.tgz')) else 'r|'
+        
+        with tarfile.open(fileobj=stream, mode=mode) as tf:
+            count = 0
+            for member in tf:
+                # Link simbolici, device e directory non vengono estratti
+                if not member.isfile():
                     continue
-                allowed_members.append(member)
-
-            if len(allowed_members) > self.max_file_count:
-                raise ZipProcessorError(
-                    f"Troppi file nell'archivio: {len(allowed_members)}. "
-                    f"Massimo consentito: {self.max_file_count}"
-                )
-
-            base_dir = Path(self.temp_dir).resolve()
-            for member in allowed_members:
-                member_path = (base_dir / Path(member.name)).resolve()
-                if not str(member_path).startswith(str(base_dir)):
-                    raise ZipProcessorError(f"Path non sicuro rilevato: {member.name}")
-                tf.extract(member, self.temp_dir)
+                relative_path = self._safe_relative_path(member.name)
+                if relative_path is None:
+                    continue
+                count += 1
+                self._check_count(count)
+                source = tf.extractfile(member)
+                yield self._write_member(source, relative_path, destination, None)
     
-    def _validate_extracted_structure(self):
-        """Valida la struttura dei file estratti"""
-        total_size = 0
-        file_count = 0
-        
-        for root, dirs, files in os.walk(self.temp_dir):
-            # Rimuovi directory forbidden
-            dirs[:] = [d for d in dirs if d not in self.FORBIDDEN_PATHS]
-            
-            for file in files:
-                file_path = Path(root) / file
-                file_size = file_path.stat().st_size
-                total_size += file_size
-                file_count += 1
-                
-                # Verifica estensione
-                if file_path.suffix.lower() not in self.ALLOWED_EXTENSIONS and not file_path.name.startswith('.'):
-                    current_app.logger.warning(f"File con estensione non consentita: {file_path}")
-        
-        if file_count == 0:
-            raise ZipProcessorError("Nessun file valido trovato nell'archivio")
+    def _safe_relative_path(self, name: str) -> Optional[str]:
+        """
+        Path relativo normalizzato del membro, None se va ignorato (path forbidden).
         
+        Raises:
+            ZipProcessorError: Se il path esce dalla directory di destinazione
+        """
+        normalized = posixpath.normpath(name.replace('\\', '/'))
+        parts = normalized.split('/')
+        if normalized.startswith('/') or '..' in parts or (parts and parts[0].endswith(':')):
+            raise ZipProcessorError(f"Path non sicuro rilevato: {name}")
+        if normalized in ('', '.') or self._is_forbidden_path(Path(normalized)):
+            return None
+        return normalized
+    
+    def _write_member(self, source, relative_path: str, destination: str,
+                      compress_size: Optional[int]) -> Dict:
+        """Scrive un membro nella destinazione calcolando SHA-256 e verificando i limiti durante la copia"""
+        target = os.path.join(destination, *relative_path.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.lexists(target):
+            # Può essere un hardlink del blob store: mai riscriverlo in place
+            os.remove(target)
+        
+        digest = hashlib.sha256()
+        written = 0
+        with open(target, 'wb') as out:
+            for chunk in iter(lambda: source.read(self.CHUNK_SIZE), b''):
+                written += len(chunk)
+                self._check_total(self._total_bytes + written)
+                if compress_size is not None:
+                    self._check_ratio(written, compress_size, relative_path)
+                digest.update(chunk)
+                out.write(chunk)
+        
+        self._total_bytes += written
+        self._file_count += 1
+        self._check_ratio(self._total_bytes, self._archive_size, 'archivio')
+        
+        extension = Path(relative_path).suffix.lower()
+        if extension not in self.ALLOWED_EXTENSIONS and not posixpath.basename(relative_path).startswith('.'):
+            current_app.logger.warning(f"File con estensione non consentita: {relative_path}")
+        
+        return {
+            'path': relative_path,  # Unix-style path
+            'full_path': target,
+            'content': None,  # Il contenuto viene letto solo quando necessario
+            'size': written,
+            'type': self._get_file_type(Path(relative_path)),
+            'extension': extension,
+            'sha256': digest.hexdigest()
+        }
+    
+    def _check_count(self, count: int):
+        if count > self.max_file_count:
+            raise ZipProcessorError(
+                f"Troppi file nell'archivio: {count}. "
+                f"Massimo consentito: {self.max_file_count}"
+            )
+    
+    def _check_total(self, total_size: int):
         if total_size > self.max_extracted_bytes:
             raise ZipProcessorError(
                 f"Dimensione totale estratta troppo grande: {total_size / 1024 / 1024:.2f}MB "
                 f"(limite {self.max_extracted_bytes / 1024 / 1024:.0f}MB)"
             )
     
-    def _read_extracted_files(self):
-        """Legge i file estratti e li memorizza (solo metadati per performance)"""
-        file_count = 0
-        for root, dirs, files in os.walk(self.temp_dir):
-            # Rimuovi directory forbidden
-            dirs[:] = [d for d in dirs if d not in self.FORBIDDEN_PATHS]
-            
-            for file in files:
-                file_path = Path(root) / file
-                
-                # Path relativo dalla root temporanea
-                relative_path = file_path.relative_to(self.temp_dir)
-                
-                # Determina tipo file
-                file_type = self._get_file_type(file_path)
-                
-                # NON leggere il contenuto qui - troppo lento per file grandi
-                # Il contenuto verrà letto solo quando necessario
-                content = None
-                
-                # Log progresso ogni 100 file per debug
-                file_count += 1
-                if file_count % 100 == 0:
-                    current_app.logger.debug(f"Processed {file_count} files...")
-                
-                self.extracted_files.append({
-                    'path': str(relative_path).replace('\\', '/'),  # Unix-style path
-                    'full_path': str(file_path),
-                    'content': content,  # None per performance
-                    'size': file_path.stat().st_size,
-                    'type': file_type,
-                    'extension': file_path.suffix.lower()
-                })
-        
-        current_app.logger.debug(f"Total files processed: {file_count}")
+    def _check_ratio(self, size: int, compressed_size: int, name: str):
+        """Rifiuta contenuti con rapporto di compressione anomalo (zip bomb)"""
+        if size <= self.RATIO_MIN_BYTES:
+            return
+        if size > max(compressed_size, 1) * self.max_compression_ratio:
+            raise ZipProcessorError(
+                f"Rapporto di compressione sospetto per {name}: "
+                f"massimo consentito {self.max_compression_ratio}:1"
+            )
     
     def _get_file_type(self, file_path: Path) -> str:
         """Determina il tipo di file"""
@@ -267,6 +267,57 @@
             }, 2000);
         }
 
+        watchSyncEvents(sessionId, url) {
+            if (this.syncEvents) this.syncEvents.close();
+            const phases = {
+                queued: 'In coda',
+                collecting: 'Analisi file',
+                copying: 'Copia file',
+                committing: 'Commit',
+                pushing: 'Push su GitHub',
+                uploading: 'Upload su GitHub',
+                mirroring: 'Aggiornamento mirror'
+            };
+            this.showProgress('Sincronizzazione');
+            const source = new EventSource(url, { withCredentials: true });
+            this.syncEvents = source;
+
+            source.onmessage = async (event) => {
+                const data = JSON.parse(event.data);
+                const progress = data.progress || {};
+                if (this.progressLabel && phases[progress.phase]) {
+                    this.progressLabel.textContent = `Sincronizzazione • ${phases[progress.phase]}`;
+                }
+                if (progress.phase === 'pushing' || progress.phase === 'uploading') {
+                    this.updateProgress(progress.objects_total ? progress.objects_pushed / progress.objects_total : 0);
+                } else if (progress.phase === 'copying') {
+                    this.updateProgress(progress.bytes_total ? progress.bytes_copied / progress.bytes_total : 0);
+                } else if (progress.phase === 'collecting') {
+                    this.updateProgress(progress.files_total ? progress.files_hashed / progress.files_total : 0);
+                }
+
+                if (['completed', 'error'].includes(data.status)) {
+                    source.close();
+                    this.syncEvents = null;
+                    this.hideProgress();
+                    if (data.status === 'completed') {
+                        notify('✅ Sincronizzazione GitHub completata!', 'success');
+                        if (this.fileTreeEl) this.loadFileTree();
+                    } else {
+                        notify(`⚠️ Sincronizzazione fallita: ${data.error || 'Errore sconosciuto'}`, 'error');
+                    }
+                    await this.refresh();
+                }
+            };
+            source.onerror = () => {
+                // Stream chiuso (timeout o proxy): si torna al polling dello stato
+                source.close();
+                this.syncEvents = null;
+                this.hideProgress();
+                this.startPolling(sessionId);
+            };
+        }
+
         stopPolling() {
             if (this.pollingInterval) {
                 clearInterval(this.pollingInterval);
@@ -342,18 +393,14 @@
                     throw new Error(payload?.error || `Finalizzazione fallita (status ${response.status})`);
                 }
                 
-                // Mostra messaggio appropriato in base al metodo di sync
-                let message = '';
-                if (payload.status === 'completed' && payload.method === 'git') {
-                    const commitInfo = payload.commit_url 
-                        ? ` • <a href="${payload.commit_url}" target="_blank" class="underline">Vedi commit</a>`
-                        : '';
-                    message = `✅ Sincronizzato via Git (${payload.files_synced || 0} file)${commitInfo}`;
-                } else if (payload.status === 'syncing' && payload.method === 'celery') {
-                    message = '⏳ Sincronizzazione avviata in background (Celery). Controlla lo stato tra pochi secondi.';
-                    this.startPolling(sessionId);
+                // Il sync gira in background: l'avanzamento arriva via SSE
+                const message = payload.coalesced
+                    ? 'Sincronizzazione già in corso.'
+                    : '⏳ Sincronizzazione avviata in background.';
+                if (payload.events_url && window.EventSource) {
+                    this.watchSyncEvents(sessionId, payload.events_url);
                 } else {
-                    message = 'Sync avviato. Controlla lo stato tra pochi secondi.';
+                    this.startPolling(sessionId);
                 }
                 
                 notify(message, 'success');
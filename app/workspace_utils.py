@@ -1,12 +1,18 @@
+import hashlib
+import io
 import json
 import mimetypes
 import os
-from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+import zipfile
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from flask import current_app
 from itsdangerous import URLSafeTimedSerializer
 
+from .extensions import db
+from .models import WorkspaceHistoryEntry, WorkspaceSession
+
 # 🔒 SECURITY: File sensibili da bloccare sempre
 BLOCKED_FILES = {
     '.env',
@@ -205,6 +211,12 @@ def synced_repo_dir(project_id: int) -> str:
     return repo_dir
 
 
+def git_mirror_dir(project_id: int) -> str:
+    """Directory del clone git persistente usato per i sync verso GitHub."""
+    workspace = ensure_project_workspace(project_id)
+    return os.path.join(workspace, 'git_mirror')
+
+
 def metadata_path(session_directory: str) -> str:
     return os.path.join(session_directory, 'metadata.json')
 
@@ -217,11 +229,71 @@ def load_session_metadata(session_directory: str) -> dict:
     return {}
 
 
-def save_session_metadata(session_directory: str, data: dict):
+def _parse_iso_datetime(value: Optional[str]) -> Optional[datetime]:
+    """ISO string -> datetime UTC naive (come salvato dalle colonne DateTime)."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _index_session_metadata(data: dict, session_id: str):
+    """
+    Aggiorna (o crea) la riga indice della sessione in un savepoint.
+    Il commit spetta al chiamante, che possiede la transazione.
+    """
+    project_id = data.get('project_id')
+    if project_id is None:
+        return
+    try:
+        with db.session.begin_nested():
+            record = WorkspaceSession.query.filter_by(session_id=session_id).first()
+            if record is None:
+                record = WorkspaceSession(
+                    project_id=int(project_id),
+                    session_id=session_id,
+                    created_at=_parse_iso_datetime(data.get('created_at')) or datetime.now(timezone.utc)
+                )
+                db.session.add(record)
+            record.status = data.get('status', 'pending')
+            record.upload_type = data.get('type', 'manual')
+            record.data = dict(data)
+    except Exception as exc:
+        # Il savepoint è già stato annullato: il lavoro del chiamante resta intatto
+        current_app.logger.warning("Unable to index workspace session %s: %s", session_id, exc)
+
+
+def write_session_metadata_file(session_directory: str, data: dict):
+    """Scrive solo metadata.json (atomico: chi lo legge non vede mai file parziali)."""
     path = metadata_path(session_directory)
     os.makedirs(session_directory, exist_ok=True)
-    with open(path, 'w', encoding='utf-8') as fp:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as fp:
         json.dump(data, fp, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def save_session_metadata(session_directory: str, data: dict):
+    write_session_metadata_file(session_directory, data)
+    session_id = data.get('session_id') or os.path.basename(os.path.normpath(session_directory))
+    _index_session_metadata(data, session_id)
+
+
+def delete_session_metadata(session_id: str):
+    """
+    Rimuove la sessione dall'indice (la directory va rimossa dal chiamante).
+    Il commit spetta al chiamante.
+    """
+    try:
+        with db.session.begin_nested():
+            WorkspaceSession.query.filter_by(session_id=session_id).delete()
+    except Exception as exc:
+        current_app.logger.warning("Unable to remove workspace session %s from index: %s", session_id, exc)
 
 
 def default_metadata(session_id: str, project_id: int, upload_type: str) -> dict:
@@ -236,81 +308,215 @@ def default_metadata(session_id: str, project_id: int, upload_type: str) -> dict
     }
 
 
+def github_manifest_file(project_id: int) -> str:
+    """Manifest path -> blob SHA dell'ultimo sync GitHub riuscito."""
+    workspace = ensure_project_workspace(project_id)
+    return os.path.join(workspace, 'github_manifest.json')
+
+
+def _load_json_dict(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as fp:
+            data = json.load(fp)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as fp:
+        json.dump(data, fp, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_github_manifest(project_id: int) -> Dict[str, Any]:
+    return _load_json_dict(github_manifest_file(project_id))
+
+
+def save_github_manifest(project_id: int, manifest: Dict[str, Any]):
+    _write_json_atomic(github_manifest_file(project_id), manifest)
+
+
+def github_task_sync_file(project_id: int) -> str:
+    """Stato dell'ultimo job di sync massivo task -> GitHub Issues."""
+    workspace = ensure_project_workspace(project_id)
+    return os.path.join(workspace, 'github_task_sync.json')
+
+
+def load_github_task_sync_state(project_id: int) -> Dict[str, Any]:
+    return _load_json_dict(github_task_sync_file(project_id))
+
+
+def save_github_task_sync_state(project_id: int, state: Dict[str, Any]):
+    _write_json_atomic(github_task_sync_file(project_id), state)
+
+
+def hub_generation_file(project_id: int) -> str:
+    """Stato dell'ultimo job di generazione massiva dei documenti AI Hub."""
+    workspace = ensure_project_workspace(project_id)
+    return os.path.join(workspace, 'hub_generation.json')
+
+
+def load_hub_generation_state(project_id: int) -> Dict[str, Any]:
+    return _load_json_dict(hub_generation_file(project_id))
+
+
+def save_hub_generation_state(project_id: int, state: Dict[str, Any]):
+    _write_json_atomic(hub_generation_file(project_id), state)
+
+
 def history_file(project_id: int) -> str:
     workspace = ensure_project_workspace(project_id)
     return os.path.join(workspace, 'history.json')
 
 
 def load_history_entries(project_id: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-    path = history_file(project_id)
-    if not os.path.exists(path):
-        return []
-    with open(path, 'r', encoding='utf-8') as fp:
-        try:
-            data = json.load(fp)
-        except json.JSONDecodeError:
-            data = []
-    if not isinstance(data, list):
-        data = []
+    query = WorkspaceHistoryEntry.query.filter_by(project_id=project_id).order_by(
+        WorkspaceHistoryEntry.created_at.desc(),
+        WorkspaceHistoryEntry.id.desc()
+    )
     if limit:
-        return data[:limit]
-    return data
+        query = query.limit(limit)
+    return [dict(row.data) for row in query.all()]
 
 
 def append_history_entry(project_id: int, entry: Dict[str, Any], max_entries: int = 20):
-    history = load_history_entries(project_id)
+    """Aggiunge una voce allo storico in un savepoint (il commit spetta al chiamante)."""
     entry = dict(entry)
     entry.setdefault('created_at', datetime.now(timezone.utc).isoformat())
-    history.insert(0, entry)
-    history = history[:max_entries]
-    path = history_file(project_id)
-    with open(path, 'w', encoding='utf-8') as fp:
-        json.dump(history, fp, ensure_ascii=False, indent=2)
+    try:
+        with db.session.begin_nested():
+            db.session.add(WorkspaceHistoryEntry(
+                project_id=project_id,
+                session_id=entry.get('session_id'),
+                status=entry.get('status'),
+                data=entry,
+                created_at=_parse_iso_datetime(entry['created_at']) or datetime.now(timezone.utc)
+            ))
+            db.session.flush()
+            # Mantiene solo le ultime max_entries voci del progetto
+            stale_ids = [
+                row.id for row in WorkspaceHistoryEntry.query.with_entities(WorkspaceHistoryEntry.id)
+                .filter_by(project_id=project_id)
+                .order_by(WorkspaceHistoryEntry.created_at.desc(), WorkspaceHistoryEntry.id.desc())
+                .offset(max_entries)
+                .all()
+            ]
+            if stale_ids:
+                WorkspaceHistoryEntry.query.filter(WorkspaceHistoryEntry.id.in_(stale_ids)).delete(synchronize_session=False)
+    except Exception as exc:
+        current_app.logger.warning("Unable to record workspace history for project %s: %s", project_id, exc)
+
+
+STUCK_SYNC_TIMEOUT = timedelta(minutes=5)
+
+
+def _commit_recovered_session(session_id: str, data: dict):
+    """
+    Conferma il recupero di una sessione bloccata con una transazione propria e breve,
+    senza toccare (né confermare) la transazione della richiesta.
+    """
+    table = WorkspaceSession.__table__
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(
+                table.update()
+                .where(table.c.session_id == session_id)
+                .values(status=data.get('status', 'error'), data=dict(data))
+            )
+    except Exception as exc:
+        # metadata.json è già corretto: l'indice verrà recuperato alla prossima lettura
+        current_app.logger.warning("Unable to index recovered workspace session %s: %s", session_id, exc)
 
 
 def list_session_metadata(project_id: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-    incoming_dir = os.path.join(ensure_project_workspace(project_id), 'incoming')
-    if not os.path.exists(incoming_dir):
-        return []
+    query = WorkspaceSession.query.filter_by(project_id=project_id).order_by(WorkspaceSession.created_at.desc())
+    if limit:
+        query = query.limit(limit)
+
+    # Nessun autoflush: le modifiche pendenti del chiamante non devono prendere
+    # il lock di scrittura prima della transazione di recupero
+    with db.session.no_autoflush:
+        records = query.all()
 
     sessions: List[Dict[str, Any]] = []
-    for session_id in os.listdir(incoming_dir):
-        session_path = os.path.join(incoming_dir, session_id)
-        if not os.path.isdir(session_path):
-            continue
-        metadata = load_session_metadata(session_path)
-        if metadata:
-            # Auto-recovery: se una sessione è in "syncing" da più di 5 minuti, la marchia come "error"
-            if metadata.get('status') == 'syncing':
-                updated_at = metadata.get('updated_at') or metadata.get('created_at')
-                if updated_at:
-                    try:
-                        from datetime import datetime, timezone, timedelta
-                        updated_time = datetime.fromisoformat(updated_at.replace('Z', '+00:00'))
-                        now = datetime.now(timezone.utc)
-                        time_diff = now - updated_time
-                        
-                        # Se è passato più di 5 minuti, segna come errore
-                        if time_diff > timedelta(minutes=5):
-                            metadata['status'] = 'error'
-                            metadata['error'] = 'Sync timeout - sessione bloccata recuperata automaticamente'
-                            metadata['recovered_at'] = now.isoformat()
-                            save_session_metadata(session_path, metadata)
-                            current_app.logger.warning(
-                                "Session %s auto-recovered from stuck 'syncing' state (age: %s)",
-                                session_id, time_diff
-                            )
-                    except Exception as e:
-                        current_app.logger.error("Error checking session timeout: %s", e)
-            
-            sessions.append(metadata)
-
-    sessions.sort(key=lambda item: item.get('created_at', ''), reverse=True)
-    if limit:
-        return sessions[:limit]
+    for record in records:
+        metadata = dict(record.data or {})
+        # Auto-recovery: se una sessione è in "syncing" da più di 5 minuti, la marchia come "error".
+        # metadata.json e riga indice vengono corretti subito, l'indice in una transazione a parte:
+        # una lettura non chiude la transazione della richiesta
+        if record.status == 'syncing':
+            updated_time = _parse_iso_datetime(metadata.get('updated_at') or metadata.get('created_at')) or record.updated_at
+            now = datetime.now(timezone.utc)
+            if updated_time and now.replace(tzinfo=None) - updated_time > STUCK_SYNC_TIMEOUT:
+                metadata['status'] = 'error'
+                metadata['error'] = 'Sync timeout - sessione bloccata recuperata automaticamente'
+                metadata['recovered_at'] = now.isoformat()
+                write_session_metadata_file(session_dir(project_id, record.session_id), metadata)
+                _commit_recovered_session(record.session_id, metadata)
+                current_app.logger.warning(
+                    "Session %s auto-recovered from stuck 'syncing' state (age: %s)",
+                    record.session_id, now.replace(tzinfo=None) - updated_time
+                )
+        sessions.append(metadata)
     return sessions
 
 
+def import_workspace_metadata(project_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Importa una tantum metadata.json e history.json esistenti nelle tabelle indice.
+    Le sessioni già indicizzate vengono aggiornate, lo storico viene importato
+    solo per i progetti che non hanno ancora voci in DB.
+    """
+    root = get_workspace_root()
+    if project_id is not None:
+        project_dirs = [str(project_id)]
+    else:
+        project_dirs = [name for name in os.listdir(root) if name.isdigit()]
+
+    stats = {'sessions': 0, 'history': 0}
+    for name in project_dirs:
+        project_path = os.path.join(root, name)
+        if not os.path.isdir(project_path):
+            continue
+        pid = int(name)
+
+        incoming_dir = os.path.join(project_path, 'incoming')
+        if os.path.isdir(incoming_dir):
+            for session_id in os.listdir(incoming_dir):
+                session_path = os.path.join(incoming_dir, session_id)
+                if not os.path.isdir(session_path):
+                    continue
+                try:
+                    metadata = load_session_metadata(session_path)
+                except (OSError, json.JSONDecodeError):
+                    continue
+                if not metadata:
+                    continue
+                metadata.setdefault('project_id', pid)
+                _index_session_metadata(metadata, metadata.get('session_id') or session_id)
+                stats['sessions'] += 1
+
+        legacy_history = os.path.join(project_path, 'history.json')
+        if os.path.exists(legacy_history) and not WorkspaceHistoryEntry.query.filter_by(project_id=pid).first():
+            try:
+                with open(legacy_history, 'r', encoding='utf-8') as fp:
+                    entries = json.load(fp)
+            except (OSError, json.JSONDecodeError):
+                entries = []
+            if isinstance(entries, list):
+                # history.json è ordinato dal più recente: inseriamo dal più vecchio
+                for entry in reversed(entries):
+                    if isinstance(entry, dict):
+                        append_history_entry(pid, entry)
+                        stats['history'] += 1
+    db.session.commit()
+    return stats
+
+
 def sanitize_workspace_path(relative_path: str) -> str:
     if not relative_path:
         raise ValueError("Il percorso relativo è obbligatorio.")
@@ -360,6 +566,105 @@ def list_repo_files(project_id: int, limit: int = 500) -> List[Dict[str, Any]]:
     return files
 
 
+def list_exportable_repo_files(project_id: int) -> List[Tuple[str, str, os.stat_result]]:
+    """
+    Elenca i file del workspace sincronizzato da includere in un export,
+    applicando gli stessi filtri della sincronizzazione GitHub.
+
+    Returns:
+        Lista ordinata di (path relativo, path assoluto, stat)
+    """
+    repo_dir = synced_repo_dir(project_id)
+    if not os.path.exists(repo_dir):
+        return []
+
+    files: List[Tuple[str, str, os.stat_result]] = []
+    for root, dirnames, filenames in os.walk(repo_dir):
+        # Evita di scendere in cartelle ignorate (.git, node_modules, ...)
+        dirnames[:] = [d for d in dirnames if d not in SYNC_BLACKLIST_DIRS]
+        for filename in filenames:
+            full_path = os.path.join(root, filename)
+            if os.path.islink(full_path):
+                continue
+            relative = os.path.relpath(full_path, repo_dir).replace('\\', '/')
+            try:
+                sanitized = sanitize_workspace_path(relative)
+            except ValueError:
+                continue
+            allowed, _ = should_sync_to_github(sanitized)
+            if not allowed:
+                continue
+            try:
+                files.append((sanitized, full_path, os.stat(full_path)))
+            except OSError:
+                continue
+
+    files.sort(key=lambda item: item[0])
+    return files
+
+
+def workspace_content_hash(files: List[Tuple[str, str, os.stat_result]]) -> str:
+    """Fingerprint di un elenco di file (path, dimensione, mtime) usato come ETag."""
+    digest = hashlib.sha1()
+    for relative, _, stat in files:
+        digest.update(f"{relative}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Buffer write-only non seekable: zipfile scrive, il generatore svuota."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip_stream(files: List[Tuple[str, str, os.stat_result]], chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """
+    Genera uno ZIP in streaming senza file temporanei.
+    I file vengono letti a blocchi e i byte compressi restituiti appena pronti.
+    """
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for relative, full_path, _ in files:
+            try:
+                source = open(full_path, 'rb')
+            except OSError:
+                # File rimosso dopo l'elenco: lo saltiamo
+                continue
+            with source:
+                info = zipfile.ZipInfo.from_file(full_path, arcname=relative)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with archive.open(info, mode='w') as target:
+                    while True:
+                        chunk = source.read(chunk_size)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        data = buffer.drain()
+                        if data:
+                            yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    # Central directory
+    data = buffer.drain()
+    if data:
+        yield data
+
+
 def _file_token_serializer() -> URLSafeTimedSerializer:
     secret = current_app.config['SECRET_KEY']
     salt = current_app.config.get('WORKSPACE_FILE_TOKEN_SALT', 'workspace-file-token')
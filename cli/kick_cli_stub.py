@@ -15,24 +15,105 @@ Uso previsto:
     - Esegue una POST verso `/api/projects/<id>/files` con `relative_path`.
 4. `kick finalize --project <id> --session <session_id>`
     - POST `/api/projects/<id>/finalize-upload`.
+5. `kick upload-resumable --project <id> --path data/model.bin --file model.bin`
+    - POST `/api/projects/<id>/uploads` per avviare l'upload, poi PUT dei chunk
+      in parallelo con header `Upload-Offset` e `X-Chunk-Sha256`.
+    - Con `--upload-id` riprende un upload interrotto inviando solo gli
+      intervalli mancanti restituiti da GET `/api/projects/<id>/uploads/<upload_id>`.
 
 Questo file serve solo come documentazione per gli sviluppatori finché
 il client reale non verrà implementato.
 """
 
 import argparse
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _chunks(missing, chunk_size):
+    """Divide gli intervalli mancanti [start, end) in chunk da inviare."""
+    for start, end in missing:
+        for offset in range(start, end, chunk_size):
+            yield offset, min(chunk_size, end - offset)
+
+
+def upload_resumable(server, project_id, path, relative_path, headers,
+                     session_id=None, upload_id=None, workers=4):
+    """Upload riprendibile con chunk inviati in parallelo."""
+    base_url = f"{server}/api/projects/{project_id}/uploads"
+    http = requests.Session()
+    http.headers.update(headers)
+
+    if upload_id:
+        resp = http.get(f"{base_url}/{upload_id}")
+    else:
+        payload = {
+            "relative_path": relative_path,
+            "size": os.path.getsize(path),
+            "sha256": _file_sha256(path),
+        }
+        if session_id:
+            payload["session_id"] = session_id
+        resp = http.post(base_url, json=payload)
+    resp.raise_for_status()
+    status = resp.json()
+    upload_id = status["upload_id"]
+    print(f"Upload {upload_id}: {status['received_bytes']}/{status['size']} byte già ricevuti")
+
+    def _send(chunk):
+        offset, length = chunk
+        with open(path, "rb") as fh:
+            fh.seek(offset)
+            data = fh.read(length)
+        for _ in range(3):
+            chunk_resp = http.put(
+                f"{base_url}/{upload_id}",
+                data=data,
+                headers={
+                    "Upload-Offset": str(offset),
+                    "X-Chunk-Sha256": hashlib.sha256(data).hexdigest(),
+                    "Content-Type": "application/octet-stream",
+                },
+            )
+            if chunk_resp.status_code != 422:
+                break
+        chunk_resp.raise_for_status()
+        return chunk_resp.json()
+
+    last = status
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(_send, _chunks(status["missing"], status.get("chunk_size") or CHUNK_SIZE)):
+            if result["received_bytes"] >= last["received_bytes"]:
+                last = result
+    if last["status"] != "complete":
+        last = http.get(f"{base_url}/{upload_id}").json()
+    return last
+
 
 def main():
     parser = argparse.ArgumentParser(description="Kick CLI (stub).")
     parser.add_argument("--server", default="http://localhost:5000", help="URL base di KickthisUSs")
     parser.add_argument("--token", help="Token API (non gestito nello stub)")
-    parser.add_argument("command", choices=["upload-zip", "upload-file", "finalize"], help="Comando da eseguire")
+    parser.add_argument("command", choices=["upload-zip", "upload-file", "upload-resumable", "finalize"], help="Comando da eseguire")
     parser.add_argument("--project-id", required=True, type=int, help="ID del progetto")
     parser.add_argument("--file", help="Percorso file locale")
     parser.add_argument("--relative-path", help="Percorso relativo nel workspace")
     parser.add_argument("--session-id", help="ID sessione upload")
+    parser.add_argument("--upload-id", help="ID upload riprendibile da completare")
+    parser.add_argument("--workers", type=int, default=4, help="Chunk inviati in parallelo")
     args = parser.parse_args()
 
     headers = {}
@@ -61,6 +142,16 @@ def main():
                 data=data,
                 files={"file": (args.file, fh, "application/octet-stream")}
             )
+    elif args.command == "upload-resumable":
+        if not args.file or not (args.relative_path or args.upload_id):
+            parser.error("--file e --relative-path (o --upload-id) sono obbligatori per upload-resumable")
+        result = upload_resumable(
+            args.server, args.project_id, args.file, args.relative_path, headers,
+            session_id=args.session_id, upload_id=args.upload_id, workers=args.workers
+        )
+        print("Status:", result["status"])
+        print(result)
+        return
     else:  # finalize
         if not args.session_id:
             parser.error("--session-id è obbligatorio per finalize")